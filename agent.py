@@ -1,26 +1,32 @@
 # agent.py
 import os
+import re
+import json
+import time
 import uuid
 import asyncio
+from contextlib import aclosing
+
+from loguru import logger
 # REMOVED: from dotenv import load_dotenv, find_dotenv
-import vertexai
-import inspect
 
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 
-from vertexai.preview.reasoning_engines import AdkApp
-from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
-from tools.calendar_tool import crop_calendar_tool
-
-
-print("DEBUG: Inspecting FunctionTool.__init__ signature:")
-try:
-    signature = inspect.signature(FunctionTool.__init__)
-    print(f"DEBUG: FunctionTool.__init__ signature: {signature}")
-except Exception as e:
-    print(f"ERROR: Could not get FunctionTool.__init__ signature: {e}")
+from tools.calendar_tool import CROP_ALIASES, KNOWN_CROPS_RE, crop_calendar_tool, find_crop_and_state
+from tools.weather_tool import get_weather_forecast, get_weather_tool
+from tools.summary_renderer import SUMMARIES, render_summary, resolve_language
+from services import metrics
+from services.session_store import BoundedInMemorySessionService
+from services.response_cache import build_response_cache_from_env
+from services.intent_router import RouteDecision
+from services.structured_output import parse_agent_output
+from services.model_config import model_kwargs
+from services.conversation_context import compact_context
+from services.logging_setup import debug_sampled, describe_content, truncate
+from services.tracing import span
+from basemodel_dto.agent_responsedto import CropDiagnosisResult, MarketAnalysisResult, SchemeInfoResult
 
 from google.genai import types as genai_types
 
@@ -32,9 +38,10 @@ from google.genai import types as genai_types
 # REMOVED: else:
 # REMOVED:     print("ERROR: .env file not found.")
 
+# ADK's Gemini client reads the project, location and credentials from the environment itself;
+# nothing is initialized here at import time.
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-MODEL_NAME = os.getenv("MODEL_NAME", "gemini-1.5-pro-preview-0409")
 CREDENTIALS_PATH_ENV = os.getenv("GOOGLE_APPLICATION_CREDENTIALS") # This variable might not be needed if not used directly to load credentials in agent.py
 
 if not PROJECT_ID:
@@ -43,17 +50,15 @@ if not PROJECT_ID:
 # and Vertex AI initialization does not strictly require it as an environment variable here.
 # However, keeping it for now as it's part of the original agent.py logic.
 if not CREDENTIALS_PATH_ENV:
-    # Changed from ValueError to a print/warning if not strictly required for vertexai.init
-    print("WARNING: GOOGLE_APPLICATION_CREDENTIALS environment variable not set in agent.py. Ensure it's handled elsewhere if needed.")
+    # Changed from ValueError to a print/warning; Application Default Credentials are used when it is unset
+    logger.warning("GOOGLE_APPLICATION_CREDENTIALS is not set; Application Default Credentials will be used.")
 
 
-vertexai.init(project=PROJECT_ID, location=LOCATION)
-
 # ---------------------- Agent Definitions ----------------------
 
 crop_diagnosis_agent = LlmAgent(
-    model=MODEL_NAME,
     name="CropDiagnosisAgent",
+    **model_kwargs("CropDiagnosisAgent"),
     description="Diagnoses crop disease and remedies based on a textual description of symptoms.", # Clarified description
     instruction="""
     You are a highly skilled crop doctor agent.
@@ -67,12 +72,15 @@ crop_diagnosis_agent = LlmAgent(
       "observed_symptoms_from_description": "<detailed description of symptoms based on the input text, e.g., 'Yellow spots with dark centers on leaves, indicating early blight.'>"
     }
     If you cannot identify a specific disease, state that, but still describe the symptoms based on the input text.
-    """
+    """,
+    output_schema=CropDiagnosisResult,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
 )
 
 market_analysis_agent = LlmAgent(
-    model=MODEL_NAME,
     name="MarketAnalysisAgent",
+    **model_kwargs("MarketAnalysisAgent"),
     description="Analyzes market and suggests Sell/Hold.",
     instruction="""
     You are a market analyst.
@@ -84,12 +92,15 @@ market_analysis_agent = LlmAgent(
       "trend": "<increasing/decreasing/stable>",
       "recommendation": "<Sell or Hold>"
     }
-    """
+    """,
+    output_schema=MarketAnalysisResult,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
 )
 
 scheme_navigator_agent = LlmAgent(
-    model=MODEL_NAME,
     name="SchemeNavigatorAgent",
+    **model_kwargs("SchemeNavigatorAgent"),
     description="Helps with government schemes.",
     instruction="""
     Output JSON:
@@ -98,14 +109,17 @@ scheme_navigator_agent = LlmAgent(
       "benefits": "<summary>",
       "eligibility": "<conditions>",
       "how_to_apply": "<steps>",
-      "link": "<url>"
+      "link": "<url, or empty if none>"
     }
-    """
+    """,
+    output_schema=SchemeInfoResult,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
 )
 
 summary_agent = LlmAgent(
-    model=MODEL_NAME,
     name="SummaryAgent",
+    **model_kwargs("SummaryAgent"),
     description="Summarizes data for farmers in plain text.",
     instruction="""
     You get multiple JSON inputs and summarize clearly.
@@ -113,75 +127,153 @@ summary_agent = LlmAgent(
     """
 )
 
+conversation_summary_agent = LlmAgent(
+    name="ConversationSummaryAgent",
+    **model_kwargs("ConversationSummaryAgent"),
+    description="Condenses earlier turns of a farmer's conversation.",
+    instruction="""
+    You get the summary of a conversation between a farmer and an assistant so far (possibly empty)
+    and the turns that followed it. Write an updated summary in a few short sentences: the farmer's
+    crops, location and problems, diagnoses and remedies given, prices and schemes discussed, and any
+    open questions. Keep references to photos. Output only plain text.
+    """
+)
+
 # ---------------------- Shared Session Service for Internal Runners ----------------------
-_internal_session_service = InMemorySessionService()
+# Tool sessions are one-shot and deleted once the final response is extracted; the bounds are a safety net.
+# They never outlive the tool call that created them, so they stay in memory whatever SESSION_BACKEND is.
+_internal_session_service = BoundedInMemorySessionService.from_env("internal_tools")
+
+
+async def _delete_internal_session(app_name: str, user_id: str, session_id: str):
+    try:
+        await _internal_session_service.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    except Exception as e:
+        logger.warning(f"Failed to delete internal session '{session_id}': {e}")
+
+# ---------------------- Cached Runners for Internal Agents ----------------------
+# Runners are stateless apart from their agent and session service, so one per agent is reused across calls.
+_internal_runners: dict[str, Runner] = {}
+
+
+def _get_internal_runner(agent) -> Runner:
+    runner = _internal_runners.get(agent.name)
+    if runner is None:
+        runner = Runner(
+            app_name=f"{agent.name}App",
+            agent=agent,
+            session_service=_internal_session_service
+        )
+        _internal_runners[agent.name] = runner
+    return runner
+
+
+async def _run_until_final_text(runner: Runner, user_id: str, session_id: str,
+                                new_message: genai_types.Content, default_text: str) -> str:
+    """
+    Consumes the runner's events as they are produced and returns the first final text response.
+    Leaving the `aclosing` block closes the event generator, cancelling whatever the run had left to do.
+    """
+    final_response_text = default_text
+    async with aclosing(runner.run_async(
+            user_id=user_id,
+            session_id=session_id,
+            new_message=new_message
+    )) as events:
+        async for event in events:
+            if event.error_message:
+                logger.error(f"Internal agent event from {event.author} failed: {event.error_code}: {event.error_message}")
+                final_response_text = f"Error from {event.author}: {event.error_message}"
+                break
+
+            content = getattr(event, 'content', None)
+            if debug_sampled():
+                logger.debug(f"Internal agent event from {event.author} (final: {event.is_final_response()}): "
+                             f"{describe_content(content)}")
+            if not content or not content.parts:
+                continue
+
+            text = "".join(part.text for part in content.parts if getattr(part, 'text', None))
+            if text and event.is_final_response():
+                final_response_text = text
+                break
+
+    return final_response_text
+
+
+def _normalize_structured_output(agent: LlmAgent, response_text: str) -> str:
+    """
+    For agents with an output_schema, returns the validated result as compact canonical JSON
+    (repairing fenced or truncated output). Output that cannot be validated is returned as-is.
+    """
+    # Plain BaseAgent subclasses (workflow agents, benchmark stubs) have no output_schema field.
+    output_schema = getattr(agent, "output_schema", None)
+    if output_schema is None or not _is_cacheable_response(response_text):
+        return response_text
+    parsed = parse_agent_output(response_text, output_schema, agent.name)
+    return parsed.model_dump_json() if parsed is not None else response_text
+
 
 # ---------------------- Async Tool Wrapper Helper Function ----------------------
+AGENT_RUN_LATENCY = metrics.histogram(
+    "kisan_agent_run_latency_seconds", "Sub-agent run time (cache misses) by agent", ["agent"]
+)
+
+
 async def run_agent_and_get_text(agent: LlmAgent, input_content: genai_types.Content):
     """Helper to run an LlmAgent and extract its final text response."""
-    print(f"DEBUG: Calling internal agent '{agent.name}' with input_content: '{input_content}'")
-
-    internal_runner = Runner(
-        app_name=f"{agent.name}App",
-        agent=agent,
-        session_service=_internal_session_service
-    )
+    if debug_sampled():
+        logger.debug(f"Calling internal agent '{agent.name}' with {describe_content(input_content)}")
 
+    internal_runner = _get_internal_runner(agent)
     session_id = f"tool_session_{uuid.uuid4()}"
 
     try:
         await _internal_session_service.create_session(
-            app_name=f"{agent.name}App",
+            app_name=internal_runner.app_name,
             user_id="tool_user",
             session_id=session_id
         )
-        print(f"DEBUG: Created session '{session_id}' for internal runner '{agent.name}App'.")
+        started_at = time.monotonic()
+        with span("sub_agent", agent=agent.name):
+            response_text = await _run_until_final_text(
+                internal_runner, "tool_user", session_id, input_content,
+                default_text=f"No final text response from {agent.name}."
+            )
+        AGENT_RUN_LATENCY.observe(time.monotonic() - started_at, agent=agent.name)
+        return _normalize_structured_output(agent, response_text)
 
-        print(f"DEBUG: Input to {agent.name} through its Runner: {input_content}")
+    except Exception as e:
+        logger.exception(f"Exception during internal agent '{agent.name}' tool call: {truncate(e)}")
+        return f"Error processing request with {agent.name}: {str(e)}"
+    finally:
+        await _delete_internal_session(internal_runner.app_name, "tool_user", session_id)
 
-        final_response_text = f"No final text response from {agent.name}."
+# ---------------------- Response Cache for Repetitive Tool Queries ----------------------
+# Market prices move within the day, scheme details rarely change; TTLs are per agent name.
+_response_cache = build_response_cache_from_env({
+    "MarketAnalysisAgent": float(os.getenv("MARKET_CACHE_TTL_SECONDS", "900")),
+    "SchemeNavigatorAgent": float(os.getenv("SCHEME_CACHE_TTL_SECONDS", "86400")),
+})
 
-        async def get_internal_agent_events():
-            print(f"DEBUG: Running internal agent {agent.name} via its Runner in a thread...")
-            results_list = await asyncio.to_thread(
-                lambda: list(internal_runner.run(
-                    user_id="tool_user",
-                    session_id=session_id,
-                    new_message=input_content
-                ))
-            )
-            print(f"DEBUG: Collected {len(results_list)} events from internal agent {agent.name} in thread.")
-            for event in results_list:
-                yield event
 
-        async for event in get_internal_agent_events():
-            print(f"DEBUG (Internal Agent Event from {agent.name}): Type: {type(event)}, is_final_response: {getattr(event, 'is_final_response', False)}")
-            content = getattr(event, 'content', None)
-            if content:
-                print(f"DEBUG (Internal Agent Content from {agent.name}): {content}")
-                for part in content.parts:
-                    if getattr(part, 'text', None):
-                        print(f"   DEBUG (Tool Response from {agent.name}): TEXT: {part.text}")
-                        if getattr(event, 'is_final_response', False):
-                            final_response_text = part.text
-                            break
-                    if getattr(part, 'function_call', None):
-                        print(f"   DEBUG (Tool Response from {agent.name}): FUNCTION CALL: {part.function_call.name}({part.function_call.args})")
-                    if getattr(part, 'error', None):
-                        print(f"   ERROR (Tool Response from {agent.name}): ERROR PART: {part.error}")
-                        final_response_text = f"Error from {agent.name}: {part.error.message}"
-                        break
-
-            if getattr(event, 'is_final_response', False) and final_response_text != f"No final text response from {agent.name}.":
-                break
+def _is_cacheable_response(text: str) -> bool:
+    return not text.startswith(("Error ", "No final text response"))
 
-        return final_response_text
 
-    except Exception as e:
-        print(f"ERROR: Exception during internal agent '{agent.name}' tool call: {e}")
-        import traceback
-        traceback.print_exc()
-        return f"Error processing request with {agent.name}: {str(e)}"
+def _is_valid_structured_output(agent: LlmAgent, text: str) -> bool:
+    output_schema = getattr(agent, "output_schema", None)
+    return output_schema is not None and parse_agent_output(text, output_schema, agent.name, record=False) is not None
+
+
+async def _cached_agent_call(agent: LlmAgent, query: str) -> str:
+    input_content = genai_types.Content(role="user", parts=[genai_types.Part(text=query)])
+    # Only answers that validate against the agent's schema are cached.
+    return await _response_cache.get_or_compute(
+        agent.name, query,
+        lambda: run_agent_and_get_text(agent, input_content),
+        cacheable=lambda text: _is_cacheable_response(text) and _is_valid_structured_output(agent, text)
+    )
 
 # ---------------------- Tool Wrapper Functions ----------------------
 # These functions should now accept simple string arguments for automatic function calling.
@@ -206,8 +298,7 @@ async def market_analysis_tool(query: str) -> str:
     Returns:
         str: JSON string with crop, market, price_today, trend, recommendation.
     """
-    input_content = genai_types.Content(role="user", parts=[genai_types.Part(text=query)])
-    return await run_agent_and_get_text(market_analysis_agent, input_content)
+    return await _cached_agent_call(market_analysis_agent, query)
 
 async def scheme_navigator_tool(query: str) -> str:
     """
@@ -217,121 +308,171 @@ async def scheme_navigator_tool(query: str) -> str:
     Returns:
         str: JSON string with scheme_name, benefits, eligibility, how_to_apply, link.
     """
-    input_content = genai_types.Content(role="user", parts=[genai_types.Part(text=query)])
-    return await run_agent_and_get_text(scheme_navigator_agent, input_content)
+    return await _cached_agent_call(scheme_navigator_agent, query)
 
-async def summarize_output_tool(json_data: str) -> str:
+async def summarize_output_tool(json_data: str, language: str = "") -> str:
     """
     Summarize raw JSON data from other agents into a clear, organized, plain text message.
     Args:
         json_data (str): The JSON string output from another agent.
+        language (str): Language of the farmer's question, e.g. "en", "hi" (Hindi) or "kn" (Kannada).
+            Empty for the default language (SUMMARY_LANGUAGE).
     Returns:
         str: Plain text summary suitable for voice output.
     """
+    # Known JSON shapes are rendered from local templates; the LLM only handles what does not validate.
+    rendered = render_summary(json_data, language)
+    if rendered is not None:
+        return rendered
+
+    SUMMARIES.inc(renderer="llm", shape="unknown")
+    language = resolve_language(language)
+    if language != "en":
+        json_data = f"Respond in this language: {language}\n\n{json_data}"
     input_content = genai_types.Content(role="user", parts=[genai_types.Part(text=json_data)])
     return await run_agent_and_get_text(summary_agent, input_content)
 
-step1_diagnosis_agent = LlmAgent(
-    model=MODEL_NAME,
-    name="Step1_Diagnose",
-    instruction="Diagnose crop and output JSON.",
-    output_key="diagnosis_json"
+# ---------------------- Crop + Market Pipeline ----------------------
+# Aliases that are also everyday words or fragments ("50 gram of urea", "a bale of hay", "Jan Dhan") only
+# count as a crop within _MARKET_WORD_DISTANCE words of a price or market word ("tur dal price").
+_AMBIGUOUS_CROP_NAMES = {alias for alias in CROP_ALIASES if len(alias) < 4} | {"gram", "bale", "dhan"}
+_MARKET_WORDS = {
+    "price", "prices", "rate", "rates", "bhav", "bhaav", "mandi", "market", "apmc", "msp", "quintal",
+    "sell", "selling", "sold", "dal", "daal",
+}
+_MARKET_WORD_DISTANCE = 3
+_WORD_RE = re.compile(r"\w+")
+
+PIPELINE_RUNS = metrics.counter(
+    "kisan_crop_market_pipeline_runs_total", "crop_market_pipeline_tool runs by stage scheduling", ["mode"]
 )
 
-step2_market_agent = LlmAgent(
-    model=MODEL_NAME,
-    name="Step2_Market",
-    instruction="Based on {diagnosis_json}, do market analysis. Output JSON.",
-    output_key="market_json"
-)
 
-step3_summarize_agent = LlmAgent(
-    model=MODEL_NAME,
-    name="Step3_Summarize",
-    instruction="Summarize {diagnosis_json} and {market_json} in plain text."
-)
+def _mask_ambiguous_crop_names(query: str) -> str:
+    """Blanks out ambiguous crop aliases that are not used in a price or market context."""
+    words = [(match.start(), match.end(), match.group(0).lower()) for match in _WORD_RE.finditer(query)]
+    market_positions = [i for i, (_, _, word) in enumerate(words) if word in _MARKET_WORDS]
+    pieces, last_end = [], 0
+    for i, (start, end, word) in enumerate(words):
+        if word not in _AMBIGUOUS_CROP_NAMES or (i and f"{words[i - 1][2]} {word}" in CROP_ALIASES):
+            continue
+        if any(abs(i - j) <= _MARKET_WORD_DISTANCE for j in market_positions):
+            continue
+        pieces.append(query[last_end:start])
+        last_end = end
+    pieces.append(query[last_end:])
+    return "".join(pieces)
+
+
+def _mentioned_crop(query: str) -> str | None:
+    query = _mask_ambiguous_crop_names(query)
+    try:
+        crop, _ = find_crop_and_state(query)
+    except Exception:
+        crop = None
+    if crop:
+        return crop
+    # Crop names the market stage can use without waiting for the diagnosis.
+    match = KNOWN_CROPS_RE.search(query)
+    return match.group(1).lower() if match else None
 
-pipeline_agent = SequentialAgent(
-    name="CropMarketPipelineAgent",
-    sub_agents=[step1_diagnosis_agent, step2_market_agent, step3_summarize_agent]
-)
 
-async def crop_market_pipeline_tool(query: str) -> str:
+async def crop_market_pipeline_tool(query: str, language: str = "") -> str:
     """
-    Runs a sequential pipeline for crop diagnosis and market analysis, then summarizes the combined result.
+    Diagnoses a crop problem and analyzes the market for that crop in one step, then summarizes both.
+    Use it when the farmer asks about a crop problem and about prices or selling in the same question.
     Args:
-        query (str): The initial query for diagnosis and market analysis.
+        query (str): The farmer's question, including the textual description of the symptoms.
+        language (str): Language of the farmer's question, e.g. "en", "hi" or "kn". Empty for the default.
     Returns:
-        str: A summarized plain text result from the pipeline.
+        str: Plain text summary of the diagnosis and the market advice, ready to give to the farmer.
     """
-    pipeline_runner = Runner(
-        app_name=f"{pipeline_agent.name}App",
-        agent=pipeline_agent,
-        session_service=_internal_session_service
-    )
-
-    pipeline_session_id = f"pipeline_session_{uuid.uuid4()}"
-    try:
-        await _internal_session_service.create_session(
-            app_name=f"{pipeline_agent.name}App",
-            user_id="pipeline_user",
-            session_id=pipeline_session_id
+    if _mentioned_crop(query):
+        # The crop is named in the question, so the market stage does not depend on the diagnosis.
+        PIPELINE_RUNS.inc(mode="concurrent")
+        diagnosis_json, market_json = await asyncio.gather(
+            crop_diagnosis_tool(query), market_analysis_tool(query)
         )
-        print(f"DEBUG: Created session '{pipeline_session_id}' for pipeline runner '{pipeline_agent.name}App'.")
-
-        final_pipeline_response_text = "No response from pipeline."
-
-        async def get_pipeline_events():
-            print(f"DEBUG: Running pipeline agent {pipeline_agent.name} via its Runner in a thread...")
-            results_list = await asyncio.to_thread(
-                lambda: list(pipeline_runner.run(
-                    user_id="pipeline_user",
-                    session_id=pipeline_session_id,
-                    new_message=genai_types.Content(role="user", parts=[genai_types.Part(text=query)])
-                ))
-            )
-            print(f"DEBUG: Collected {len(results_list)} events from pipeline agent {pipeline_agent.name} in thread.")
-            for event in results_list:
-                yield event
-
-        async for event in get_pipeline_events():
-            print(f"DEBUG (Pipeline Event from {pipeline_agent.name}): Type: {type(event)}, is_final_response: {getattr(event, 'is_final_response', False)}")
-            content = getattr(event, 'content', None)
-            if content:
-                print(f"DEBUG (Pipeline Content from {pipeline_agent.name}): {content}")
-                for part in content.parts:
-                    if getattr(part, 'text', None):
-                        print(f"   DEBUG (Pipeline Tool Response from {pipeline_agent.name}): TEXT: {part.text}")
-                        if getattr(event, 'is_final_response', False):
-                            final_pipeline_response_text = part.text
-                            break
-                    if getattr(part, 'function_call', None):
-                        print(f"   DEBUG (Pipeline Tool Response from {pipeline_agent.name}): FUNCTION CALL: {part.function_call.name}({part.function_call.args})")
-                    if getattr(part, 'error', None):
-                        print(f"   ERROR (Pipeline Tool Response from {pipeline_agent.name}): ERROR PART: {part.error}")
-                        final_pipeline_response_text = f"Error from {pipeline_agent.name}: {part.error.message}"
-                        break
-
-            if getattr(event, 'is_final_response', False) and final_pipeline_response_text != "No response from pipeline.":
-                break
-
-        return final_pipeline_response_text
-
+    else:
+        PIPELINE_RUNS.inc(mode="sequential")
+        diagnosis_json = await crop_diagnosis_tool(query)
+        market_json = await market_analysis_tool(f"{query}\nDiagnosis: {diagnosis_json}")
+
+    if _is_valid_structured_output(crop_diagnosis_agent, diagnosis_json) and \
+            _is_valid_structured_output(market_analysis_agent, market_json):
+        combined = f"[{diagnosis_json},{market_json}]"
+    else:
+        combined = f"{diagnosis_json}\n\n{market_json}"
+    return await summarize_output_tool(combined, language)
+
+# ---------------------- Fast-Path Handlers ----------------------
+# Answer a query routed by services.intent_router without the orchestrator. Each returns the
+# farmer-facing text, or None when the tool had no usable answer so the orchestrator takes over.
+
+async def _fast_path_calendar(crop: str, state: str) -> str | None:
+    calendar_entry = json.loads(await crop_calendar_tool(crop, state))
+    if "error" in calendar_entry:
+        return None
+    details = "; ".join(f"{key.replace('_', ' ')}: {value}" for key, value in calendar_entry.items())
+    return f"{crop.title()} in {state.title()} – {details}."
+
+
+async def _fast_path_weather(location: str) -> str | None:
+    try:
+        weather = await get_weather_forecast(location)
     except Exception as e:
-        print(f"ERROR: Error in pipeline agent '{pipeline_agent.name}' tool call: {e}")
-        import traceback
-        traceback.print_exc()
-        return f"Error processing request with {pipeline_agent.name}: {str(e)}"
+        logger.warning(f"Fast-path weather lookup failed for '{location}': {e}")
+        return None
+    place = ", ".join(part for part in (weather.location.region, weather.location.country) if part)
+    current = weather.current
+    lines = [
+        f"Weather for {place}: {current.temperature:.0f}°C, {current.condition.lower()}, "
+        f"wind {current.wind_kph:.0f} km/h, rain {current.precip_mm:.1f} mm.",
+        *(f"{day.date}: {day.avg_temp:.0f}°C, {day.condition.lower()}" for day in weather.forecast),
+        f"Sunrise {weather.astro.sunrise}, sunset {weather.astro.sunset}.",
+    ]
+    return "\n".join(lines)
+
+
+async def _fast_path_agent(tool, query: str) -> str | None:
+    tool_output = await tool(query)
+    if not _is_cacheable_response(tool_output):
+        return None
+    return await summarize_output_tool(tool_output)
+
+
+async def summarize_conversation(previous_summary: str, transcript: str) -> str | None:
+    """Updated conversation summary for services/conversation_context.compact_session, or None on failure."""
+    input_content = genai_types.Content(role="user", parts=[genai_types.Part(
+        text=f"Summary so far:\n{previous_summary or '(none)'}\n\nTurns since then:\n{transcript}"
+    )])
+    summary = await run_agent_and_get_text(conversation_summary_agent, input_content)
+    return summary if _is_cacheable_response(summary) else None
+
+
+async def run_fast_path(decision: RouteDecision) -> str | None:
+    """Runs the tool chosen by the intent router directly and returns the answer text, or None."""
+    if decision.intent == "calendar":
+        return await _fast_path_calendar(**decision.args)
+    if decision.intent == "weather":
+        return await _fast_path_weather(**decision.args)
+    if decision.intent == "market":
+        return await _fast_path_agent(market_analysis_tool, **decision.args)
+    if decision.intent == "scheme":
+        return await _fast_path_agent(scheme_navigator_tool, **decision.args)
+    return None
 
 kisan_orchestrator_agent = LlmAgent(
-    model=MODEL_NAME,
     name="KisanOrchestrator",
+    # Earlier turns of a continued session are sent as text plus a running summary (services/conversation_context.py).
+    **model_kwargs("KisanOrchestrator", before_model_callbacks=(compact_context,)),
     instruction="""
     You are an AI assistant designed to help farmers with crop health, market insights, and government schemes.
     You have access to specialized tools.
 
     **Instructions for Tool Use:**
     - Always summarize any JSON output from 'crop_diagnosis_tool', 'market_analysis_tool', or 'scheme_navigator_tool' using the 'summarize_output_tool' before giving the final response.
+    - Pass the language of the farmer's question to 'summarize_output_tool' as `language` ("en", "hi" or "kn", or the language name for others) and use its text as your answer.
 
     **Image and Text Handling:**
     - When the user provides input, first analyze ALL parts of the input, including any text and images.
@@ -350,7 +491,7 @@ kisan_orchestrator_agent = LlmAgent(
             - Use `crop_calendar_tool` if user asks about when to plant or harvest a crop.
 
     **Important Considerations:**
-    - Do NOT attempt to use the 'crop_market_pipeline_tool' directly at this time due to known framework limitations. If a query requires both diagnosis and market analysis, you must decide to call each tool individually and then summarize their combined output.
+    - If a query needs both a diagnosis and market analysis (e.g. a sick crop and whether to sell it), call `crop_market_pipeline_tool` once instead of the two tools separately. Its output is already summarized: give it to the farmer as-is, without calling `summarize_output_tool`.
     - Be concise and directly answer the farmer's question.
     """,
     tools=[
@@ -358,10 +499,8 @@ kisan_orchestrator_agent = LlmAgent(
         FunctionTool(market_analysis_tool),
         FunctionTool(scheme_navigator_tool),
         FunctionTool(summarize_output_tool),
-        # FunctionTool(get_weather_forecast()),
+        FunctionTool(get_weather_tool),
         FunctionTool(crop_calendar_tool),
-        # FunctionTool(crop_market_pipeline_tool), # UNCOMMENT IF YOU WANT TO TEST THE PIPELINE TOOL
+        FunctionTool(crop_market_pipeline_tool),
     ],
-)
-
-kisan_orchestrated_app = AdkApp(agent=kisan_orchestrator_agent)
\ No newline at end of file
+)
\ No newline at end of file
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, field_validator
+from typing import Literal
+
+# Result shapes of the JSON sub-agents. They are passed to LlmAgent(output_schema=...) so the model
+# answers in structured-output mode, and used to validate and normalize what comes back.
+
+
+class CropDiagnosisResult(BaseModel):
+    disease: str
+    organic_remedy: str
+    chemical_remedy: str
+    observed_symptoms_from_description: str
+
+
+class MarketAnalysisResult(BaseModel):
+    crop: str
+    market: str
+    price_today: str
+    trend: Literal["increasing", "decreasing", "stable"]
+    recommendation: Literal["Sell", "Hold"]
+
+    @field_validator("trend", mode="before")
+    @classmethod
+    def _lowercase_trend(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+    @field_validator("recommendation", mode="before")
+    @classmethod
+    def _capitalize_recommendation(cls, value):
+        return value.strip().capitalize() if isinstance(value, str) else value
+
+
+class SchemeInfoResult(BaseModel):
+    scheme_name: str
+    benefits: str
+    eligibility: str
+    how_to_apply: str
+    link: str
+
+
+class SummaryReviewResult(BaseModel):
+    status: Literal["pass", "fail"]
+    feedback: str
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
+
+# Body of POST /api/batch. Images are referenced, not uploaded: `image_url` is the public URL (or
+# blob name) of a photo the user sent before, e.g. the `image_url` of a /api/chat-history entry.
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = Field(default=None, max_length=200)
+    query: Optional[str] = Field(default=None, max_length=4000)
+    image_url: Optional[str] = Field(default=None, max_length=2000)
+
+    @model_validator(mode="after")
+    def _query_or_image(self):
+        if not (self.query and self.query.strip()) and not self.image_url:
+            raise ValueError("At least 'query' or 'image_url' must be provided.")
+        return self
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(min_length=1)
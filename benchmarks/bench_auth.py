@@ -0,0 +1,77 @@
+# bench_auth.py
+"""
+Benchmark of Firebase ID token verification overhead per request, using a local fake key set.
+
+Generates an RSA key and self-signed certificate, mints Firebase-shaped ID tokens with them and
+compares:
+
+  thread+verify  asyncio.to_thread + full signature verification on every request
+                 (what get_user_id_from_token did via auth.verify_id_token)
+  local verify   TokenVerifier on a cold cache (in-process signature verification)
+  cache hit      TokenVerifier for a token it has already verified
+
+Usage:
+    python benchmarks/bench_auth.py --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.auth import jwt as google_jwt
+
+from benchmarks.fakes import FakeTokenIssuer
+from services.token_cache import SigningKeySet, TokenVerifier
+
+PROJECT_ID = "bench-project"
+
+
+def report(label: str, durations: list[float]):
+    durations.sort()
+    print(f"{label:<14} mean {statistics.mean(durations) * 1e6:9.1f} us   "
+          f"p50 {durations[len(durations) // 2] * 1e6:9.1f} us   "
+          f"p99 {durations[int(len(durations) * 0.99) - 1] * 1e6:9.1f} us")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    issuer = FakeTokenIssuer(PROJECT_ID)
+    certs = issuer.certs
+    tokens = [issuer.mint(f"user-{i}") for i in range(args.requests)]
+
+    def full_verify(token: str, check_revoked: bool = False) -> dict:
+        return google_jwt.decode(token, certs=certs, audience=PROJECT_ID)
+
+    durations = []
+    for token in tokens:
+        started = time.perf_counter()
+        await asyncio.to_thread(full_verify, token)
+        durations.append(time.perf_counter() - started)
+    report("thread+verify", durations)
+
+    verifier = TokenVerifier(PROJECT_ID, SigningKeySet(certs=certs), fallback_verify=full_verify)
+    durations = []
+    for token in tokens:
+        started = time.perf_counter()
+        await verifier.verify(token)
+        durations.append(time.perf_counter() - started)
+    report("local verify", durations)
+
+    durations = []
+    for token in tokens:
+        started = time.perf_counter()
+        claims = await verifier.verify(token)
+        durations.append(time.perf_counter() - started)
+    assert claims["uid"] == f"user-{args.requests - 1}"
+    report("cache hit", durations)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
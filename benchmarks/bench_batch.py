@@ -0,0 +1,117 @@
+# bench_batch.py
+"""
+/api/batch versus the same questions sent as separate /api/simple requests.
+
+Starts benchmarks/load_app.py (stub model, fake Firebase), then answers --items questions drawn
+from bench_load.py's text, market and scheme queries (with some repeats, as field officers' lists
+have) twice:
+
+  separate   one authenticated /api/simple request per question, --concurrency at a time
+  batch      one /api/batch request, BATCH_MAX_CONCURRENCY=--concurrency on the server
+
+and reports the time to the first and to the last answer, and the median time at which answers
+arrived. The batch streams each result as it completes, so its first answers arrive long before
+the slowest one.
+
+Usage:
+    python benchmarks/bench_batch.py
+    python benchmarks/bench_batch.py --items 40 --concurrency 8 --llm-latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.bench_load import QUERIES, start_server, wait_until_ready
+from benchmarks.fakes import FakeTokenIssuer
+from benchmarks.load_app import PROJECT_ID
+
+KINDS = ("text", "market", "scheme", "stream")
+
+
+async def run_separate(client: httpx.AsyncClient, token: str, queries: list[str], concurrency: int) -> list[float]:
+    """Seconds from the start at which each answer arrived."""
+    headers = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def one(query: str) -> float:
+        async with semaphore:
+            response = await client.post("/api/simple", headers=headers, data={"query": query})
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+    return sorted(await asyncio.gather(*(one(query) for query in queries)))
+
+
+async def run_batch(client: httpx.AsyncClient, token: str, queries: list[str]) -> list[float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    items = [{"id": str(i), "query": query} for i, query in enumerate(queries)]
+    arrivals = []
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/batch", headers=headers, json={"items": items}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            result = json.loads(line)
+            if result.get("done"):
+                break
+            if result["status"] != 200:
+                raise RuntimeError(f"batch item {result['id']} failed: {result.get('error')}")
+            arrivals.append(time.perf_counter() - started)
+    return arrivals
+
+
+def report(name: str, arrivals: list[float]):
+    print(f"  {name:<9} first {arrivals[0]:6.2f}s  median {statistics.median(arrivals):6.2f}s  "
+          f"last {arrivals[-1]:6.2f}s  ({len(arrivals)} answers)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="stub model time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--firestore-latency", type=float, default=0.05)
+    parser.add_argument("--storage-latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8792)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+    # Both runs share the server's caches; the response cache is off so the second run is not served from the first.
+    args.server_env = [f"BATCH_MAX_CONCURRENCY={args.concurrency}", "RESPONSE_CACHE_BACKEND=none"]
+
+    rng = random.Random(args.seed)
+    queries = [f"{QUERIES[rng.choice(KINDS)]} (field {rng.randrange(args.items * 3 // 4)})" for _ in range(args.items)]
+    issuer = FakeTokenIssuer(PROJECT_ID)
+    token = issuer.mint("field-officer")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        certs_path = os.path.join(workdir, "certs.json")
+        with open(certs_path, "w", encoding="utf-8") as f:
+            json.dump(issuer.certs, f)
+        server = start_server(args.port, certs_path, args)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout) as client:
+                await wait_until_ready(client, server, args.timeout)
+                await run_separate(client, token, [QUERIES["text"]], 1)
+                print(f"{args.items} questions ({len(set(queries))} distinct), concurrency {args.concurrency}, "
+                      f"stub model latency {args.llm_latency}s")
+                report("separate", await run_separate(client, token, queries, args.concurrency))
+                report("batch", await run_batch(client, token, queries))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
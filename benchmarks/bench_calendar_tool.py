@@ -0,0 +1,86 @@
+# bench_calendar_tool.py
+"""
+Micro-benchmark of crop_calendar_tool: the previous implementation (open + json.load of
+data/crop_calendar.json on every call) against the preloaded, normalized index.
+
+A synthetic calendar (--crops x --states entries) is written to a temporary directory.
+
+Usage:
+    python benchmarks/bench_calendar_tool.py --calls 5000 --crops 60 --states 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_calendar(directory: str, crops: int, states: int) -> str:
+    calendar = {
+        f"crop{c}": {
+            f"State Number{s}": {"sowing": "June-July", "harvesting": "October-November", "season": "Kharif"}
+            for s in range(states)
+        }
+        for c in range(crops)
+    }
+    calendar["tomato"] = {"Tamil Nadu": {"sowing": "December-January", "harvesting": "March-April"}}
+    os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+    path = os.path.join(directory, "data", "crop_calendar.json")
+    with open(path, "w") as f:
+        json.dump(calendar, f)
+    return path
+
+
+async def previous_crop_calendar_tool(crop: str, state: str) -> str:
+    """The pre-change implementation (relies on the current working directory)."""
+    try:
+        with open("data/crop_calendar.json", "r") as f:
+            calendar = json.load(f)
+
+        crop_data = calendar.get(crop.lower(), {})
+        state_data = crop_data.get(state.title())
+        if not state_data:
+            return json.dumps({"error": f"No data for {crop} in {state}"})
+
+        return json.dumps(state_data)
+
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+
+async def measure(label: str, tool, calls: int, crop: str, state: str):
+    await tool(crop, state)  # warm-up / initial load
+    started = time.perf_counter()
+    for _ in range(calls):
+        result = await tool(crop, state)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<38} {elapsed / calls * 1e6:10.1f} us/call   -> {result[:60]}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--crops", type=int, default=60)
+    parser.add_argument("--states", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_calendar(directory, args.crops, args.states)
+        os.environ["CROP_CALENDAR_PATH"] = path
+        from tools.calendar_tool import crop_calendar_tool
+
+        os.chdir(directory)
+        print(f"calendar: {os.path.getsize(path):,} bytes, {args.crops + 1} crops")
+        await measure("before (exact key)", previous_crop_calendar_tool, args.calls, "crop7", "State Number3")
+        await measure("after (exact key)", crop_calendar_tool, args.calls, "crop7", "State Number3")
+        await measure("before (alias 'tamatar', 'TN')", previous_crop_calendar_tool, args.calls, "tamatar", "TN")
+        await measure("after (alias 'tamatar', 'TN')", crop_calendar_tool, args.calls, "tamatar", "TN")
+        await measure("after (fuzzy 'tomatoe', 'Tamilnadu')", crop_calendar_tool, args.calls, "tomatoe", "Tamilnadu")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
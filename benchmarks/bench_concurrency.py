@@ -0,0 +1,115 @@
+# bench_concurrency.py
+"""
+Concurrency benchmark for agent execution inside an async FastAPI handler.
+
+Drives N parallel requests against two handlers backed by the same stub agent (a BaseAgent that
+awaits a fixed delay, standing in for an LLM round trip):
+
+  /blocking  iterates the synchronous Runner.run() generator, as /api/simple used to.
+  /async     iterates Runner.run_async() under the AdmissionController, as /api/simple does now.
+
+With the async path, N requests finish in roughly the time of one; with the blocking path the
+event loop is held by each request in turn and the total grows towards N x the agent latency.
+
+Usage:
+    python benchmarks/bench_concurrency.py --requests 8 --delay 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from contextlib import aclosing
+from typing import AsyncGenerator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from services.admission import AdmissionController
+
+
+class SleepyAgent(BaseAgent):
+    """Stub agent that simulates an LLM round trip with a non-blocking sleep."""
+    delay: float = 0.5
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        await asyncio.sleep(self.delay)
+        yield Event(author=self.name, content=types.Content(role="model", parts=[types.Part(text="done")]))
+
+
+def build_app(delay: float, max_concurrent: int) -> FastAPI:
+    session_service = InMemorySessionService()
+    runner = Runner(app_name="BenchApp", agent=SleepyAgent(name="SleepyAgent", delay=delay),
+                    session_service=session_service)
+    admission = AdmissionController(max_concurrent=max_concurrent, max_queue=1000, queue_timeout=60)
+    app = FastAPI()
+    message = types.Content(role="user", parts=[types.Part(text="hello")])
+
+    async def new_session() -> str:
+        session_id = str(uuid.uuid4())
+        await session_service.create_session(app_name="BenchApp", user_id="bench", session_id=session_id)
+        return session_id
+
+    @app.post("/blocking")
+    async def blocking():
+        session_id = await new_session()
+        for event in runner.run(user_id="bench", session_id=session_id, new_message=message):
+            if event.is_final_response():
+                break
+        return {"ok": True}
+
+    @app.post("/async")
+    async def non_blocking():
+        session_id = await new_session()
+        async with admission.slot():
+            async with aclosing(runner.run_async(user_id="bench", session_id=session_id,
+                                                 new_message=message)) as events:
+                async for event in events:
+                    if event.is_final_response():
+                        break
+        return {"ok": True}
+
+    return app
+
+
+async def drive(app: FastAPI, path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(path) for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.5, help="Simulated agent latency in seconds")
+    parser.add_argument("--max-concurrent", type=int, default=64)
+    args = parser.parse_args()
+
+    app = build_app(args.delay, args.max_concurrent)
+    single = await drive(app, "/async", 1)
+    blocking = await drive(app, "/blocking", args.requests)
+    non_blocking = await drive(app, "/async", args.requests)
+
+    print(f"single request           : {single:.2f}s")
+    print(f"{args.requests} x blocking Runner.run : {blocking:.2f}s ({blocking / single:.1f}x single)")
+    print(f"{args.requests} x Runner.run_async    : {non_blocking:.2f}s ({non_blocking / single:.1f}x single)")
+    if non_blocking > single * 2:
+        print("FAIL: parallel async requests took more than 2x a single request")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
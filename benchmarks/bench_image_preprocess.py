@@ -0,0 +1,82 @@
+# bench_image_preprocess.py
+"""
+Benchmark of the image preprocessing stage over a folder of sample leaf photos.
+
+Reports, per image and in total, the original size, the size actually sent to the model and the
+decode + resize + encode time. Without --folder, synthetic 4000x3000 photo-like JPEGs are generated.
+
+Usage:
+    python benchmarks/bench_image_preprocess.py --folder ~/leaf_photos --max-dimension 1024 --quality 80
+"""
+import argparse
+import io
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from services.image_preprocess import preprocess_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic")
+
+
+def synthetic_photos(count: int) -> list[tuple[str, bytes]]:
+    """Leaf-green noisy images with blotches, saved at phone-camera resolution and quality."""
+    photos = []
+    rng = random.Random(42)
+    for index in range(count):
+        image = Image.effect_noise((4000, 3000), 60).convert("RGB")
+        tint = Image.new("RGB", image.size, (40 + rng.randint(0, 40), 110 + rng.randint(0, 60), 30))
+        image = Image.blend(image, tint, 0.6)
+        draw = ImageDraw.Draw(image)
+        for _ in range(120):
+            x, y, radius = rng.randint(0, 4000), rng.randint(0, 3000), rng.randint(10, 90)
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=(120, 90, 20))
+        image = image.filter(ImageFilter.GaussianBlur(1))
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=95)
+        photos.append((f"synthetic_{index}.jpg", output.getvalue()))
+    return photos
+
+
+def folder_photos(folder: str) -> list[tuple[str, bytes]]:
+    photos = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(folder, name), "rb") as f:
+                photos.append((name, f.read()))
+    return photos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", help="Folder of sample photos (default: synthetic photos)")
+    parser.add_argument("--synthetic-count", type=int, default=5)
+    parser.add_argument("--max-dimension", type=int, default=1024)
+    parser.add_argument("--quality", type=int, default=80)
+    args = parser.parse_args()
+
+    photos = folder_photos(args.folder) if args.folder else synthetic_photos(args.synthetic_count)
+    if not photos:
+        sys.exit(f"No images found in {args.folder}")
+
+    total_original = total_sent = 0
+    total_seconds = 0.0
+    print(f"{'image':<28} {'original':>12} {'sent':>10} {'saved':>7} {'encode':>9}")
+    for name, data in photos:
+        prepared = preprocess_image(data, args.max_dimension, args.quality)
+        total_original += prepared.original_bytes
+        total_sent += prepared.sent_bytes
+        total_seconds += prepared.encode_seconds
+        print(f"{name[:28]:<28} {prepared.original_bytes:>12,} {prepared.sent_bytes:>10,} "
+              f"{1 - prepared.sent_bytes / prepared.original_bytes:>6.1%} {prepared.encode_seconds * 1000:>7.1f}ms")
+
+    print(f"{'TOTAL':<28} {total_original:>12,} {total_sent:>10,} {1 - total_sent / total_original:>6.1%} "
+          f"{total_seconds / len(photos) * 1000:>7.1f}ms avg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_intent_router.py
+"""
+Measures the local intent router: which share of typical farmer questions it answers on the fast
+path, and what routing costs per query (the orchestrator LLM's routing step it replaces takes
+seconds). Uses a small generated crop calendar.
+
+Usage:
+    python benchmarks/bench_intent_router.py --iterations 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_QUERIES = [
+    "When to sow paddy in Karnataka?",
+    "best time to plant tamatar in TN",
+    "when is wheat harvested in Punjab",
+    "ragi sowing season in Karnataka",
+    "weather in Mandya tomorrow",
+    "Will it rain at 12.97, 77.59?",
+    "mausam for Hubli this week",
+    "tomato price in Hubli today",
+    "onion mandi rate Lasalgaon",
+    "should I sell my cotton now?",
+    "how to apply for PM Kisan yojana",
+    "subsidy for drip irrigation",
+    "kisan credit card eligibility",
+    "my tomato leaves have yellow spots",
+    "white insects under chilli leaves, what spray?",
+    "price of rice and weather in Mysore",
+    "is it a good time to sow and also what is the market price of maize",
+    "what is the weather today?",
+    "hello",
+    "which fertilizer is best for sugarcane",
+    # Must go to the orchestrator: no real place named, or no crop named.
+    "Is rain expected in the next 3 days?",
+    "what is the temperature at which wheat seeds germinate",
+    "How is the weather for spraying",
+    "weather in my area",
+    "What is the weather like in the village?",
+    "How to store onions for a better price",
+    "weather in karnataka today",
+]
+
+
+def write_calendar(directory: str) -> str:
+    states = ["Karnataka", "Tamil Nadu", "Punjab", "Maharashtra"]
+    calendar = {
+        crop: {state: {"sowing": "June-July", "harvesting": "October-November"} for state in states}
+        for crop in ["rice", "wheat", "tomato", "finger millet", "maize", "cotton", "onion"]
+    }
+    path = os.path.join(directory, "crop_calendar.json")
+    with open(path, "w") as f:
+        json.dump(calendar, f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["CROP_CALENDAR_PATH"] = write_calendar(directory)
+        from services.intent_router import IntentRouter
+
+        router = IntentRouter()
+        routes = Counter()
+        for query in SAMPLE_QUERIES:
+            decision = router.route(query)
+            routes[decision.intent if decision else "orchestrator"] += 1
+            print(f"  {decision.intent if decision else '-':<10} {query}")
+
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            for query in SAMPLE_QUERIES:
+                router.route(query)
+        per_query = (time.perf_counter() - started) / (args.iterations * len(SAMPLE_QUERIES))
+
+    fast = len(SAMPLE_QUERIES) - routes["orchestrator"]
+    print(f"fast path: {fast}/{len(SAMPLE_QUERIES)} queries ({dict(routes)})")
+    print(f"routing cost: {per_query * 1e6:.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# bench_load.py
+"""
+Offline load test of main.py: throughput, latency percentiles, memory growth and model calls per request.
+
+Starts benchmarks/load_app.py under uvicorn (the production app with a stub model and fake Firebase,
+no network or quota needed), then for each --concurrency level sends --requests requests from that many
+concurrent clients. Requests are drawn from a seeded mix of:
+
+  text       /api/simple, crop problem in words (orchestrator -> diagnosis sub-agent -> summary)
+  image      /api/simple with a JPEG (image preprocessing, Storage upload, diagnosis)
+  market     /api/simple, price question (usually answered on the fast path, then from the cache)
+  scheme     /api/simple, scheme question (fast path)
+  stream     /api/simple/stream (time to the first answer text is reported as well)
+  followup   /api/simple, a follow-up question continuing the user's conversation (session_id), so
+             conversations grow over the run; the first one starts with the text question
+  history    /api/chat-history, first page
+
+over --users users, each with a valid ID token. Per level, the report has throughput, p50/p90/p99/max
+latency and errors per request kind, the server's resident memory before and after, model calls per
+request by route and model input tokens per orchestrator request by conversation turn (from
+/api/metrics). --output writes it as JSON for tracking across releases.
+
+Usage:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --concurrency 1 8 32 --requests 400 --llm-latency 1.0 --output load.json
+    python benchmarks/bench_load.py --mix text=1 history=1 --server-env RESPONSE_CACHE_BACKEND=none
+    python benchmarks/bench_load.py --mix followup=1 --users 5 --concurrency 1 4
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from PIL import Image
+
+from benchmarks.fakes import FakeTokenIssuer
+from benchmarks.load_app import PROJECT_ID
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = {
+    "text": "My tomato leaves have yellow spots with brown rings. What disease is this and what should I spray?",
+    "image": "What is wrong with my plant?",
+    "market": "What is the tomato price in Hubli market today?",
+    "scheme": "Which government scheme gives income support to small farmers?",
+    "stream": "My chilli leaves are curling and have small white pests underneath. What should I do?",
+    "followup": "And what about the chemical remedy? Is it safe to spray before the rain?",
+}
+DEFAULT_MIX = ["text=4", "image=2", "market=2", "scheme=1", "stream=1", "history=2"]
+
+
+def make_image(size: tuple[int, int] = (1600, 1200)) -> bytes:
+    rng = random.Random(1)
+    image = Image.new("RGB", (size[0] // 8, size[1] // 8))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(image.width * image.height)])
+    buffer = io.BytesIO()
+    image.resize(size).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(durations: list[float]) -> dict:
+    values = sorted(durations)
+    return {
+        "mean_s": round(statistics.mean(values), 4),
+        "p50_s": round(percentile(values, 0.50), 4),
+        "p90_s": round(percentile(values, 0.90), 4),
+        "p99_s": round(percentile(values, 0.99), 4),
+        "max_s": round(values[-1], 4),
+    }
+
+
+def _child_pids(pid: int) -> list[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The parent pid is the second field after the parenthesized command name.
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid:
+            children.append(int(entry))
+    return children
+
+
+def server_rss_mb(pid: int) -> float | None:
+    """Resident memory of the server process and its workers (gunicorn), in MB."""
+    total_kb = 0
+    for process in [pid, *_child_pids(pid)]:
+        try:
+            with open(f"/proc/{process}/status", "r") as f:
+                match = re.search(r"VmRSS:\s+(\d+) kB", f.read())
+        except OSError:
+            continue
+        total_kb += int(match.group(1)) if match else 0
+    return round(total_kb / 1024, 1) if total_kb else None
+
+
+_SAMPLE_RE = re.compile(r'^(\w+)(?:\{([^}]*)\})? (\S+)$')
+
+
+def scrape(text: str, names: set[str]) -> dict[tuple[str, tuple], float]:
+    """Samples of the given metric names from Prometheus text, keyed by (name, sorted label pairs)."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if not match or match.group(1) not in names:
+            continue
+        labels = tuple(sorted(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or "")))
+        samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+async def histogram_totals(client: httpx.AsyncClient, name: str, label: str,
+                           only: dict | None = None) -> dict[str, tuple[float, float]]:
+    """`label` value -> (sum, count) so far of the histogram `name`, from /api/metrics."""
+    response = await client.get("/api/metrics")
+    samples = scrape(response.text, {f"{name}_sum", f"{name}_count"})
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for (sample_name, labels), value in samples.items():
+        labels = dict(labels)
+        if any(labels.get(key) != expected for key, expected in (only or {}).items()):
+            continue
+        totals[labels[label]][0 if sample_name.endswith("_sum") else 1] += value
+    return {key: (total, count) for key, (total, count) in totals.items()}
+
+
+def mean_since(before: dict[str, tuple[float, float]], after: dict[str, tuple[float, float]]) -> dict[str, float]:
+    """Per-key mean of the observations made between two histogram_totals() readings."""
+    means = {}
+    for key, (total, count) in after.items():
+        before_total, before_count = before.get(key, (0.0, 0.0))
+        if count > before_count:
+            means[key] = round((total - before_total) / (count - before_count), 2)
+    return means
+
+
+async def server_counters(client: httpx.AsyncClient) -> dict:
+    return {
+        "model_calls": await histogram_totals(client, "kisan_llm_calls_per_request", "route"),
+        "input_tokens": await histogram_totals(client, "kisan_llm_input_tokens_per_request", "turn",
+                                               only={"route": "orchestrator"}),
+    }
+
+
+# user -> session id of their conversation, continued by "followup" requests.
+_conversations: dict[str, str] = {}
+
+
+async def send(client: httpx.AsyncClient, kind: str, token: str, image: bytes) -> tuple[bool, float | None]:
+    """Sends one request of `kind`; returns (ok, seconds to the first answer text for streams)."""
+    headers = {"Authorization": f"Bearer {token}"}
+    if kind == "followup":
+        session_id = _conversations.get(token)
+        data = {"query": QUERIES[kind], "session_id": session_id} if session_id else {"query": QUERIES["text"]}
+        response = await client.post("/api/simple", headers=headers, data=data)
+        if response.status_code == 200:
+            _conversations[token] = response.json().get("session_id") or session_id
+        return response.status_code == 200, None
+    if kind == "history":
+        response = await client.get("/api/chat-history", headers=headers)
+        return response.status_code == 200, None
+    if kind == "image":
+        files = {"image": ("leaf.jpg", image, "image/jpeg")}
+        response = await client.post("/api/simple", headers=headers, data={"query": QUERIES[kind]}, files=files)
+        return response.status_code == 200, None
+    if kind == "stream":
+        started = time.perf_counter()
+        first_text, final = None, False
+        async with client.stream("POST", "/api/simple/stream", headers=headers, data={"query": QUERIES[kind]}) as response:
+            async for line in response.aiter_lines():
+                if line in ("event: partial", "event: final"):
+                    first_text = first_text or time.perf_counter() - started
+                final = final or line == "event: final"
+        return response.status_code == 200 and final, first_text
+    response = await client.post("/api/simple", headers=headers, data={"query": QUERIES[kind]})
+    return response.status_code == 200, None
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, plan: list[tuple[str, int]], tokens: list[str],
+                    image: bytes, server_pid: int) -> dict:
+    results = defaultdict(lambda: {"durations": [], "errors": 0, "first_text": []})
+    queue = list(reversed(plan))
+    counters_before = await server_counters(client)
+    rss_before = server_rss_mb(server_pid)
+
+    async def worker():
+        while queue:
+            kind, user = queue.pop()
+            started = time.perf_counter()
+            try:
+                ok, first_text = await send(client, kind, tokens[user], image)
+            except httpx.HTTPError:
+                ok, first_text = False, None
+            result = results[kind]
+            result["durations"].append(time.perf_counter() - started)
+            result["errors"] += not ok
+            if first_text is not None:
+                result["first_text"].append(first_text)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    counters_after = await server_counters(client)
+
+    kinds = {}
+    for kind, result in sorted(results.items()):
+        kinds[kind] = {"requests": len(result["durations"]), "errors": result["errors"], **summarize(result["durations"])}
+        if result["first_text"]:
+            kinds[kind]["first_text_p50_s"] = summarize(result["first_text"])["p50_s"]
+
+    all_durations = [d for result in results.values() for d in result["durations"]]
+    return {
+        "concurrency": concurrency,
+        "requests": len(plan),
+        "errors": sum(result["errors"] for result in results.values()),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(plan) / elapsed, 2),
+        "latency": summarize(all_durations),
+        "by_kind": kinds,
+        "model_calls_per_request": mean_since(counters_before["model_calls"], counters_after["model_calls"]),
+        "input_tokens_by_turn": mean_since(counters_before["input_tokens"], counters_after["input_tokens"]),
+        "server_rss_mb": {"before": rss_before, "after": server_rss_mb(server_pid)},
+    }
+
+
+def start_server(port: int, certs_path: str, args, workers: int | None = None) -> subprocess.Popen:
+    """Starts load_app under uvicorn, or under gunicorn with `workers` workers like the Dockerfile does."""
+    env = {
+        **os.environ,
+        "LOAD_TEST_CERTS": certs_path,
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "STUB_LLM_TOKEN_DELAY": str(args.token_delay),
+        "LOAD_FIRESTORE_LATENCY": str(args.firestore_latency),
+        "LOAD_STORAGE_LATENCY": str(args.storage_latency),
+        "LOG_LEVEL": "WARNING",
+        # ADK warns about the default of summarize_output_tool's `language` on every orchestrator turn.
+        "LOG_LIBRARY_LEVEL": "ERROR",
+        "CONVERSATION_SPILL_PATH": os.path.join(os.path.dirname(certs_path), "spill.jsonl"),
+    }
+    for assignment in args.server_env:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+    if workers is None:
+        command = [sys.executable, "-m", "uvicorn", "benchmarks.load_app:app", "--port", str(port),
+                   "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker",
+                   "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "benchmarks.load_app:app"]
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env=env)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"load_app exited with {server.returncode}")
+        try:
+            if (await client.get("/api/ping")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"load_app not ready after {timeout:.0f}s")
+
+
+def git_revision() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def print_level(level: dict):
+    print(f"\nconcurrency {level['concurrency']}: {level['requests']} requests in {level['duration_s']:.1f}s, "
+          f"{level['throughput_rps']:.1f} req/s, {level['errors']} errors, "
+          f"server RSS {level['server_rss_mb']['before']} -> {level['server_rss_mb']['after']} MB")
+    for kind, stats in level["by_kind"].items():
+        first_text = f"  first text p50 {stats['first_text_p50_s']:.2f}s" if "first_text_p50_s" in stats else ""
+        print(f"  {kind:<8} n={stats['requests']:<5} err={stats['errors']:<3} p50 {stats['p50_s']:6.2f}s  "
+              f"p90 {stats['p90_s']:6.2f}s  p99 {stats['p99_s']:6.2f}s  max {stats['max_s']:6.2f}s{first_text}")
+    calls = ", ".join(f"{route} {value}" for route, value in sorted(level["model_calls_per_request"].items()))
+    print(f"  model calls per request: {calls or '-'}")
+    tokens = ", ".join(f"turn {turn} {value:.0f}" for turn, value in sorted(level["input_tokens_by_turn"].items()))
+    print(f"  orchestrator input tokens per request: {tokens or '-'}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mix", nargs="+", default=DEFAULT_MIX, help="kind=weight pairs")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="stub model time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="stub model delay between streamed chunks (s)")
+    parser.add_argument("--firestore-latency", type=float, default=0.05)
+    parser.add_argument("--storage-latency", type=float, default=0.2)
+    parser.add_argument("--server-env", nargs="*", default=[], help="NAME=value settings for the server")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    weights = {kind: float(weight) for kind, _, weight in (item.partition("=") for item in args.mix)}
+    unknown = set(weights) - set(QUERIES) - {"history"}
+    if unknown:
+        parser.error(f"unknown request kinds in --mix: {sorted(unknown)}")
+    rng = random.Random(args.seed)
+
+    def plan(count: int) -> list[tuple[str, int]]:
+        kinds = rng.choices(list(weights), weights=list(weights.values()), k=count)
+        return [(kind, rng.randrange(args.users)) for kind in kinds]
+
+    issuer = FakeTokenIssuer(PROJECT_ID)
+    tokens = [issuer.mint(f"load-user-{i}") for i in range(args.users)]
+    image = make_image()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        certs_path = os.path.join(workdir, "certs.json")
+        with open(certs_path, "w", encoding="utf-8") as f:
+            json.dump(issuer.certs, f)
+        server = start_server(args.port, certs_path, args)
+        limits = httpx.Limits(max_connections=max(args.concurrency) + 4, max_keepalive_connections=max(args.concurrency) + 4)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout,
+                                         limits=limits) as client:
+                await wait_until_ready(client, server, args.timeout)
+                # Waits for the background agent import and fills the caches a running instance would have.
+                await run_level(client, 1, [("text", 0)] + plan(args.warmup), tokens, image, server.pid)
+                initial_rss = server_rss_mb(server.pid)
+                print(f"stub model latency {args.llm_latency}s, {args.users} users, mix {' '.join(args.mix)}, "
+                      f"server RSS after warm-up {initial_rss} MB")
+
+                levels = []
+                for concurrency in args.concurrency:
+                    level = await run_level(client, concurrency, plan(args.requests), tokens, image, server.pid)
+                    print_level(level)
+                    levels.append(level)
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "benchmark": "bench_load",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "server_rss_mb_after_warmup": initial_rss,
+        "server_rss_growth_mb": (round(levels[-1]["server_rss_mb"]["after"] - initial_rss, 1)
+                                 if levels and initial_rss and levels[-1]["server_rss_mb"]["after"] else None),
+        "levels": levels,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nreport written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
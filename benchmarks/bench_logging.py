@@ -0,0 +1,128 @@
+# bench_logging.py
+"""
+Per-request logging overhead: the old print() debugging versus the sampled structured logging.
+
+One simulated request is an image diagnosis routed through the orchestrator: the request and query
+lines in main.py, run_agent_and_get_text's input line (a Content carrying a --image-kb JPEG), and
+--events internal agent events (function calls, then the final text) in _run_until_final_text.
+"old" replays the print() calls the code had before; the other modes run the current calls through
+configure_logging() with the given level, sample rate and enqueue setting. Output goes to a temp file
+so terminal speed does not count; the time includes waiting for enqueued records to be written.
+
+Usage:
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --requests 500 --image-kb 600 --events 12
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.genai import types as genai_types
+from loguru import logger
+
+from services import logging_setup
+from services.logging_setup import bind_request, configure_logging, debug_sampled, describe_content, truncate
+
+
+def _request_content(image_kb: int) -> genai_types.Content:
+    return genai_types.Content(role="user", parts=[
+        genai_types.Part(text="My tomato leaves have yellow spots with brown rings, what is it?"),
+        genai_types.Part(inline_data=genai_types.Blob(mime_type="image/jpeg", data=os.urandom(image_kb * 1024))),
+    ])
+
+
+def _events(count: int) -> list[tuple[str, genai_types.Content, bool]]:
+    events = []
+    for i in range(count - 1):
+        call = genai_types.FunctionCall(name="get_weather_forecast", args={"location": "Nashik", "days": i})
+        events.append(("CropDiagnosisAgent", genai_types.Content(role="model", parts=[genai_types.Part(function_call=call)]), False))
+    answer = "Early blight (Alternaria solani). Remove affected leaves and spray mancozeb 2 g/L. " * 8
+    events.append(("CropDiagnosisAgent", genai_types.Content(role="model", parts=[genai_types.Part(text=answer)]), True))
+    return events
+
+
+def old_request(content, events, user_id: str):
+    # main.py
+    print(f"DEBUG: Received request from user_id: {user_id} on /api/simple")
+    print(f"DEBUG: Query: '{content.parts[0].text}'")
+    print("DEBUG: Image received. Storing as inline_data.")
+    # agent.run_agent_and_get_text / _run_until_final_text
+    print(f"DEBUG: Calling internal agent 'CropDiagnosisAgent' with input_content: '{content}'")
+    print("DEBUG: Created session 'tool_session_x' for internal runner 'CropDiagnosisAgent_runner'.")
+    for author, event_content, final in events:
+        print(f"DEBUG (Internal Agent Event from {author}): is_final_response: {final}")
+        for part in event_content.parts:
+            if part.function_call:
+                print(f"   DEBUG (Tool Response from {author}): FUNCTION CALL: {part.function_call.name}({part.function_call.args})")
+        if final:
+            print(f"   DEBUG (Tool Response from {author}): TEXT: {event_content.parts[0].text}")
+    print(f"DEBUG: Agent final response for {user_id}: {events[-1][1].parts[0].text}")
+
+
+def new_request(content, events, user_id: str):
+    bind_request()
+    logger.info("Request received on /api/simple", user_id=user_id, has_image=True)
+    logger.debug(f"Query: {truncate(content.parts[0].text)}")
+    if debug_sampled():
+        logger.debug(f"Calling internal agent 'CropDiagnosisAgent' with {describe_content(content)}")
+    for author, event_content, final in events:
+        if debug_sampled():
+            logger.debug(f"Internal agent event from {author} (final: {final}): {describe_content(event_content)}")
+    logger.info("Orchestrator answered", user_id=user_id, response_chars=len(events[-1][1].parts[0].text))
+
+
+def run(mode: str, content, events, requests: int) -> tuple[float, int]:
+    """(seconds for `requests` requests, bytes written)."""
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as sink:
+        if mode == "old":
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(sink):
+                for i in range(requests):
+                    old_request(content, events, f"user-{i}")
+                sink.flush()
+            elapsed = time.perf_counter() - started
+        else:
+            level, rate, enqueue = MODES[mode]
+            logging_setup.LOG_DEBUG_SAMPLE_RATE = rate
+            configure_logging(level=level, log_format="json", enqueue=enqueue, stream=sink)
+            started = time.perf_counter()
+            for i in range(requests):
+                new_request(content, events, f"user-{i}")
+            logger.complete()
+            elapsed = time.perf_counter() - started
+            logger.remove()
+        return elapsed, sink.tell()
+
+
+MODES = {
+    # mode: (LOG_LEVEL, LOG_DEBUG_SAMPLE_RATE, LOG_ENQUEUE)
+    "info": ("INFO", 0.1, False),
+    "info-enqueue": ("INFO", 0.1, True),
+    "debug-sampled": ("DEBUG", 0.1, False),
+    "debug-all": ("DEBUG", 1.0, False),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--image-kb", type=int, default=300)
+    parser.add_argument("--events", type=int, default=6)
+    parser.add_argument("--modes", nargs="*", default=["old", *MODES])
+    args = parser.parse_args()
+
+    content, events = _request_content(args.image_kb), _events(args.events)
+    print(f"{args.requests} requests, {args.image_kb} KB image, {args.events} agent events each")
+    for mode in args.modes:
+        elapsed, written = run(mode, content, events, args.requests)
+        print(f"  {mode:<14} {elapsed / args.requests * 1e6:9.1f} us/request  "
+              f"{written / args.requests / 1024:8.1f} KB logged/request")
+
+
+if __name__ == "__main__":
+    main()
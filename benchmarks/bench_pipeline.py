@@ -0,0 +1,127 @@
+# bench_pipeline.py
+"""
+End-to-end timing of a combined "diagnosis + should I sell" question, with stub LLM calls.
+
+  tool-by-tool   what the orchestrator did without the pipeline: an LLM turn to call the diagnosis
+                 tool, another for the market tool, another for the summary, then the final answer
+  pipeline       one orchestrator turn calling crop_market_pipeline_tool (diagnosis and market run
+                 concurrently when the crop is named, summary rendered locally), then the answer
+
+Every model call (orchestrator turn or sub-agent) sleeps --llm-latency seconds. Before timing, it
+checks which crop (if any) the pipeline reads from sample questions, including ordinary sentences
+with words that are also short crop aliases ("gram", "bale", "rai"), which must not count as a crop.
+
+Usage:
+    python benchmarks/bench_pipeline.py --llm-latency 1.5 --runs 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "bench")
+os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import agent
+
+CANNED_OUTPUTS = {
+    "CropDiagnosisAgentApp": '{"disease": "Early blight", "organic_remedy": "Neem oil spray", '
+                             '"chemical_remedy": "Mancozeb 2 g/L", "observed_symptoms_from_description": "Brown ringed spots"}',
+    "MarketAnalysisAgentApp": '{"crop": "Tomato", "market": "Hubli", "price_today": "₹1800/quintal", '
+                              '"trend": "increasing", "recommendation": "Hold"}',
+    "SummaryAgentApp": "Summary of the diagnosis and the market.",
+}
+
+
+# (question, crop the pipeline should take from it, or None to wait for the diagnosis)
+CROP_MENTION_CASES = [
+    ("My tomato leaves have brown ringed spots. Should I sell my tomatoes in Hubli now?", "tomato"),
+    ("Tamatar ke patte peele ho gaye, kya abhi bechna chahiye?", "tamatar"),
+    ("Tur dal price in Gulbarga mandi after the pod borer attack?", "tur"),
+    ("Gram price in Indore, and the leaves are wilting", "gram"),
+    ("Bengal gram plants are wilting, should I sell now?", "bengal gram"),
+    ("I mixed 50 gram of urea per litre and the leaves burned. Should I sell now?", None),
+    ("A bale of straw near the field caught fungus, can I still sell the harvest?", None),
+    ("Rai ka dana kaala pad gaya hai, kya karun?", None),
+    ("Got money in my Jan Dhan account, leaves are turning yellow, should I sell?", None),
+    ("Turn the soil before the rains? The plants have white spots and prices are low.", None),
+    ("The leaves have brown ringed spots. Should I sell the harvest in Hubli now?", None),
+]
+
+
+def check_crop_mentions() -> bool:
+    passed = True
+    for query, expected in CROP_MENTION_CASES:
+        crop = agent._mentioned_crop(query)
+        ok = crop == expected
+        passed &= ok
+        print(f"  {'ok ' if ok else 'BAD'} {str(crop):<12} {query}")
+    return passed
+
+
+def install_stub_llm(latency: float):
+    async def stub_run_until_final_text(runner, user_id, session_id, new_message, default_text):
+        await asyncio.sleep(latency)
+        return CANNED_OUTPUTS.get(runner.app_name, default_text)
+
+    agent._run_until_final_text = stub_run_until_final_text
+
+
+async def orchestrator_turn(latency: float):
+    await asyncio.sleep(latency)
+
+
+async def tool_by_tool(query: str, latency: float) -> str:
+    await orchestrator_turn(latency)
+    diagnosis_json = await agent.crop_diagnosis_tool(query)
+    await orchestrator_turn(latency)
+    market_json = await agent.market_analysis_tool(query)
+    await orchestrator_turn(latency)
+    summary = await agent.summarize_output_tool(f"[{diagnosis_json},{market_json}]")
+    await orchestrator_turn(latency)
+    return summary
+
+
+async def pipeline(query: str, latency: float) -> str:
+    await orchestrator_turn(latency)
+    summary = await agent.crop_market_pipeline_tool(query)
+    await orchestrator_turn(latency)
+    return summary
+
+
+async def measure(label: str, flow, query: str, latency: float, runs: int):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await flow(query, latency)
+        timings.append(time.perf_counter() - started)
+    print(f"{label:<36} {statistics.mean(timings):6.2f} s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=1.5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    print("crop mentions:")
+    if not check_crop_mentions():
+        sys.exit("crop mention check failed")
+    install_stub_llm(args.llm_latency)
+
+    named = "My tomato leaves have brown ringed spots. Should I sell my tomatoes in Hubli now?"
+    unnamed = "The leaves have brown ringed spots. Should I sell the harvest in Hubli now?"
+    print(f"LLM latency {args.llm_latency:.1f} s per call, {args.runs} runs")
+    await measure("tool-by-tool", tool_by_tool, named, args.llm_latency, args.runs)
+    await measure("pipeline (crop named, concurrent)", pipeline, named, args.llm_latency, args.runs)
+    await measure("pipeline (crop unknown, sequential)", pipeline, unnamed, args.llm_latency, args.runs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
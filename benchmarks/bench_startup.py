@@ -0,0 +1,131 @@
+# bench_startup.py
+"""
+Startup benchmark: per-module import time (python -X importtime) and time-to-first-ready of the app.
+
+Import report: each module is imported in a fresh interpreter; the wall time and the packages with the
+largest self import time (grouped to --depth dotted components) are printed.
+
+Time-to-first-ready: the app is started with uvicorn and --ready-path is polled until it answers. The
+time until the server logs --ready-log (the background agent import finishing) is reported as well.
+This needs the same environment as a real start (Firebase secret mounted, GOOGLE_CLOUD_PROJECT set).
+
+Usage:
+    python benchmarks/bench_startup.py --modules agent main
+    python benchmarks/bench_startup.py --serve --app main:app --runs 3
+    python benchmarks/bench_startup.py --project-dir /path/to/other/checkout   # compare two revisions
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_report(module: str, project_dir: str, depth: int, top: int):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_dir, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        print(f"{module}: import failed\n{result.stderr.strip().splitlines()[-1]}")
+        return
+
+    self_us = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        self_us[".".join(name.strip().split(".")[:depth])] += int(own)
+
+    print(f"\nimport {module}: {wall:.2f}s wall (interpreter start included), "
+          f"{sum(self_us.values()) / 1e6:.2f}s importing")
+    for package, micros in sorted(self_us.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {micros / 1e6:7.2f}s  {package}")
+
+
+def time_to_ready(app: str, project_dir: str, port: int, ready_path: str, ready_log: str,
+                  timeout: float) -> tuple[float, float | None] | None:
+    """(seconds until ready_path answers, seconds until ready_log is printed or None), or None on failure."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=project_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"}
+    )
+    output, logged = [], threading.Event()
+    logged_at = []
+
+    def read_output():
+        for line in server.stdout:
+            output.append(line)
+            if not logged.is_set() and re.search(ready_log, line):
+                logged_at.append(time.perf_counter() - started)
+                logged.set()
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    try:
+        ready_at = None
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                reader.join(1)
+                print(f"server exited with {server.returncode}:\n{''.join(output)[-2000:]}")
+                return None
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{ready_path}", timeout=1):
+                    ready_at = time.perf_counter() - started
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.05)
+        if ready_at is None:
+            print(f"not ready after {timeout:.0f}s")
+            return None
+        logged.wait(max(0.0, timeout - (time.perf_counter() - started)))
+        return ready_at, (logged_at[0] if logged_at else None)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="*", default=["agent", "main"])
+    parser.add_argument("--depth", type=int, default=3, help="dotted components to group packages by")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--serve", action="store_true", help="also measure time-to-first-ready")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--ready-path", default="/api/ping")
+    parser.add_argument("--ready-log", default="Agent Runner initialized", help="regex of the agent-ready log line")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--project-dir", default=PROJECT_DIR)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        import_report(module, args.project_dir, args.depth, args.top)
+
+    if args.serve:
+        runs = [time_to_ready(args.app, args.project_dir, args.port, args.ready_path, args.ready_log, args.timeout)
+                for _ in range(args.runs)]
+        runs = [run for run in runs if run is not None]
+        if runs:
+            ready = [run[0] for run in runs]
+            print(f"\ntime-to-first-ready ({args.app} {args.ready_path}, {len(runs)} runs): "
+                  f"min {min(ready):.2f}s, max {max(ready):.2f}s")
+            logged = [run[1] for run in runs if run[1] is not None]
+            if logged:
+                print(f"agent runtime ready ('{args.ready_log}'): min {min(logged):.2f}s, max {max(logged):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench_tool_overhead.py
+"""
+Micro-benchmark of the per-tool-call overhead of run_agent_and_get_text.
+
+Compares the previous implementation (a new Runner per call, events buffered with
+asyncio.to_thread(lambda: list(runner.run(...)))) against the current one (cached Runner,
+events consumed from run_async and the run closed once the final response is seen).
+
+The sub-agent is a stub that answers instantly, so the numbers are pure framework overhead.
+`--trailing-delay` makes the stub keep working after its final response, which the previous
+implementation always waited for and the current one cancels.
+
+Usage:
+    GOOGLE_CLOUD_PROJECT=bench python benchmarks/bench_tool_overhead.py --calls 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+import uuid
+from typing import AsyncGenerator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "bench")
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.genai import types
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import agent
+
+
+class InstantAgent(BaseAgent):
+    """Stub sub-agent: emits its final JSON answer immediately, then optionally keeps working."""
+    trailing_delay: float = 0.0
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        yield Event(author=self.name, content=types.Content(role="model", parts=[types.Part(text='{"ok": true}')]))
+        if self.trailing_delay:
+            await asyncio.sleep(self.trailing_delay)
+            yield Event(author=self.name, content=types.Content(role="model", parts=[types.Part(text="trailing")]))
+
+
+async def previous_run_agent_and_get_text(stub: BaseAgent, input_content: types.Content) -> str:
+    """The pre-change implementation, reduced to its control flow."""
+    internal_runner = Runner(app_name=f"{stub.name}App", agent=stub, session_service=agent._internal_session_service)
+    session_id = f"tool_session_{uuid.uuid4()}"
+    await agent._internal_session_service.create_session(
+        app_name=f"{stub.name}App", user_id="tool_user", session_id=session_id
+    )
+    results_list = await asyncio.to_thread(
+        lambda: list(internal_runner.run(user_id="tool_user", session_id=session_id, new_message=input_content))
+    )
+    for event in results_list:
+        if event.is_final_response() and event.content:
+            return event.content.parts[0].text
+    return ""
+
+
+async def measure(label: str, call, stub: BaseAgent, calls: int):
+    content = types.Content(role="user", parts=[types.Part(text="tomato price in Hubli")])
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        warm_up = await call(stub, content)
+    # A failing call returns an error string quickly, which would be timed instead of the real path.
+    if not warm_up or warm_up.startswith(("Error ", "No final text response")):
+        sys.exit(f"{label}: the call did not return the stub's answer: {warm_up!r}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(calls):
+            started = time.perf_counter()
+            await call(stub, content)
+            durations.append(time.perf_counter() - started)
+    durations.sort()
+    print(f"{label:<10} mean {statistics.mean(durations) * 1000:7.2f} ms   "
+          f"p50 {durations[len(durations) // 2] * 1000:7.2f} ms   "
+          f"p95 {durations[int(len(durations) * 0.95) - 1] * 1000:7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--trailing-delay", type=float, default=0.0,
+                        help="Seconds the stub keeps working after its final response")
+    args = parser.parse_args()
+
+    stub = InstantAgent(name="InstantAgent", trailing_delay=args.trailing_delay)
+    print(f"{args.calls} calls, trailing delay {args.trailing_delay}s")
+    await measure("before", previous_run_agent_and_get_text, stub, args.calls)
+    await measure("after", agent.run_agent_and_get_text, stub, args.calls)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
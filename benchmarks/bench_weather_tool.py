@@ -0,0 +1,73 @@
+# bench_weather_tool.py
+"""
+Offline timing of the weather tool against a local stub API.
+
+  before   blocking requests.get per lookup, no pool, no cache (the previous get_weather_forecast)
+  after    httpx.AsyncClient pool + grid-snapped TTL cache, lookups issued concurrently
+
+Lookups are coordinates of --villages places scattered within a few km of each other, each asked
+--repeat times, as happens when many farmers from one area ask about the weather.
+
+Usage:
+    python benchmarks/bench_weather_tool.py --villages 20 --repeat 5 --latency 0.15
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.weather_stub_server import StubWeatherServer
+
+
+def previous_get_weather_forecast(base_url: str, location: str) -> dict:
+    """The pre-change lookup (blocking, one new connection per call)."""
+    import requests
+
+    params = {"key": "bench", "q": location, "days": 5, "aqi": "yes", "alerts": "yes"}
+    response = requests.get(f"{base_url}/forecast.json", params=params)
+    if response.status_code != 200:
+        raise Exception(f"{response.status_code} Error: {response.text}")
+    return response.json()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--villages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.15, help="Stub API latency in seconds")
+    args = parser.parse_args()
+
+    server = StubWeatherServer(latency=args.latency).start_in_background()
+    os.environ["WEATHER_API_BASE_URL"] = server.base_url
+    from tools.weather_tool import close_weather_client, get_weather_forecast
+
+    rng = random.Random(7)
+    villages = [f"{12.9 + rng.uniform(0, 0.1):.4f},{77.5 + rng.uniform(0, 0.1):.4f}" for _ in range(args.villages)]
+    lookups = villages * args.repeat
+    rng.shuffle(lookups)
+
+    # The old function blocked the event loop, so concurrent requests effectively ran one at a time.
+    server.request_count = 0
+    started = time.perf_counter()
+    for location in lookups:
+        previous_get_weather_forecast(server.base_url, location)
+    before, before_requests = time.perf_counter() - started, server.request_count
+
+    server.request_count = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(get_weather_forecast(location) for location in lookups))
+    after, after_requests = time.perf_counter() - started, server.request_count
+    await close_weather_client()
+
+    print(f"{len(lookups)} lookups, {args.villages} villages, stub latency {args.latency * 1000:.0f} ms")
+    print(f"before  {before:7.2f} s   {before_requests:4d} API requests")
+    print(f"after   {after:7.2f} s   {after_requests:4d} API requests")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
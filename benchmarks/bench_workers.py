@@ -0,0 +1,143 @@
+# bench_workers.py
+"""
+Throughput scaling with the number of gunicorn workers, per session backend.
+
+For each --backends entry and each --workers count, starts benchmarks/load_app.py under gunicorn the
+way the Dockerfile does (-w N with uvicorn workers), warms every worker up, then sends --requests
+requests from --concurrency clients with bench_load.py's request mix. SESSION_BACKEND is set for the
+server: "memory" (per-worker), "sqlite" (a fresh file in a temp directory) or "redis" (a
+benchmarks/redis_stub_server.py instance in this process, with --redis-latency per round trip).
+
+Reported per run: throughput and its speed-up over the smallest worker count, p50/p99 latency,
+errors, and the resident memory of the gunicorn master plus workers. Workers only add throughput
+while there are cores to run them on; the CPU count is printed with the results.
+
+Usage:
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1 2 4 --backends sqlite redis --concurrency 64 --output workers.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.bench_load import (DEFAULT_MIX, QUERIES, git_revision, make_image, run_level, server_rss_mb,
+                                   start_server, wait_until_ready)
+from benchmarks.fakes import FakeTokenIssuer
+from benchmarks.load_app import PROJECT_ID
+from benchmarks.redis_stub_server import StubRedisServer
+
+
+async def run_one(backend: str, workers: int, args, certs_path: str, workdir: str, redis_url: str,
+                  plan, tokens: list[str], image: bytes) -> dict:
+    server_env = [f"SESSION_BACKEND={backend}", *args.server_env]
+    if backend == "sqlite":
+        server_env.append(f"SESSION_DB_PATH={os.path.join(workdir, f'sessions-{workers}.sqlite3')}")
+    elif backend == "redis":
+        server_env += [f"SESSION_REDIS_URL={redis_url}", f"SESSION_REDIS_PREFIX=bench{workers}:"]
+    server = start_server(args.port, certs_path, argparse.Namespace(**{**vars(args), "server_env": server_env}),
+                          workers=workers)
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout,
+                                     limits=limits) as client:
+            await wait_until_ready(client, server, args.timeout)
+            # Enough concurrent requests that every worker finishes its background agent import.
+            await run_level(client, workers * 2, plan(args.warmup * workers), tokens, image, server.pid)
+            level = await run_level(client, args.concurrency, plan(args.requests), tokens, image, server.pid)
+            # Read before stopping the server; load_app's worker processes are gone afterwards.
+            rss = server_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "backend": backend,
+        "workers": workers,
+        "requests": level["requests"],
+        "errors": level["errors"],
+        "throughput_rps": level["throughput_rps"],
+        "latency": level["latency"],
+        "server_rss_mb": rss,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite", "redis"],
+                        choices=["memory", "sqlite", "redis"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=300, help="requests per run")
+    parser.add_argument("--warmup", type=int, default=10, help="warm-up requests per worker")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mix", nargs="+", default=DEFAULT_MIX, help="kind=weight pairs")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub model time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub model delay between streamed chunks (s)")
+    parser.add_argument("--firestore-latency", type=float, default=0.05)
+    parser.add_argument("--storage-latency", type=float, default=0.2)
+    parser.add_argument("--redis-latency", type=float, default=0.001, help="stub Redis time per round trip (s)")
+    parser.add_argument("--server-env", nargs="*", default=[], help="NAME=value settings for the server")
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    weights = {kind: float(weight) for kind, _, weight in (item.partition("=") for item in args.mix)}
+    unknown = set(weights) - set(QUERIES) - {"history"}
+    if unknown:
+        parser.error(f"unknown request kinds in --mix: {sorted(unknown)}")
+    rng = random.Random(args.seed)
+
+    def plan(count: int) -> list[tuple[str, int]]:
+        kinds = rng.choices(list(weights), weights=list(weights.values()), k=count)
+        return [(kind, rng.randrange(args.users)) for kind in kinds]
+
+    issuer = FakeTokenIssuer(PROJECT_ID)
+    tokens = [issuer.mint(f"load-user-{i}") for i in range(args.users)]
+    image = make_image()
+    redis = StubRedisServer(latency=args.redis_latency).start_in_background()
+    print(f"{os.cpu_count()} CPUs, concurrency {args.concurrency}, {args.requests} requests per run, "
+          f"stub model latency {args.llm_latency}s")
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        certs_path = os.path.join(workdir, "certs.json")
+        with open(certs_path, "w", encoding="utf-8") as f:
+            json.dump(issuer.certs, f)
+        for backend in args.backends:
+            baseline = None
+            for workers in args.workers:
+                run = await run_one(backend, workers, args, certs_path, workdir, redis.base_url, plan, tokens, image)
+                baseline = baseline or run["throughput_rps"]
+                run["speedup"] = round(run["throughput_rps"] / baseline, 2) if baseline else None
+                runs.append(run)
+                print(f"  {backend:<7} -w {workers:<2} {run['throughput_rps']:6.1f} req/s (x{run['speedup']:.2f})  "
+                      f"p50 {run['latency']['p50_s']:5.2f}s  p99 {run['latency']['p99_s']:5.2f}s  "
+                      f"err={run['errors']:<3} RSS {run['server_rss_mb']} MB")
+    redis.shutdown()
+
+    if args.output:
+        report = {
+            "benchmark": "bench_workers",
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "cpu_count": os.cpu_count(),
+            "settings": {key: value for key, value in vars(args).items() if key != "output"},
+            "runs": runs,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nreport written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
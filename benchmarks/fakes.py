@@ -0,0 +1,248 @@
+# fakes.py
+"""
+In-memory stand-ins for the Firebase clients used by main.py, for offline benchmarks.
+Latencies are simulated with time.sleep because the real clients are blocking and are
+always called through asyncio.to_thread. FakeTokenIssuer mints Firebase-shaped ID tokens
+signed with a local key, verifiable with SigningKeySet(certs=issuer.certs).
+"""
+import datetime
+import threading
+import time
+import uuid
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.api_core.exceptions import PreconditionFailed
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+
+class FakeTokenIssuer:
+    """Signs Firebase ID tokens for `project_id` with a freshly generated RSA key."""
+
+    def __init__(self, project_id: str = "bench-project", key_id: str = "bench-key"):
+        self.project_id = project_id
+        self.key_id = key_id
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.bench")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        private_pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        self.signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+        # kid -> PEM certificate, the shape of Google's securetoken key endpoint.
+        self.certs = {key_id: cert.public_bytes(serialization.Encoding.PEM).decode()}
+
+    def mint(self, uid: str, lifetime: int = 3600) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": f"https://securetoken.google.com/{self.project_id}",
+            "aud": self.project_id,
+            "sub": uid,
+            "user_id": uid,
+            "iat": now,
+            "exp": now + lifetime,
+            "auth_time": now,
+        }
+        return google_jwt.encode(self.signer, payload, key_id=self.key_id).decode()
+
+    def verify(self, token: str, check_revoked: bool = False) -> dict:
+        """Full signature verification, standing in for firebase_admin.auth.verify_id_token."""
+        claims = google_jwt.decode(token, certs=self.certs, audience=self.project_id)
+        return {**claims, "uid": claims["sub"]}
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def upload_from_string(self, data, content_type="application/octet-stream", predefined_acl=None,
+                           if_generation_match=None, **kwargs):
+        time.sleep(self.bucket.latency)
+        with self.bucket.lock:
+            if if_generation_match == 0 and self.name in self.bucket.objects:
+                raise PreconditionFailed(f"At least one of the pre-conditions you specified did not hold: {self.name}")
+            self.bucket.objects[self.name] = {
+                "data": bytes(data),
+                "content_type": content_type,
+                "public": predefined_acl == "publicRead",
+            }
+            self.bucket.upload_count += 1
+
+    def make_public(self):
+        time.sleep(self.bucket.latency)
+        with self.bucket.lock:
+            self.bucket.objects[self.name]["public"] = True
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        time.sleep(self.bucket.latency)
+        return self.bucket.objects[self.name]["data"]
+
+    def exists(self, **kwargs) -> bool:
+        time.sleep(self.bucket.latency)
+        return self.name in self.bucket.objects
+
+
+class FakeBucket:
+    """Firebase Storage bucket held in a dict; every request sleeps for `latency` seconds."""
+
+    def __init__(self, name: str = "fake-bucket.appspot.com", latency: float = 0.2):
+        self.name = name
+        self.latency = latency
+        self.objects: dict[str, dict] = {}
+        self.upload_count = 0
+        self.lock = threading.Lock()
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id: str, data: dict | None):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> dict | None:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str):
+        return self._data.get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeFirestore", collection_path: str, doc_id: str):
+        self._client = client
+        self.collection_path = collection_path
+        self.id = doc_id
+
+    def set(self, data: dict):
+        time.sleep(self._client.latency)
+        self._client._set(self.collection_path, self.id, data)
+
+    def get(self, field_paths=None) -> FakeDocumentSnapshot:
+        time.sleep(self._client.latency)
+        with self._client.lock:
+            data = self._client.collections.get(self.collection_path, {}).get(self.id)
+        if data is not None and field_paths:
+            data = {key: value for key, value in data.items() if key in field_paths}
+        return FakeDocumentSnapshot(self.id, data)
+
+
+class FakeQuery:
+    """Supports the order_by / select / start_after / limit / stream chain used by chat history."""
+
+    def __init__(self, client: "FakeFirestore", path: str, order=None, fields=None, after=None, count=None):
+        self._client = client
+        self._path = path
+        self._order = order
+        self._fields = fields
+        self._after = after
+        self._count = count
+
+    def _copy(self, **changes) -> "FakeQuery":
+        values = dict(order=self._order, fields=self._fields, after=self._after, count=self._count)
+        values.update(changes)
+        return FakeQuery(self._client, self._path, **values)
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(order=(field, direction))
+
+    def select(self, fields) -> "FakeQuery":
+        return self._copy(fields=list(fields))
+
+    def start_after(self, snapshot: FakeDocumentSnapshot) -> "FakeQuery":
+        return self._copy(after=snapshot)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(count=count)
+
+    def stream(self):
+        time.sleep(self._client.latency)
+        with self._client.lock:
+            docs = list(self._client.collections.get(self._path, {}).items())
+        if self._order:
+            field, direction = self._order
+            docs.sort(key=lambda item: (item[1].get(field), item[0]), reverse=direction == "DESCENDING")
+        if self._after is not None:
+            ids = [doc_id for doc_id, _ in docs]
+            docs = docs[ids.index(self._after.id) + 1:] if self._after.id in ids else []
+        if self._count is not None:
+            docs = docs[:self._count]
+        for doc_id, data in docs:
+            if self._fields is not None:
+                data = {key: value for key, value in data.items() if key in self._fields}
+            yield FakeDocumentSnapshot(doc_id, data)
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: "FakeFirestore", path: str):
+        super().__init__(client, path)
+        self.path = path
+
+    def document(self, doc_id: str | None = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self.path, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: dict):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes: list[tuple[FakeDocumentReference, dict]] = []
+
+    def set(self, reference: FakeDocumentReference, data: dict):
+        self._writes.append((reference, data))
+
+    def commit(self):
+        time.sleep(self._client.latency)
+        if self._client.fail_commits:
+            raise RuntimeError("Fake Firestore is unavailable")
+        for reference, data in self._writes:
+            self._client._set(reference.collection_path, reference.id, data)
+        self._client.commit_count += 1
+
+
+class FakeFirestore:
+    """Firestore client held in dicts; every request sleeps for `latency` seconds."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.collections: dict[str, dict[str, dict]] = {}
+        self.commit_count = 0
+        self.fail_commits = False
+        self.lock = threading.Lock()
+
+    def collection(self, path: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, path)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def _set(self, collection_path: str, doc_id: str, data: dict):
+        stored = {
+            key: (datetime.datetime.now(datetime.timezone.utc) if value is SERVER_TIMESTAMP else value)
+            for key, value in data.items()
+        }
+        with self.lock:
+            self.collections.setdefault(collection_path, {})[doc_id] = stored
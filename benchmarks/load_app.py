@@ -0,0 +1,52 @@
+# load_app.py
+"""
+main.app wired to offline stand-ins, for load tests (benchmarks/bench_load.py starts it):
+
+  models     every tier points at benchmarks/stub_llm.StubLlm (STUB_LLM_* settings)
+  Firestore  FakeFirestore, Storage FakeBucket (LOAD_FIRESTORE_LATENCY, LOAD_STORAGE_LATENCY seconds)
+  auth       TokenVerifier over the certificates in LOAD_TEST_CERTS (a JSON file written by the
+             harness from its FakeTokenIssuer), verified locally like real Firebase tokens
+
+Everything else (routing, sub-agents, caches, admission control, conversation logging) is the
+production code.
+
+    LOAD_TEST_CERTS=/tmp/certs.json python -m uvicorn benchmarks.load_app:app --port 8790
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_ID = "bench-project"
+
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", PROJECT_ID)
+os.environ.pop("MODEL_NAME", None)
+for tier in ("FAST", "STANDARD", "STRONG"):
+    os.environ[f"MODEL_TIER_{tier}"] = f"stub-{tier.lower()}"
+
+from benchmarks import stub_llm
+from benchmarks.fakes import FakeBucket, FakeFirestore
+from services.token_cache import SigningKeySet, TokenVerifier
+
+stub_llm.register()
+
+import main
+
+
+def _init_fake_firebase():
+    with open(os.environ["LOAD_TEST_CERTS"], "r", encoding="utf-8") as f:
+        certs = json.load(f)
+
+    def verify_offline(token: str, check_revoked: bool = False) -> dict:
+        raise ValueError("Token could not be verified against the load-test certificates")
+
+    main._init_firebase_services(
+        FakeFirestore(latency=float(os.getenv("LOAD_FIRESTORE_LATENCY", "0.05"))),
+        FakeBucket(latency=float(os.getenv("LOAD_STORAGE_LATENCY", "0.2"))),
+        TokenVerifier(PROJECT_ID, SigningKeySet(certs=certs), fallback_verify=verify_offline),
+    )
+
+
+main._init_firebase = _init_fake_firebase
+app = main.app
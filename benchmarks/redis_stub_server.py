@@ -0,0 +1,164 @@
+# redis_stub_server.py
+"""
+Local stand-in for a Redis REST endpoint (Upstash-style), for offline benchmarks and manual testing
+of SESSION_BACKEND=redis.
+
+    python benchmarks/redis_stub_server.py --port 8098 --latency 0.002
+    SESSION_BACKEND=redis SESSION_REDIS_URL=http://127.0.0.1:8098 uvicorn main:app
+
+POST / takes one command as a JSON array (["HGETALL", "key"]) and answers {"result": ...};
+POST /pipeline and /multi-exec take a list of commands and answer a list of results, the latter
+applying them atomically. Only the commands RedisRestSessionService uses are implemented: DEL,
+EXPIRE, HGETALL, HSET, HSETNX, LRANGE, RPUSH, SADD, SMEMBERS, SREM. Keys expire as in Redis.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RedisStore:
+    """The in-memory keyspace. Values are dicts (hashes), lists or sets of strings."""
+
+    def __init__(self):
+        self.data: dict[str, object] = {}
+        self.expires_at: dict[str, float] = {}
+
+    def _get(self, key: str, kind: type, create: bool = False):
+        if key in self.expires_at and self.expires_at[key] <= time.time():
+            self.data.pop(key, None)
+            self.expires_at.pop(key, None)
+        value = self.data.get(key)
+        if value is None and create:
+            value = self.data[key] = kind()
+        if value is not None and not isinstance(value, kind):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def execute(self, command: list):
+        name, *args = command
+        name = str(name).upper()
+        if name == "DEL":
+            removed = sum(self.data.pop(key, None) is not None for key in args)
+            for key in args:
+                self.expires_at.pop(key, None)
+            return removed
+        if name == "EXPIRE":
+            key, seconds = args
+            if self._get(key, object) is None:
+                return 0
+            self.expires_at[key] = time.time() + int(seconds)
+            return 1
+        if name == "HGETALL":
+            value = self._get(args[0], dict) or {}
+            return [item for pair in value.items() for item in pair]
+        if name == "HSET":
+            value = self._get(args[0], dict, create=True)
+            fields = dict(zip(args[1::2], args[2::2]))
+            added = len(set(fields) - set(value))
+            value.update(fields)
+            return added
+        if name == "HSETNX":
+            key, field, field_value = args
+            value = self._get(key, dict, create=True)
+            if field in value:
+                return 0
+            value[field] = field_value
+            return 1
+        if name == "RPUSH":
+            value = self._get(args[0], list, create=True)
+            value.extend(args[1:])
+            return len(value)
+        if name == "LRANGE":
+            key, start, stop = args[0], int(args[1]), int(args[2])
+            value = self._get(key, list) or []
+            stop = len(value) if stop == -1 else stop + 1
+            return value[start:stop]
+        if name == "SADD":
+            value = self._get(args[0], set, create=True)
+            added = len(set(args[1:]) - value)
+            value.update(args[1:])
+            return added
+        if name == "SMEMBERS":
+            return sorted(self._get(args[0], set) or ())
+        if name == "SREM":
+            value = self._get(args[0], set) or set()
+            removed = len(value & set(args[1:]))
+            value.difference_update(args[1:])
+            return removed
+        raise ValueError(f"ERR unknown command '{name}'")
+
+
+class StubRedisServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, token: str = ""):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.token = token
+        self.store = RedisStore()
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start_in_background(self) -> "StubRedisServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        time.sleep(self.server.latency)
+        if self.server.token and self.headers.get("Authorization") != f"Bearer {self.server.token}":
+            self._reply(401, {"error": "Unauthorized"})
+            return
+        try:
+            commands = json.loads(body)
+        except ValueError:
+            self._reply(400, {"error": "ERR invalid JSON"})
+            return
+
+        with self.server.lock:
+            self.server.request_count += 1
+            if self.path == "/":
+                self._reply(200, self._run(commands))
+            elif self.path in ("/pipeline", "/multi-exec"):
+                # Every request runs under the lock, so a pipeline is applied atomically as well.
+                self._reply(200, [self._run(command) for command in commands])
+            else:
+                self._reply(404, {"error": "Not found"})
+
+    def _run(self, command) -> dict:
+        try:
+            return {"result": self.server.store.execute(command)}
+        except (ValueError, TypeError) as e:
+            return {"error": str(e)}
+
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each request takes")
+    parser.add_argument("--token", default="", help="Bearer token required from clients")
+    args = parser.parse_args()
+    server = StubRedisServer(args.port, args.latency, args.token)
+    print(f"Stub Redis REST endpoint on {server.base_url}")
+    server.serve_forever()
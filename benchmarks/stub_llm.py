@@ -0,0 +1,154 @@
+# stub_llm.py
+"""
+Deterministic stand-in for Gemini, for offline load tests of the real agent graph.
+
+StubLlm is registered with ADK's model registry for model names starting with "stub-"; pointing the
+model tiers at it (MODEL_TIER_FAST=stub-fast etc., see services/model_config.py) makes every agent
+use it without changing the agent definitions. Its answers are scripted from the request:
+
+  orchestrator (request has tools)   calls crop_diagnosis_tool for images and crop problems,
+                                     market_analysis_tool for price questions, scheme_navigator_tool
+                                     for schemes, then summarize_output_tool on the tool's JSON, then
+                                     answers with the summary; anything else is answered directly
+  structured sub-agents              valid JSON for their output_schema
+  other agents                       a short plain-text answer
+
+Every call waits `latency` seconds (+/- `jitter`, from a seeded generator) before the first token.
+Streamed calls send the text in chunks of `chunk_words` words, `token_delay` seconds apart. Token
+counts are estimated as characters / 4 and reported in usage_metadata, so the model-usage metrics
+and per-conversation model_calls are filled in as with the real model.
+
+Settings come from the environment of the server process:
+STUB_LLM_LATENCY (0.8), STUB_LLM_JITTER (0.2), STUB_LLM_TOKEN_DELAY (0.03), STUB_LLM_CHUNK_WORDS (4),
+STUB_LLM_SEED (7).
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.8"))
+JITTER = float(os.getenv("STUB_LLM_JITTER", "0.2"))
+TOKEN_DELAY = float(os.getenv("STUB_LLM_TOKEN_DELAY", "0.03"))
+CHUNK_WORDS = int(os.getenv("STUB_LLM_CHUNK_WORDS", "4"))
+
+_random = random.Random(int(os.getenv("STUB_LLM_SEED", "7")))
+
+# Structured answers by output_schema class name (basemodel_dto/agent_responsedto.py).
+SCHEMA_ANSWERS = {
+    "CropDiagnosisResult": {
+        "disease": "Early blight",
+        "organic_remedy": "Remove infected leaves and spray neem oil (5 ml/L) every 7 days.",
+        "chemical_remedy": "Spray mancozeb 2 g/L, repeat after 10 days.",
+        "observed_symptoms_from_description": "Brown spots with concentric rings on older leaves.",
+    },
+    "MarketAnalysisResult": {
+        "crop": "Tomato",
+        "market": "Hubli",
+        "price_today": "₹1800/quintal",
+        "trend": "increasing",
+        "recommendation": "Hold",
+    },
+    "SchemeInfoResult": {
+        "scheme_name": "PM-KISAN",
+        "benefits": "₹6000 per year in three instalments.",
+        "eligibility": "Landholding farmer families.",
+        "how_to_apply": "Register on the PM-KISAN portal or at a Common Service Centre.",
+        "link": "https://pmkisan.gov.in",
+    },
+    "SummaryReviewResult": {"status": "pass", "feedback": ""},
+}
+
+_TOOL_KEYWORDS = (
+    ("crop_diagnosis_tool", re.compile(r"spot|leaf|leaves|disease|pest|yellow|wilt|blight", re.I)),
+    ("market_analysis_tool", re.compile(r"price|sell|market|mandi|rate", re.I)),
+    ("scheme_navigator_tool", re.compile(r"scheme|subsidy|yojana|loan|insurance", re.I)),
+)
+_DIRECT_ANSWER = "Water the field early in the morning and check the leaves for pests every few days."
+_PLAIN_ANSWER = "Early blight is likely; remove the affected leaves and spray neem oil. Prices are rising, so hold."
+
+
+def _estimate_tokens(contents: list[types.Content]) -> int:
+    chars = 0
+    for content in contents:
+        for part in content.parts or ():
+            if part.text:
+                chars += len(part.text)
+            elif part.inline_data is not None:
+                chars += 1032  # Gemini bills an image as 258 tokens.
+            elif part.function_response is not None:
+                chars += len(json.dumps(part.function_response.response, ensure_ascii=False, default=str))
+    return chars // 4
+
+
+def _orchestrator_step(llm_request: LlmRequest) -> types.Part:
+    last = llm_request.contents[-1] if llm_request.contents else types.Content(role="user", parts=[])
+    for part in last.parts or ():
+        if part.function_response is not None:
+            result = (part.function_response.response or {}).get("result", "")
+            if part.function_response.name == "summarize_output_tool":
+                return types.Part(text=str(result))
+            return types.Part(function_call=types.FunctionCall(
+                name="summarize_output_tool", args={"json_data": str(result), "language": "en"}
+            ))
+
+    text = " ".join(part.text for part in last.parts or () if part.text)
+    has_image = any(part.inline_data is not None for part in last.parts or ())
+    if has_image:
+        return types.Part(function_call=types.FunctionCall(
+            name="crop_diagnosis_tool", args={"query": "Brown spots with concentric rings on the lower leaves."}
+        ))
+    for tool_name, keywords in _TOOL_KEYWORDS:
+        if tool_name in llm_request.tools_dict and keywords.search(text):
+            return types.Part(function_call=types.FunctionCall(name=tool_name, args={"query": text}))
+    return types.Part(text=_DIRECT_ANSWER)
+
+
+def _answer(llm_request: LlmRequest) -> types.Part:
+    if llm_request.tools_dict:
+        return _orchestrator_step(llm_request)
+    schema = llm_request.config.response_schema if llm_request.config else None
+    schema_name = getattr(schema, "__name__", None)
+    if schema_name in SCHEMA_ANSWERS:
+        return types.Part(text=json.dumps(SCHEMA_ANSWERS[schema_name], ensure_ascii=False))
+    return types.Part(text=_PLAIN_ANSWER)
+
+
+class StubLlm(BaseLlm):
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"stub-.*"]
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(max(0.0, LATENCY + _random.uniform(-JITTER, JITTER)))
+        part = _answer(llm_request)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=_estimate_tokens(llm_request.contents),
+            candidates_token_count=max(1, len(part.text or json.dumps(part.function_call.args)) // 4),
+        )
+
+        if stream and part.text:
+            words = part.text.split(" ")
+            for start in range(0, len(words), CHUNK_WORDS):
+                chunk = " ".join(words[start:start + CHUNK_WORDS]) + " "
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=chunk)]), partial=True)
+                await asyncio.sleep(TOKEN_DELAY)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=usage,
+            turn_complete=True,
+        )
+
+
+def register():
+    LLMRegistry.register(StubLlm)
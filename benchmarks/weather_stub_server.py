@@ -0,0 +1,95 @@
+# weather_stub_server.py
+"""
+Local stand-in for the weatherapi.com forecast endpoint, for offline benchmarks and manual testing.
+
+    python benchmarks/weather_stub_server.py --port 8099 --latency 0.15
+    WEATHER_API_BASE_URL=http://127.0.0.1:8099/v1 uvicorn main:app
+
+Answers GET /v1/forecast.json?q=<place or lat,lon> with canned data; a `q` containing "nowhere"
+gets the API's 400 "No matching location found" error.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def forecast_payload(query: str) -> dict:
+    try:
+        lat, lon = (float(part) for part in query.split(","))
+        region = f"Near {lat:.2f},{lon:.2f}"
+    except ValueError:
+        lat, lon, region = 12.97, 77.59, query.title()
+    days = [
+        {
+            "date": f"2025-07-{10 + i:02d}",
+            "day": {"avgtemp_c": 24.5 + i, "condition": {"text": "Patchy rain possible", "icon": "//cdn.weatherapi.com/weather/64x64/day/176.png"}},
+            "astro": {"sunrise": "06:01 AM", "sunset": "06:48 PM"},
+        }
+        for i in range(5)
+    ]
+    return {
+        "location": {"name": query, "region": region, "country": "India", "lat": lat, "lon": lon,
+                     "tz_id": "Asia/Kolkata", "localtime": "2025-07-10 10:00"},
+        "current": {"temp_c": 25.0, "condition": {"text": "Light rain"}, "wind_kph": 12.2,
+                    "precip_mm": 0.4, "pressure_mb": 1009.0},
+        "forecast": {"forecastday": days},
+    }
+
+
+class StubWeatherServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.15):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start_in_background(self) -> "StubWeatherServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query).get("q", [""])[0]
+        with self.server.lock:
+            self.server.request_count += 1
+        time.sleep(self.server.latency)
+
+        if url.path != "/v1/forecast.json":
+            status, payload = 404, {"error": {"code": 1005, "message": "API URL is invalid."}}
+        elif not query or "nowhere" in query.lower():
+            status, payload = 400, {"error": {"code": 1006, "message": "No matching location found."}}
+        else:
+            status, payload = 200, forecast_payload(query)
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.15, help="Seconds each request takes")
+    args = parser.parse_args()
+    server = StubWeatherServer(args.port, args.latency)
+    print(f"Stub weather API on {server.base_url}")
+    server.serve_forever()
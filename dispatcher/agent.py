@@ -3,9 +3,9 @@ Dispatcher Agent
 Routes farmer's multimodal queries to the appropriate agricultural sub-agents.
 """
 
-import os
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent
+from services.model_config import model_kwargs
 from google.adk.tools import agent_tool
 
 # Load environment variables
@@ -27,8 +27,8 @@ summary_tool = agent_tool.AgentTool(agent=summary_agent)
 
 # Define the root dispatcher agent
 root_agent = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="KisanHelper",
+    **model_kwargs("KisanHelper"),
     instruction="""
 You are a multilingual agricultural assistant designed to support small-scale Indian farmers.
 
@@ -2,13 +2,14 @@
 import os
 import uuid
 import asyncio
+import time
 from fastapi import FastAPI, Form, UploadFile, File, Depends, Header, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
 # REMOVED: from dotenv import load_dotenv, find_dotenv
-import logging
 import json
 from typing import Annotated
 import re
+from contextlib import aclosing, asynccontextmanager
 
 # Firebase Imports
 import firebase_admin
@@ -17,20 +18,43 @@ from firebase_admin import firestore
 from firebase_admin import storage
 from firebase_admin import auth
 
-# Import the Runner class from google.adk.runners
-from google.adk.runners import Runner
-# Import InMemorySessionService for local session management
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from services import metrics
+
+from services.admission import AdmissionController, AdmissionRejected
+from services.token_cache import TokenVerifier
+from services.image_store import ImageArchiver, PendingImageUpload
+from services.conversation_log import ConversationLogWriter
+from services.chat_history import FirstPageCache, decode_cursor, fetch_history_page
+from services.intent_router import IntentRouter, RouteDecision
+from services.response_cache import normalize_query
+from services.batch import BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS, run_bounded
+from services.model_config import (
+    LLM_CALLS_PER_REQUEST, LLM_INPUT_TOKENS_PER_REQUEST, input_tokens, models_used, start_model_usage_recording
+)
+from services.conversation_context import (
+    CONTEXT_RECENT_TURNS, CONTEXT_SUMMARY_BATCH, compact_session, image_reference_delta, split_turns, turn_label
+)
+from services.logging_setup import RequestContextMiddleware, configure_logging, truncate
+from services.tracing import HttpMetricsMiddleware, configure_tracing, shutdown_tracing, span
+from services.image_preprocess import (
+    ImageTooLarge, InvalidImage, MaxUploadSizeMiddleware, preprocess_image, read_upload_limited
+)
+
+from loguru import logger
 
-# from basemodel_dto.weather_responsedto import WeatherResponse
+from basemodel_dto.weather_responsedto import WeatherResponse
+from basemodel_dto.batch_requestdto import BatchItem, BatchRequest
 # from specialized_agent.router_agent import route_and_process
-# from tools.weather_tool import get_weather_forecast
+from tools.weather_tool import WeatherServiceError, close_weather_client, get_weather_forecast
 
 # --- Configure Logging ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
-print("DEBUG: Logging configured.")
+# Structured JSON logs with request ids, written off the request path (see services/logging_setup.py).
+configure_logging()
+# Spans for each request stage, exported when TRACING_EXPORTER is set (see services/tracing.py).
+configure_tracing()
 
 # --- Load environment variables (NO .env FILE IN CLOUD RUN) ---
 # REMOVED: dotenv_path = find_dotenv()
@@ -41,91 +65,177 @@ print("DEBUG: Logging configured.")
 # REMOVED:     print("ERROR (main.py): .env file not found. Ensure it's in the correct directory.")
 # REMOVED:     exit(1)
 
-# --- Import your orchestrator agent from the local 'agent.py' file ---
-try:
-    from agent import kisan_orchestrator_agent, MODEL_NAME
-
-    print("kisan_orchestrator_agent imported successfully from agent.py")
-except ImportError as e:
-    print(f"ERROR (main.py): Could not import 'kisan_orchestrator_agent' from 'agent.py'. Error: {e}")
-    print("Please ensure 'agent.py' exists and defines 'kisan_orchestrator_agent'.")
-    exit(1)
-
-# --- FastAPI Application Setup ---
-app = FastAPI()
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# --- Deferred Initialization ---
+# Nothing is initialized at import time. The lifespan hook connects to Firebase (needed by every
+# authenticated route) and starts importing agent.py in a background thread: google-adk dominates
+# startup time, and only the agent routes need it, so they wait for it in _wait_for_agent_runtime()
+# while /api/ping, /weather and /api/chat-history are served right away.
+APP_NAME = "KisanAgriApp"
+APP_ID = "kisan_agri_app_v1"
 
-# --- Firebase Initialization ---
 # The path where the secret will be mounted inside the container by Cloud Run
-service_account_path = "/secrets/firebase_key.json" # This line was the source of the error
+service_account_path = "/secrets/firebase_key.json"
 
-if not service_account_path: # This check can remain for safety, though it should always be set when mounted
-    raise ValueError(
-        "Service account path not set. Ensure Firebase key secret is mounted correctly."
-    )
+db = None
+bucket = None
+conversation_log = None
+history_page_cache = None
+token_verifier = None
+image_archiver = None
+
+session_service = None
+run_fast_path = None
+summarize_conversation = None
+streaming_run_config = None
+runtime = None  # Set last: once it is not None, the agent runtime is fully initialized.
+_agent_runtime_task: asyncio.Task | None = None
+
+# Limits how many orchestrator runs execute concurrently on this worker (see services/admission.py).
+agent_admission = AdmissionController.from_env()
+metrics.gauge("kisan_agent_runs_in_flight", "Agent runs holding an admission slot").set_function(
+    lambda: agent_admission.stats()["in_flight"]
+)
+metrics.gauge("kisan_agent_runs_waiting", "Requests queued for an admission slot").set_function(
+    lambda: agent_admission.stats()["waiting"]
+)
 
-# REMOVED: absolute_service_account_path = os.path.abspath(service_account_path)
-# REMOVED: print(absolute_service_account_path)
-print(f"DEBUG: Attempting to load Firebase credentials from mounted path: {service_account_path}")
+# Sends unambiguous text queries straight to their tool instead of the orchestrator (see services/intent_router.py).
+intent_router = IntentRouter.from_env()
 
-if not os.path.exists(service_account_path):
-    raise FileNotFoundError(f"Firebase service account file not found at mounted path: {service_account_path}")
 
-db = None
-bucket = None
+def _init_firebase():
+    logger.debug(f"Loading Firebase credentials from mounted path: {service_account_path}")
+    if not os.path.exists(service_account_path):
+        raise FileNotFoundError(f"Firebase service account file not found at mounted path: {service_account_path}")
 
-try:
     if not firebase_admin._apps:
         cred = credentials.Certificate(service_account_path) # Direct path to the mounted secret file
-        # REMOVED: with open(absolute_service_account_path, 'r') as f:
-        # REMOVED:     firebase_config_from_file = json.load(f)
-
         storage_bucket_name = "project-kisan-app-467108.firebasestorage.app"
-        print(storage_bucket_name)
-
         firebase_admin.initialize_app(cred, {
             'storageBucket': storage_bucket_name
         })
-        print(f"Firebase Admin SDK initialized successfully for bucket: {storage_bucket_name}")
+        logger.info(f"Firebase Admin SDK initialized for bucket: {storage_bucket_name}")
 
-    db = firestore.client()
-    print("Firestore client initialized.")
+    # Verifies ID tokens in-process against preloaded signing keys and caches them until 'exp'.
+    verifier = TokenVerifier.from_env(firebase_admin.get_app().project_id, auth.verify_id_token)
+    _init_firebase_services(firestore.client(), storage.bucket(), verifier)
 
-    bucket = storage.bucket()
-    print(f"Firebase Storage bucket initialized: {bucket.name}")
 
-except Exception as e:
-    print(f"ERROR: Failed to initialize Firebase, Firestore, or Storage: {e}")
-    import traceback
+def _init_firebase_services(firestore_client, storage_bucket, verifier: TokenVerifier):
+    """Builds the services on top of the Firebase clients (benchmarks/load_app.py passes in fakes)."""
+    global db, bucket, conversation_log, history_page_cache, token_verifier, image_archiver
+    db = firestore_client
+    bucket = storage_bucket
+    token_verifier = verifier
 
-    traceback.print_exc()
-    exit(1)
+    # Conversations are written to Firestore in batches by a background task.
+    conversation_log = ConversationLogWriter.from_env(db)
+
+    # Short-lived cache of each user's first /api/chat-history page, dropped when their conversations change.
+    history_page_cache = FirstPageCache.from_env()
+    conversation_log.add_listener(
+        lambda collection_path: history_page_cache.invalidate(collection_path.split("/")[-2])
+    )
+
+    # Content-addressed, publicly readable image archive; uploads run alongside the agent.
+    image_archiver = ImageArchiver(bucket, path_prefix=f"artifacts/{APP_ID}/users")
 
-# --- Agent Runtime Initialization ---
-APP_NAME = "KisanAgriApp"
-APP_ID = "kisan_agri_app_v1"
-MODEL_NAME = "gemini-1.5-flash-001"  # Assuming the model name is defined here or in agent.py
 
-try:
-    session_service = InMemorySessionService()
+async def _start_firebase_services():
+    try:
+        await asyncio.to_thread(_init_firebase)
+    except Exception as e:
+        logger.exception(f"Failed to initialize Firebase, Firestore, or Storage: {e}")
+        raise
+    try:
+        await token_verifier.start()
+    except Exception as e:
+        logger.warning(f"Could not preload Firebase signing keys, they will be fetched on first use: {e}")
+    await conversation_log.start()
+
+
+def _init_agent_runtime():
+    global session_service, runtime, run_fast_path, summarize_conversation, streaming_run_config
+    from google.adk.runners import Runner
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from services.session_store import build_session_service_from_env
+    from agent import kisan_orchestrator_agent, run_fast_path as agent_run_fast_path
+    from agent import summarize_conversation as agent_summarize_conversation
+    from tools.calendar_tool import preload_crop_calendar
+
+    try:
+        # Loaded here, off the event loop, rather than by the first calendar question.
+        preload_crop_calendar()
+    except Exception as e:
+        logger.warning(f"Could not preload the crop calendar, it will be loaded on first use: {e}")
+    # In memory by default; SESSION_BACKEND=sqlite or redis shares sessions between workers (see services/session_store.py).
+    session_service = build_session_service_from_env("orchestrator")
+    run_fast_path = agent_run_fast_path
+    summarize_conversation = agent_summarize_conversation
+    streaming_run_config = RunConfig(streaming_mode=StreamingMode.SSE)
     runtime = Runner(
         app_name=APP_NAME,
         agent=kisan_orchestrator_agent,
         session_service=session_service
     )
-    print("Agent Runner initialized successfully.")
-except Exception as e:
-    print(f"ERROR (main.py): Failed to initialize Agent Runner. Error: {e}")
-    import traceback
 
-    traceback.print_exc()
-    exit(1)
+
+async def _start_agent_runtime():
+    started_at = time.monotonic()
+    try:
+        await asyncio.to_thread(_init_agent_runtime)
+    except Exception as e:
+        logger.exception(f"Failed to initialize Agent Runner: {e}")
+        return
+    logger.info(f"Agent Runner initialized successfully in {time.monotonic() - started_at:.2f}s.")
+
+
+async def _wait_for_agent_runtime():
+    """Waits for the background agent import after a cold start; 503 if it failed."""
+    if runtime is None:
+        await asyncio.shield(_agent_runtime_task)
+    if runtime is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The agent failed to initialize on this instance."
+        )
+
+
+# --- FastAPI Application Setup ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _agent_runtime_task
+    _agent_runtime_task = asyncio.create_task(_start_agent_runtime())
+    await _start_firebase_services()
+    yield
+    await token_verifier.stop()
+    await close_weather_client()
+    # Let in-flight conversation logging finish, then flush everything queued to Firestore.
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await conversation_log.stop()
+    if session_service is not None:
+        await session_service.close()
+    shutdown_tracing()
+    await logger.complete()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+# Refuse oversized image uploads with 413 while the body is still streaming in.
+app.add_middleware(MaxUploadSizeMiddleware, paths=("/api/simple",))
+# Root span, in-flight gauge and latency histogram of every request (see services/tracing.py).
+app.add_middleware(HttpMetricsMiddleware, paths=(
+    "/api/simple", "/api/simple/stream", "/api/batch", "/api/chat-history", "/weather", "/api/ping", "/api/metrics"
+))
+# Outermost, so every log record of a request carries its id (returned as X-Request-ID).
+app.add_middleware(RequestContextMiddleware)
 
 
 # --- Dependency to validate Firebase ID token and get user ID ---
@@ -141,71 +251,118 @@ async def get_user_id_from_token(
         if scheme.lower() != "bearer":
             raise ValueError("Invalid authentication scheme")
 
-        decoded_token = await asyncio.to_thread(auth.verify_id_token, token)
+        with span("auth.verify_token"):
+            decoded_token = await token_verifier.verify(token)
         user_uid = decoded_token['uid']
-        print(f"DEBUG: Token verified. Authenticated user ID: {user_uid}")
+        logger.debug(f"Token verified for user '{user_uid}'")
         return user_uid
     except Exception as e:
-        print(f"WARNING: Failed to verify Firebase ID token: {e}")
+        logger.warning(f"Failed to verify Firebase ID token: {truncate(e)}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid or missing authentication token: {str(e)}"
         )
 
 
-# --- FastAPI Route Definition for Agent Interaction ---
-@app.post("/api/simple")
-async def simple_route(
-        query: Annotated[str | None, Form()] = None,
-        image: Annotated[UploadFile | None, File()] = None,
-        current_user_id: str = Depends(get_user_id_from_token)
-):
-    """
-    API endpoint to interact with the kisan_orchestrated_agent.
-    Requires a valid Firebase ID token for authentication.
-    """
-    print("DEBUG: Request received by /api/simple endpoint!")
-    print(f"User ID for this request: '{current_user_id}'")
-    print(f"Received query: '{query}'")
-    print(f"Received image: {image.filename if image else 'None'}")
+# --- Helpers shared by the /api/simple routes ---
+def _admission_error(rejection: AdmissionRejected) -> HTTPException:
+    logger.warning(f"Agent run rejected by admission control: {rejection.reason}")
+    return HTTPException(
+        status_code=rejection.status_code,
+        detail=f"{rejection.reason}. Please retry later.",
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
 
+def _validate_request_inputs(query: str | None, image: UploadFile | None):
     if query is None and image is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least 'query' or 'image' must be provided."
         )
 
-    session_id = str(uuid.uuid4())
-    image_public_url = None
 
+def _event_text(event) -> str:
+    """Concatenates the text parts of an agent event."""
+    event_content = getattr(event, 'content', None)
+    if not event_content or not event_content.parts:
+        return ""
+    return "".join(part.text for part in event_content.parts if getattr(part, 'text', None))
+
+
+async def _create_agent_session(current_user_id: str) -> str:
+    """Creates a fresh orchestrator session for the user and returns its id."""
+    session_id = str(uuid.uuid4())
     try:
-        await session_service.create_session(
-            app_name=APP_NAME,
-            user_id=current_user_id,
-            session_id=session_id
-        )
-        print(f"DEBUG: Session '{session_id}' created successfully for user '{current_user_id}'.")
+        with span("session.create"):
+            await session_service.create_session(
+                app_name=APP_NAME,
+                user_id=current_user_id,
+                session_id=session_id
+            )
     except Exception as e:
-        print(f"ERROR: Failed to create session {session_id}: {e}")
+        logger.error(f"Failed to create session {session_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create session: {str(e)}"
         )
+    return session_id
+
+
+async def _open_agent_session(current_user_id: str, session_id: str | None) -> tuple[str, int]:
+    """
+    Returns (session id, turn number): the user's session `session_id` continued, or a new session
+    if it is None. 404 if the session does not exist (or expired).
+    """
+    if session_id is None:
+        return await _create_agent_session(current_user_id), 1
+    try:
+        with span("session.load"):
+            session = await session_service.get_session(
+                app_name=APP_NAME, user_id=current_user_id, session_id=session_id
+            )
+    except Exception as e:
+        logger.error(f"Failed to load session {session_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load session: {str(e)}"
+        )
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found or expired. Start a new conversation without session_id."
+        )
+    return session_id, len(split_turns([event.content for event in session.events if event.content])) + 1
 
+
+async def _build_user_message(
+        query: str | None,
+        image: UploadFile | None,
+        current_user_id: str
+) -> tuple[types.Content, PendingImageUpload, dict]:
+    """
+    Builds the user Content for the orchestrator and starts archiving the original image (if any)
+    to Firebase Storage in the background. The model receives a downsized, EXIF-free copy.
+    Returns the content, the pending upload (await it once the agent has answered) and image
+    size details for the conversation record.
+    """
+    pending_upload = PendingImageUpload()
+    image_details = {}
     message_parts = []
     if query:
         message_parts.append(types.Part(text=query))
 
     if image:
         if not bucket:
-            print("ERROR: Firebase Storage not initialized. Cannot upload image.")
+            logger.error("Firebase Storage not initialized. Cannot upload image.")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Firebase Storage not initialized. Image upload failed."
             )
 
         try:
-            image_bytes = await image.read()
+            with span("image.read"):
+                image_bytes = await read_upload_limited(image)
             if not image_bytes:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -217,141 +374,581 @@ async def simple_route(
                 file_extension = image.filename.rsplit('.', 1)[-1].lower() if '.' in image.filename else ''
                 mime_type_mapping = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif'}
                 detected_mime_type = mime_type_mapping.get(file_extension, 'image/jpeg')
-                print(f"WARNING: No MIME type provided. Inferred as: {detected_mime_type}")
+                logger.debug(f"No MIME type provided. Inferred as: {detected_mime_type}")
 
-            file_extension = image.filename.split('.')[-1] if '.' in image.filename else 'bin'
-            destination_blob_name = f"artifacts/{APP_ID}/users/{current_user_id}/images/{uuid.uuid4()}.{file_extension}"
-            blob = bucket.blob(destination_blob_name)
+            with span("image.preprocess", bytes=len(image_bytes)):
+                prepared_image = await asyncio.to_thread(preprocess_image, image_bytes)
+            image_details = {
+                "image_original_bytes": prepared_image.original_bytes,
+                "image_sent_bytes": prepared_image.sent_bytes,
+            }
+            logger.debug(f"Image preprocessed {prepared_image.original_bytes} -> {prepared_image.sent_bytes} bytes "
+                         f"({prepared_image.width}x{prepared_image.height}) in {prepared_image.encode_seconds * 1000:.0f} ms")
 
-            await asyncio.to_thread(blob.upload_from_string, image_bytes, content_type=detected_mime_type)
-            await asyncio.to_thread(blob.make_public)
-            image_public_url = blob.public_url
-            print(f"DEBUG: Image uploaded to Firebase Storage: {image_public_url}")
+            file_extension = image.filename.split('.')[-1] if '.' in image.filename else 'bin'
+            destination_blob_name = image_archiver.blob_name(current_user_id, image_bytes, file_extension)
+            pending_upload = PendingImageUpload(
+                task=image_archiver.start_upload(destination_blob_name, image_bytes, detected_mime_type),
+                public_url=image_archiver.public_url(destination_blob_name)
+            )
 
             message_parts.append(
                 types.Part(
                     inline_data={
-                        'mime_type': detected_mime_type,
-                        'data': image_bytes
+                        'mime_type': prepared_image.mime_type,
+                        'data': prepared_image.data
                     }
                 )
             )
 
+        except HTTPException:
+            raise
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+        except InvalidImage as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         except Exception as e:
-            print(f"ERROR: Failed to process or upload image: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Failed to process or upload image: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to process or upload image: {str(e)}"
             )
 
-    new_message_content = types.Content(
-        role="user",
-        parts=message_parts
-    )
+    return types.Content(role="user", parts=message_parts), pending_upload, image_details
 
-    final_response_text = "The agent could not generate a response."
+
+# Background conversation-logging tasks, kept referenced until done and awaited on shutdown.
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _store_conversation(
+        current_user_id: str,
+        session_id: str,
+        query: str | None,
+        final_response_text: str,
+        pending_upload: PendingImageUpload,
+        image_filename: str | None,
+        image_details: dict | None = None,
+        route: str = "orchestrator",
+        model_calls: list[dict] | None = None,
+        turn: int = 1
+):
+    """
+    Queues the query/response pair for the user's Firestore conversations collection without
+    blocking the response: once the image upload (if any) finishes, the document is handed to
+    the write-behind conversation_log, which batches it into Firestore. `model_calls` are the
+    model calls recorded while answering (see services/model_config.py); `turn` is the turn
+    number of the request in its session.
+    """
+    LLM_CALLS_PER_REQUEST.observe(len(model_calls or []), route=route)
+    LLM_INPUT_TOKENS_PER_REQUEST.observe(input_tokens(model_calls or []), route=route, turn=turn_label(turn))
+    if not db:
+        return
+
+    async def enqueue_when_uploaded():
+        image_public_url = await pending_upload.result()
+        doc_data = {
+            "query": query,
+            "response": final_response_text,
+            "timestamp": firestore.SERVER_TIMESTAMP,
+            "session_id": session_id,
+            "model_used": models_used(model_calls or []),
+            "model_calls": model_calls or [],
+            "image_url": image_public_url,
+            "image_filename": image_filename,
+            "route": route,
+            **(image_details or {})
+        }
+        doc_id = conversation_log.enqueue(f"artifacts/{APP_ID}/users/{current_user_id}/conversations", doc_data)
+        logger.debug(f"Response queued for Firestore with ID: {doc_id}")
+
+    task = asyncio.create_task(enqueue_when_uploaded())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _answer_on_fast_path(decision: RouteDecision, current_user_id: str, query: str) -> str | None:
+    """
+    Answers a routed query by calling its tool directly and logs the conversation. Returns None
+    if the tool had no usable answer; the caller then falls back to the orchestrator.
+    """
+    logger.debug(f"Fast path '{decision.intent}' ({decision.source}) with args {truncate(decision.args)}")
+    started_at = time.monotonic()
+    model_calls = start_model_usage_recording()
     try:
-        events_generator = runtime.run(
-            user_id=current_user_id,
-            session_id=session_id,
-            new_message=new_message_content
+        with span("fast_path", intent=decision.intent):
+            answer = await run_fast_path(decision)
+    except Exception as e:
+        logger.warning(f"Fast path '{decision.intent}' failed, falling back to the orchestrator: {e}")
+        answer = None
+    intent_router.observe_fast_path(decision, started_at, served=answer is not None)
+
+    if answer is not None:
+        _store_conversation(
+            current_user_id, None, query, answer, PendingImageUpload(), None,
+            route=f"fast_path:{decision.intent}", model_calls=model_calls
         )
+    return answer
+
+
+# --- FastAPI Route Definition for Agent Interaction ---
+@app.post("/api/simple")
+async def simple_route(
+        query: Annotated[str | None, Form()] = None,
+        image: Annotated[UploadFile | None, File()] = None,
+        session_id: Annotated[str | None, Form()] = None,
+        current_user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    API endpoint to interact with the kisan_orchestrated_agent.
+    Requires a valid Firebase ID token for authentication.
+    Pass the `session_id` of an earlier answer to continue that conversation; the response carries
+    the session id for the next turn (except for answers from the fast path, which have no session).
+    """
+    logger.info("Request received on /api/simple", user_id=current_user_id, has_image=image is not None)
+    if query:
+        logger.debug(f"Query: {truncate(query)}")
+
+    _validate_request_inputs(query, image)
+    await _wait_for_agent_runtime()
+    try:
+        with span("admission.wait"):
+            admitted_at = await agent_admission.acquire()
+    except AdmissionRejected as rejection:
+        raise _admission_error(rejection)
+
+    try:
+        return await _run_simple_request(query, image, session_id, current_user_id)
+    finally:
+        agent_admission.release(admitted_at)
+
+
+def _schedule_context_compaction(current_user_id: str, session_id: str, turn: int):
+    """Updates the session's conversation summary in the background once turns leave the recent window."""
+    if turn < CONTEXT_RECENT_TURNS + CONTEXT_SUMMARY_BATCH:
+        return
+
+    async def compact():
+        try:
+            with span("context.compact"):
+                await compact_session(session_service, APP_NAME, current_user_id, session_id, summarize_conversation)
+        except Exception as e:
+            logger.warning(f"Could not update the conversation summary of session {session_id}: {e}")
 
-        for event in events_generator:
-            is_final = getattr(event, 'is_final_response', False)
-            event_content = getattr(event, 'content', None)
+    task = asyncio.create_task(compact())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
-            if event_content and getattr(event_content, 'parts', None):
-                for part in event_content.parts:
-                    if getattr(part, 'text', None):
-                        if is_final:
-                            final_response_text = part.text
-                            if final_response_text != "The agent could not generate a response.":
-                                break
 
-            if is_final and final_response_text != "The agent could not generate a response.":
+async def _run_orchestrator(
+        current_user_id: str,
+        session_id: str,
+        new_message_content: types.Content,
+        pending_upload: PendingImageUpload
+) -> str:
+    """Runs the orchestrator on the message in the session and returns its final answer text."""
+    final_response_text = "The agent could not generate a response."
+    async with aclosing(runtime.run_async(
+            user_id=current_user_id,
+            session_id=session_id,
+            new_message=new_message_content,
+            state_delta=image_reference_delta(new_message_content, pending_upload.public_url) or None
+    )) as events:
+        async for event in events:
+            if not event.is_final_response():
+                continue
+            text = _event_text(event)
+            if text:
+                final_response_text = text
                 break
+    return final_response_text
 
-        print(f"DEBUG: Agent execution completed. Final response text: {final_response_text}")
-
-        # --- Store Response in Firestore ---
-        if db:
-            try:
-                conversations_ref = db.collection(f"artifacts/{APP_ID}/users/{current_user_id}/conversations")
-                doc_data = {
-                    "query": query,
-                    "response": final_response_text,
-                    "timestamp": firestore.SERVER_TIMESTAMP,
-                    "session_id": session_id,
-                    "model_used": MODEL_NAME,
-                    "image_url": image_public_url,
-                    "image_filename": image.filename if image else None
-                }
-                doc_ref = await asyncio.to_thread(conversations_ref.add, doc_data)
-                print(f"DEBUG: Response stored in Firestore with ID: {doc_ref[1].id}")
-            except Exception as e:
-                print(f"ERROR: Failed to store response in Firestore: {e}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Failed to store conversation in Firestore due to insufficient permissions. Please check your Firebase rules and service account roles: {str(e)}"
-                )
 
-        return {"response": final_response_text}
+async def _run_simple_request(query: str | None, image: UploadFile | None, session_id: str | None,
+                              current_user_id: str):
+    # A continued conversation goes to the orchestrator, which sees the earlier turns.
+    decision = intent_router.route(query) if image is None and session_id is None else None
+    if decision:
+        answer = await _answer_on_fast_path(decision, current_user_id, query)
+        if answer is not None:
+            return {"response": answer}
+
+    session_id, turn = await _open_agent_session(current_user_id, session_id)
+    new_message_content, pending_upload, image_details = await _build_user_message(query, image, current_user_id)
+
+    started_at = time.monotonic()
+    model_calls = start_model_usage_recording()
+    try:
+        with span("orchestrator", has_image=image is not None):
+            final_response_text = await _run_orchestrator(
+                current_user_id, session_id, new_message_content, pending_upload
+            )
+
+        logger.debug(f"Agent execution completed. Final response: {truncate(final_response_text)}")
+        if image is None:
+            intent_router.observe_orchestrator(time.monotonic() - started_at)
+
+        # --- Store Response in Firestore (write-behind, off the response path) ---
+        _store_conversation(
+            current_user_id, session_id, query, final_response_text,
+            pending_upload, image.filename if image else None, image_details, model_calls=model_calls, turn=turn
+        )
+        _schedule_context_compaction(current_user_id, session_id, turn)
+
+        return {"response": final_response_text, "session_id": session_id}
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"ERROR: An error occurred during agent execution: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"An error occurred during agent execution: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get response from agent: {str(e)}"
         )
 
 
-# @app.get("/weather", response_model=WeatherResponse)
-# def fetch_weather(location: str = Query(..., example="Bangalore")):
-#     try:
-#         return get_weather_forecast(location)
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=str(e))
+# --- Batch endpoint: many questions under one authentication, results streamed as NDJSON ---
+BATCH_ITEMS = metrics.counter("kisan_batch_items_total", "/api/batch items by result", ["result"])
 
-@app.get("/api/chat-history")
-async def get_chat_history(
+
+async def _build_batch_message(
+        query: str | None,
+        image_url: str | None,
+        current_user_id: str
+) -> tuple[types.Content, PendingImageUpload, dict, str | None]:
+    """
+    Like _build_user_message, with the image read back from the user's archived photos instead of
+    an upload. Returns the content, the (already stored) image, its size details and its file name.
+    """
+    message_parts = [types.Part(text=query)] if query else []
+    if not image_url:
+        return types.Content(role="user", parts=message_parts), PendingImageUpload(), {}, None
+
+    blob_name = image_archiver.user_blob_name(current_user_id, image_url)
+    if blob_name is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'image_url' must reference one of your stored images."
+        )
+    try:
+        image_bytes = await image_archiver.download(blob_name)
+    except Exception as e:
+        logger.warning(f"Could not read referenced image '{blob_name}': {truncate(e)}")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Referenced image not found.")
+    try:
+        with span("image.preprocess", bytes=len(image_bytes)):
+            prepared_image = await asyncio.to_thread(preprocess_image, image_bytes)
+    except InvalidImage as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    message_parts.append(types.Part(inline_data={'mime_type': prepared_image.mime_type, 'data': prepared_image.data}))
+    image_details = {
+        "image_original_bytes": prepared_image.original_bytes,
+        "image_sent_bytes": prepared_image.sent_bytes,
+    }
+    return (types.Content(role="user", parts=message_parts),
+            PendingImageUpload(public_url=image_archiver.public_url(blob_name)),
+            image_details, blob_name.rsplit("/", 1)[-1])
+
+
+async def _run_batch_item(item: BatchItem, current_user_id: str) -> dict:
+    query = item.query.strip() if item.query and item.query.strip() else None
+    decision = intent_router.route(query) if item.image_url is None else None
+    if decision:
+        answer = await _answer_on_fast_path(decision, current_user_id, query)
+        if answer is not None:
+            return {"status": 200, "response": answer, "route": f"fast_path:{decision.intent}"}
+
+    session_id = await _create_agent_session(current_user_id)
+    new_message_content, pending_upload, image_details, image_filename = await _build_batch_message(
+        query, item.image_url, current_user_id
+    )
+    started_at = time.monotonic()
+    model_calls = start_model_usage_recording()
+    with span("orchestrator", has_image=item.image_url is not None, batch=True):
+        final_response_text = await _run_orchestrator(current_user_id, session_id, new_message_content, pending_upload)
+    if item.image_url is None:
+        intent_router.observe_orchestrator(time.monotonic() - started_at)
+    _store_conversation(
+        current_user_id, session_id, query, final_response_text,
+        pending_upload, image_filename, image_details, model_calls=model_calls
+    )
+    return {"status": 200, "response": final_response_text, "route": "orchestrator", "session_id": session_id}
+
+
+async def _answer_batch_item(item: BatchItem, current_user_id: str) -> dict:
+    """Answers one batch item under an admission slot; failures become an error result, not an exception."""
+    started_at = time.monotonic()
+    try:
+        with span("admission.wait"):
+            admitted_at = await agent_admission.acquire()
+    except AdmissionRejected as rejection:
+        result = {"status": rejection.status_code, "error": f"{rejection.reason}. Please retry later."}
+    else:
+        try:
+            result = await _run_batch_item(item, current_user_id)
+        except HTTPException as e:
+            result = {"status": e.status_code, "error": e.detail}
+        except Exception as e:
+            logger.exception(f"An error occurred while answering a batch item: {e}")
+            result = {"status": 500, "error": f"Failed to get response from agent: {str(e)}"}
+        finally:
+            agent_admission.release(admitted_at)
+    result["duration_ms"] = round((time.monotonic() - started_at) * 1000)
+    return result
+
+
+@app.post("/api/batch")
+async def batch_route(
+        batch: BatchRequest,
+        current_user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    Answers up to BATCH_MAX_ITEMS questions (`query` and/or `image_url` of a stored photo) under one
+    authentication, BATCH_MAX_CONCURRENCY at a time. The response is NDJSON, one line per item as
+    soon as it is answered (in completion order, with its `index` and `id`):
+    {"index", "id", "status", "response", "route", "session_id", "duration_ms"}, or "error" instead
+    of "response" for a failed item. A last line {"done": true, "items", "errors", "duration_ms"}
+    closes the stream. Identical items are answered once.
+    """
+    logger.info("Request received on /api/batch", user_id=current_user_id, items=len(batch.items))
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can have at most {BATCH_MAX_ITEMS} items, got {len(batch.items)}."
+        )
+    await _wait_for_agent_runtime()
+
+    # Items asking the same thing share one answer.
+    groups: dict[tuple, list[int]] = {}
+    for index, item in enumerate(batch.items):
+        groups.setdefault((normalize_query(item.query or ""), item.image_url), []).append(index)
+    unique_items = [batch.items[indexes[0]] for indexes in groups.values()]
+    indexes_by_unique = list(groups.values())
+
+    async def results():
+        started_at = time.monotonic()
+        errors = 0
+        async for unique_index, result in run_bounded(
+                unique_items, lambda item: _answer_batch_item(item, current_user_id), BATCH_MAX_CONCURRENCY
+        ):
+            for index in indexes_by_unique[unique_index]:
+                ok = result["status"] == 200
+                errors += not ok
+                BATCH_ITEMS.inc(result="ok" if ok else "error")
+                yield json.dumps({"index": index, "id": batch.items[index].id, **result}, ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "done": True,
+            "items": len(batch.items),
+            "errors": errors,
+            "duration_ms": round((time.monotonic() - started_at) * 1000),
+        }) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
+# --- Streaming (Server-Sent Events) variant of /api/simple ---
+# Progress messages sent to the client when the orchestrator calls one of its tools.
+TOOL_PROGRESS_MESSAGES = {
+    "crop_diagnosis_tool": "Diagnosing your crop…",
+    "market_analysis_tool": "Checking market prices…",
+    "scheme_navigator_tool": "Looking up government schemes…",
+    "summarize_output_tool": "Preparing your answer…",
+    "crop_calendar_tool": "Checking the crop calendar…",
+    "get_weather_tool": "Checking the weather forecast…",
+    "crop_market_pipeline_tool": "Diagnosing your crop and checking market prices…",
+}
+# The same messages, by fast-path intent.
+FAST_PATH_PROGRESS_TOOLS = {
+    "calendar": "crop_calendar_tool",
+    "weather": "get_weather_tool",
+    "market": "market_analysis_tool",
+    "scheme": "scheme_navigator_tool",
+}
+
+
+def _sse_event(event_type: str, data: dict) -> str:
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    Releases the admission slot taken for the request once sending ends. Done here rather than in the
+    body generator, whose `finally` never runs if the client is gone before the body is iterated.
+    """
+
+    def __init__(self, *args, admitted_at: float, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.admitted_at = admitted_at
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            agent_admission.release(self.admitted_at)
+
+
+@app.post("/api/simple/stream")
+async def simple_stream_route(
+        query: Annotated[str | None, Form()] = None,
+        image: Annotated[UploadFile | None, File()] = None,
+        session_id: Annotated[str | None, Form()] = None,
         current_user_id: str = Depends(get_user_id_from_token)
 ):
     """
-    Get the conversation history (query + response) for the authenticated user.
+    Same contract as /api/simple, but streams the answer as Server-Sent Events while it is generated.
+    Event types: 'session', 'progress' (tool being called), 'partial' (text chunk), 'final' (full answer)
+    and 'error'. Queries answered on the fast path get no 'session' event.
     """
+    logger.info("Request received on /api/simple/stream", user_id=current_user_id, has_image=image is not None)
+
+    _validate_request_inputs(query, image)
+    await _wait_for_agent_runtime()
     try:
-        conversations_ref = db.collection(f"artifacts/{APP_ID}/users/{current_user_id}/conversations")
-        docs = await asyncio.to_thread(lambda: list(conversations_ref.stream()))
+        with span("admission.wait"):
+            admitted_at = await agent_admission.acquire()
+    except AdmissionRejected as rejection:
+        raise _admission_error(rejection)
+
+    decision = intent_router.route(query) if image is None and session_id is None else None
+    turn, new_message_content, pending_upload, image_details = 1, None, PendingImageUpload(), {}
+    if decision is None:
+        try:
+            session_id, turn = await _open_agent_session(current_user_id, session_id)
+            new_message_content, pending_upload, image_details = await _build_user_message(
+                query, image, current_user_id
+            )
+        except BaseException:
+            agent_admission.release(admitted_at)
+            raise
+    image_filename = image.filename if image else None
+
+    async def event_stream():
+        nonlocal session_id, new_message_content, pending_upload, image_details
+        final_response_text = "The agent could not generate a response."
+        try:
+            if decision:
+                tool_name = FAST_PATH_PROGRESS_TOOLS[decision.intent]
+                yield _sse_event("progress", {"tool": tool_name, "message": TOOL_PROGRESS_MESSAGES[tool_name]})
+                answer = await _answer_on_fast_path(decision, current_user_id, query)
+                if answer is not None:
+                    yield _sse_event("final", {"response": answer})
+                    return
+                # No usable tool answer: continue with a regular orchestrator run.
+                session_id = await _create_agent_session(current_user_id)
+                new_message_content, pending_upload, image_details = await _build_user_message(
+                    query, None, current_user_id
+                )
 
-        history = []
-        for doc in docs:
-            data = doc.to_dict()
-            history.append({
-                "query": data.get("query"),
-                "response": data.get("response"),
-                "timestamp": data.get("timestamp"),
-                "model_used": data.get("model_used"),
-                "image_url": data.get("image_url"),
-                "image_filename": data.get("image_filename"),
-            })
+            yield _sse_event("session", {"session_id": session_id})
+            started_at = time.monotonic()
+            model_calls = start_model_usage_recording()
+            with span("orchestrator", has_image=image is not None, streaming=True):
+                async with aclosing(runtime.run_async(
+                        user_id=current_user_id,
+                        session_id=session_id,
+                        new_message=new_message_content,
+                        state_delta=image_reference_delta(new_message_content, pending_upload.public_url) or None,
+                        run_config=streaming_run_config
+                )) as events:
+                    async for event in events:
+                        for function_call in event.get_function_calls():
+                            yield _sse_event("progress", {
+                                "tool": function_call.name,
+                                "message": TOOL_PROGRESS_MESSAGES.get(function_call.name, "Working on it…")
+                            })
+
+                        text = _event_text(event)
+                        if not text:
+                            continue
+
+                        if event.partial:
+                            yield _sse_event("partial", {"text": text})
+                        elif event.is_final_response():
+                            final_response_text = text
+                            break
+
+            if image is None:
+                intent_router.observe_orchestrator(time.monotonic() - started_at)
+            # Queued before the final frame so a client disconnecting right after it does not skip the log.
+            _store_conversation(
+                current_user_id, session_id, query, final_response_text,
+                pending_upload, image_filename, image_details, model_calls=model_calls, turn=turn
+            )
+            _schedule_context_compaction(current_user_id, session_id, turn)
+            yield _sse_event("final", {"response": final_response_text})
+        except Exception as e:
+            logger.exception(f"An error occurred during streamed agent execution: {e}")
+            yield _sse_event("error", {"detail": f"Failed to get response from agent: {str(e)}"})
+
+    return _AdmittedStreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        admitted_at=admitted_at
+    )
 
-        # Optional: sort by timestamp if needed
-        history.sort(key=lambda x: x.get("timestamp") or 0, reverse=True)
 
-        return {"history": history}
+@app.get("/weather", response_model=WeatherResponse)
+async def fetch_weather(location: str = Query(..., examples=["Bangalore"])):
+    try:
+        return await get_weather_forecast(location)
+    except WeatherServiceError as e:
+        # weatherapi.com answers 400 for a location it cannot resolve.
+        if e.status_code == 400:
+            raise HTTPException(status_code=404, detail=f"Location not found: {location}")
+        raise HTTPException(status_code=504 if e.status_code == 504 else 502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/chat-history")
+async def get_chat_history(
+        limit: Annotated[int, Query(ge=1, le=100, description="Conversations per page")] = 20,
+        cursor: Annotated[str | None, Query(description="next_cursor from the previous page")] = None,
+        current_user_id: str = Depends(get_user_id_from_token)
+):
+    """
+    Get the conversation history (query + response) for the authenticated user, newest first.
+    Pass the returned `next_cursor` to fetch the following page; it is null on the last page.
+    """
+    try:
+        after_doc_id = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if after_doc_id is None:
+        cached_page = history_page_cache.get(current_user_id, limit)
+        if cached_page is not None:
+            return cached_page
+
+    try:
+        generation = history_page_cache.generation(current_user_id)
+        conversations_ref = db.collection(f"artifacts/{APP_ID}/users/{current_user_id}/conversations")
+        with span("firestore.history_page", limit=limit):
+            page = await asyncio.to_thread(fetch_history_page, conversations_ref, limit, after_doc_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"ERROR fetching chat history: {e}")
+        logger.exception(f"Error fetching chat history: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve chat history: {str(e)}"
         )
 
+    if after_doc_id is None:
+        history_page_cache.put(current_user_id, limit, page, generation)
+    return page
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    This worker's metrics in the Prometheus text format: stage, agent and model call latencies,
+    model calls per request, cache hit/miss counts and in-flight gauges. Holds no user data.
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/api/ping")
 async def ping():
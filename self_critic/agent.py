@@ -1,12 +1,22 @@
 """
 Self Critic Agent - Project Kisan
 Provides quality assurance for agricultural advice output.
+
+Diagnosis, market and scheme results are computed once and kept in session state. Only the
+summary is redrafted: each round runs cheap local pre-checks first, calls the LLM reviewer only
+when those pass, and feeds the reviewer's feedback into the next draft. Results the draft does not
+name verbatim are only pointed out to the reviewer, since drafts in the farmer's language or in
+other words name them differently. After SELF_CRITIC_MAX_ITERATIONS drafts the best effort is
+returned with a caveat instead of failing.
 """
 
+import re
+import time
 from google.genai.types import Content, Part
-from typing import AsyncGenerator
-from google.adk.agents import BaseAgent, LlmAgent, SequentialAgent, ParallelAgent
-from google.adk.events import Event
+from typing import AsyncGenerator, Optional
+from google.adk.agents import BaseAgent, LlmAgent, LoopAgent, SequentialAgent, ParallelAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.events import Event, EventActions
 from google.adk.agents.invocation_context import InvocationContext
 import os
 from dotenv import load_dotenv
@@ -21,6 +31,26 @@ from subagent import (
     scheme_navigator_agent,
     summary_agent
 )
+from basemodel_dto.agent_responsedto import SummaryReviewResult
+from services import metrics
+from services.model_config import model_kwargs
+
+MAX_REFINEMENT_ITERATIONS = int(os.getenv("SELF_CRITIC_MAX_ITERATIONS", "3"))
+MIN_SUMMARY_CHARS = 80
+MAX_SUMMARY_CHARS = int(os.getenv("SELF_CRITIC_MAX_SUMMARY_CHARS", "1500"))
+
+SELF_CRITIC_ITERATIONS = metrics.histogram(
+    "kisan_self_critic_iterations", "Summary drafts written per request", ["outcome"],
+    buckets=tuple(float(i) for i in range(1, 11))
+)
+SELF_CRITIC_ADDED_LATENCY = metrics.histogram(
+    "kisan_self_critic_added_latency_seconds", "Time spent redrafting after the first review", ["outcome"]
+)
+SELF_CRITIC_PRECHECKS = metrics.counter(
+    "kisan_self_critic_prechecks_total", "Local summary pre-check results", ["result"]
+)
+
+_RAW_FORMATTING_RE = re.compile(r"```|\{\s*\"|\"\s*:\s*[\"\[{]")
 
 # Step 1: Parallel agent to analyze market and scheme in parallel
 agri_parallel = ParallelAgent(
@@ -29,28 +59,182 @@ agri_parallel = ParallelAgent(
     description="Runs market analysis and scheme navigator in parallel"
 )
 
-# Step 2: Self-review agent to assess quality of summary
+
+# Step 2: Reset the review bookkeeping for this request
+class StartSummaryReview(BaseAgent):
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        user_query = ""
+        if ctx.user_content and ctx.user_content.parts:
+            user_query = "".join(part.text for part in ctx.user_content.parts if part.text)
+        yield Event(author=self.name, invocation_id=ctx.invocation_id, actions=EventActions(state_delta={
+            "self_critic_user_query": user_query,
+            "self_critic_iteration": 0,
+            "self_critic_first_review_at": None,
+            "self_critic_precheck_issues": "",
+            "self_critic_precheck_hints": "",
+            "trip_summary": "",
+            "review_feedback": "",
+        }))
+
+
+start_summary_review = StartSummaryReview(
+    name="StartSummaryReview",
+    description="Clears the previous request's drafts and review state."
+)
+
+# Step 3a: Summary writer, the only LLM step that is repeated. It reads the stored results instead of re-running them.
+kisan_summary_writer = summary_agent.clone(update={
+    "name": "KisanSummaryWriter",
+    **model_kwargs("KisanSummaryWriter"),
+    "include_contents": "none",
+    "instruction": summary_agent.instruction + """
+Farmer's question: {self_critic_user_query?}
+Crop diagnosis: {diagnosis_result?}
+Market analysis: {market_result?}
+Government scheme: {scheme_result?}
+
+Previous draft: {trip_summary?}
+Reviewer feedback on the previous draft: {review_feedback?}
+If there is feedback, rewrite the previous draft so it addresses every point and keep what was already good.
+""",
+})
+
+
+def summary_issues(summary: str) -> list[str]:
+    """Cheap local checks for drafts that would certainly fail review."""
+    summary = (summary or "").strip()
+    if len(summary) < MIN_SUMMARY_CHARS:
+        return ["The summary is empty or too short; cover the diagnosis, market and scheme results."]
+
+    issues = []
+    if len(summary) > MAX_SUMMARY_CHARS:
+        issues.append(f"The summary is too long for voice output; keep it under {MAX_SUMMARY_CHARS} characters.")
+    if _RAW_FORMATTING_RE.search(summary):
+        issues.append("The summary contains raw JSON or code formatting; use plain sentences only.")
+    return issues
+
+
+def summary_hints(summary: str, state) -> list[str]:
+    """Results whose names do not appear verbatim in the draft, for the reviewer to check."""
+    lowered = (summary or "").lower()
+    diagnosis, market, scheme = (state.get(key) for key in ("diagnosis_result", "market_result", "scheme_result"))
+    hints = []
+    if isinstance(diagnosis, dict) and diagnosis.get("disease") and diagnosis["disease"].lower() not in lowered:
+        hints.append(f"the diagnosed disease ({diagnosis['disease']}) and its remedies")
+    if isinstance(market, dict) and market.get("crop") and market["crop"].lower() not in lowered:
+        hints.append(f"the market price and sell/hold advice for {market['crop']}")
+    if isinstance(scheme, dict) and scheme.get("scheme_name") and scheme["scheme_name"].lower() not in lowered:
+        hints.append(f"the government scheme ({scheme['scheme_name']}) and how to apply")
+    return hints
+
+
+# Step 3b: Local pre-checks, so obviously incomplete drafts never reach the LLM reviewer
+class PrecheckKisanSummary(BaseAgent):
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        summary = ctx.session.state.get("trip_summary")
+        issues = summary_issues(summary)
+        hints = [] if issues else summary_hints(summary, ctx.session.state)
+        SELF_CRITIC_PRECHECKS.inc(result="fail" if issues else "hinted" if hints else "pass")
+        yield Event(author=self.name, invocation_id=ctx.invocation_id, actions=EventActions(state_delta={
+            "self_critic_precheck_issues": " ".join(issues),
+            "self_critic_precheck_hints": (
+                f"A local check did not find these named word for word: {'; '.join(hints)}. The advice may be in the "
+                "farmer's language or use other words, so only fail it if they are really missing."
+            ) if hints else "",
+        }))
+
+
+precheck_summary_agent = PrecheckKisanSummary(
+    name="PrecheckKisanSummary",
+    description="Rejects drafts that are empty, too long or contain raw JSON; flags results not named verbatim."
+)
+
+
+def _skip_review_if_precheck_failed(callback_context: CallbackContext) -> Optional[Content]:
+    if callback_context.state.get("self_critic_precheck_issues"):
+        return Content(role="model", parts=[Part(text="Skipped: the draft failed local pre-checks.")])
+    return None
+
+
+# Step 3c: Self-review agent to assess quality of summary
 kisan_summary_reviewer = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="KisanSummaryReviewer",
+    **model_kwargs("KisanSummaryReviewer"),
+    include_contents="none",
     instruction="""
 Review the final agricultural advice provided in {trip_summary}.
+The results it must be based on: diagnosis {diagnosis_result?}, market {market_result?}, scheme {scheme_result?}.
 - Confirm if it includes crop diagnosis (if applicable), current market status, and relevant government schemes.
+  {self_critic_precheck_hints?}
 - Ensure clarity for rural users, simplicity of remedies, and safety of suggestions.
-- If all requirements are fulfilled and text is easy to understand, return 'pass'. Otherwise return 'fail'.
+- If all requirements are fulfilled and text is easy to understand, return status 'pass'. Otherwise return status 'fail'
+  and, in feedback, list exactly what must change.
 """,
-    output_key="review_status"
+    output_schema=SummaryReviewResult,
+    output_key="review_result",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_agent_callback=_skip_review_if_precheck_failed
+)
+
+
+# Step 3d: Records the verdict and ends the loop once the draft passes
+class SummaryReviewGate(BaseAgent):
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        state = ctx.session.state
+        iteration = state.get("self_critic_iteration", 0) + 1
+        precheck_issues = state.get("self_critic_precheck_issues")
+        if precheck_issues:
+            status, feedback = "fail", precheck_issues
+        else:
+            review = state.get("review_result") or {}
+            status, feedback = review.get("status", "fail"), review.get("feedback", "")
+
+        state_delta = {"review_status": status, "review_feedback": feedback, "self_critic_iteration": iteration}
+        if iteration == 1:
+            state_delta["self_critic_first_review_at"] = time.time()
+        yield Event(author=self.name, invocation_id=ctx.invocation_id, actions=EventActions(
+            state_delta=state_delta,
+            escalate=status == "pass"
+        ))
+
+
+summary_review_gate = SummaryReviewGate(
+    name="SummaryReviewGate",
+    description="Stores the review verdict and feedback; stops the refinement loop on 'pass'."
+)
+
+summary_refinement_loop = LoopAgent(
+    name="SummaryRefinementLoop",
+    description="Redrafts only the summary with reviewer feedback until it passes review.",
+    max_iterations=MAX_REFINEMENT_ITERATIONS,
+    sub_agents=[kisan_summary_writer, precheck_summary_agent, kisan_summary_reviewer, summary_review_gate]
 )
 
-# Step 3: Validation logic to gatekeep output
+
+# Step 4: Validation logic to gatekeep output
 class ValidateKisanSummary(BaseAgent):
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
-        status = ctx.session.state.get("review_status")
-        summary = ctx.session.state.get("trip_summary")  # Output from summary_agent
+        state = ctx.session.state
+        status = state.get("review_status")
+        summary = state.get("trip_summary")  # Latest draft from the summary writer
+        iterations = state.get("self_critic_iteration", 0)
+        outcome = "pass" if status == "pass" else "exhausted"
+
+        SELF_CRITIC_ITERATIONS.observe(iterations, outcome=outcome)
+        first_review_at = state.get("self_critic_first_review_at")
+        if first_review_at:
+            SELF_CRITIC_ADDED_LATENCY.observe(time.time() - first_review_at, outcome=outcome)
+
         if status == "pass":
             yield Event(author=self.name, content=Content(parts=[
                 Part(text=f"✅ Final validated output:\n\n{summary}")
             ]))
+        elif summary:
+            yield Event(author=self.name, content=Content(parts=[
+                Part(text=f"⚠️ This advice did not fully pass quality review after {iterations} attempts "
+                          f"({state.get('review_feedback') or 'no feedback'}). Please double-check it:\n\n{summary}")
+            ]))
         else:
             yield Event(author=self.name, content=Content(parts=[
                 Part(text="❌ The summary did not pass quality review. Please improve the structure or completeness.")
@@ -64,12 +248,12 @@ validate_summary_agent = ValidateKisanSummary(
 # Final root workflow for Self-Critic Kisan Agent
 root_agent = SequentialAgent(
     name="KisanSelfCriticWorkflow",
-    description="Orchestrates a robust multi-step flow: diagnosis → parallel analysis → summarization → review → validation.",
+    description="Orchestrates a robust multi-step flow: diagnosis → parallel analysis → summary refinement loop → validation.",
     sub_agents=[
         crop_diagnosis_agent,         # Optional: can be skipped if no image
         agri_parallel,                # Run market + scheme in parallel
-        summary_agent,                # Compile final advice
-        kisan_summary_reviewer,      # Review output for completeness and clarity
-        validate_summary_agent        # Pass/fail decision
+        start_summary_review,         # Reset drafts and review state for this request
+        summary_refinement_loop,      # Draft → local pre-checks → LLM review, redrafting only the summary
+        validate_summary_agent        # Pass, or best effort with a caveat
     ]
 )
@@ -0,0 +1,91 @@
+# admission.py
+"""
+Admission control for agent runs.
+
+At most `max_concurrent` agent runs execute at once; up to `max_queue` further requests wait
+for a slot for at most `queue_timeout` seconds. Anything beyond that is rejected immediately so
+the worker stays responsive instead of piling up LLM conversations it cannot serve.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when an agent run cannot be admitted. `status_code` is 429 (queue full) or 503 (wait timed out)."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._in_flight = 0
+        self._waiting = 0
+        self._rejected = 0
+        # Exponentially weighted average run time, used to estimate Retry-After.
+        self._avg_run_seconds = 5.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrent=int(os.getenv("AGENT_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("AGENT_MAX_QUEUE", "32")),
+            queue_timeout=float(os.getenv("AGENT_QUEUE_TIMEOUT_SECONDS", "30")),
+        )
+
+    def _retry_after(self) -> int:
+        backlog = self._waiting + self._in_flight
+        return max(1, math.ceil(self._avg_run_seconds * backlog / self.max_concurrent))
+
+    async def acquire(self) -> float:
+        """Waits for a run slot and returns the monotonic admission time. Raises AdmissionRejected."""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise AdmissionRejected(429, self._retry_after(), "Too many agent requests queued")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise AdmissionRejected(503, self._retry_after(), "Timed out waiting for an agent slot")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, admitted_at: float):
+        self._in_flight -= 1
+        self._semaphore.release()
+        elapsed = time.monotonic() - admitted_at
+        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * elapsed
+
+    @asynccontextmanager
+    async def slot(self):
+        admitted_at = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "rejected_total": self._rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,41 @@
+# batch.py
+"""
+Bounded-concurrency execution for /api/batch.
+
+`run_bounded(items, run, concurrency)` runs `run(item)` for every item with at most `concurrency`
+running at once and yields `(index, result)` as each one finishes, so the caller can stream results
+without waiting for the slowest item. If the consumer stops early (e.g. the client disconnected),
+the runs still pending are cancelled.
+
+BATCH_MAX_ITEMS caps the items of one request; BATCH_MAX_CONCURRENCY caps the items of one batch
+running at once. Each item also takes a slot from the worker's admission controller like a single
+request, so batches cannot crowd out interactive traffic beyond AGENT_MAX_CONCURRENCY.
+"""
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+
+async def run_bounded(
+        items: Sequence,
+        run: Callable[[Any], Awaitable[Any]],
+        concurrency: int = BATCH_MAX_CONCURRENCY
+) -> AsyncIterator[tuple[int, Any]]:
+    """Yields (index, run(items[index])) in completion order, running at most `concurrency` at once."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(index: int, item) -> tuple[int, Any]:
+        async with semaphore:
+            return index, await run(item)
+
+    tasks = [asyncio.create_task(run_one(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,137 @@
+# chat_history.py
+"""
+Paginated reads of a user's conversation history.
+
+Pages are ordered server-side by `timestamp` (newest first), limited, and projected to the fields
+the client shows. The cursor is an opaque token wrapping the id of the last document of the
+previous page. The first page of each user is cached for a short TTL and invalidated whenever
+a new conversation is written for that user.
+"""
+import base64
+import binascii
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from google.cloud import firestore
+
+from services import metrics
+
+HISTORY_FIELDS = ["query", "response", "timestamp", "model_used", "image_url", "image_filename"]
+
+HISTORY_CACHE_REQUESTS = metrics.counter(
+    "kisan_chat_history_cache_requests_total", "First-page chat history cache lookups", ["result"]
+)
+
+
+def encode_cursor(doc_id: str) -> str:
+    return base64.urlsafe_b64encode(doc_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        doc_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not doc_id or "/" in doc_id:
+        raise ValueError("Invalid cursor")
+    return doc_id
+
+
+def fetch_history_page(conversations_ref, limit: int, after_doc_id: Optional[str] = None) -> dict:
+    """Blocking Firestore read of one page; returns {"history": [...], "next_cursor": str | None}."""
+    query = (
+        conversations_ref
+        .order_by("timestamp", direction=firestore.Query.DESCENDING)
+        .select(HISTORY_FIELDS)
+    )
+    if after_doc_id:
+        # Only the ordering field is needed to position the cursor.
+        last_snapshot = conversations_ref.document(after_doc_id).get(field_paths=["timestamp"])
+        if not last_snapshot.exists:
+            raise ValueError("Invalid cursor")
+        query = query.start_after(last_snapshot)
+
+    # One extra document tells whether there is a next page.
+    docs = list(query.limit(limit + 1).stream())
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    history = []
+    for doc in docs:
+        data = doc.to_dict()
+        history.append({field: data.get(field) for field in HISTORY_FIELDS})
+
+    return {
+        "history": history,
+        "next_cursor": encode_cursor(docs[-1].id) if has_more and docs else None,
+    }
+
+
+class FirstPageCache:
+    """
+    Per-user cache of the first history page, keyed by page size. It is only invalidated by writes of
+    this process (ConversationLogWriter listeners), so a conversation answered by another worker or
+    instance shows up here only when the entry expires; hence the short default TTL. With
+    WEB_CONCURRENCY > 1 it is off unless CHAT_HISTORY_CACHE_TTL_SECONDS is set explicitly. A TTL of 0
+    disables it.
+    """
+
+    def __init__(self, ttl_seconds: float, max_users: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._pages: dict[str, dict[int, tuple[float, dict]]] = {}
+        # Set from a global counter on every invalidation so a read that raced with a write does not cache
+        # a stale page. Least recently invalidated users are evicted; users without an entry get the highest
+        # generation evicted so far, so an eviction never lets an older read match again.
+        self._generations: OrderedDict[str, int] = OrderedDict()
+        self._last_generation = 0
+        self._evicted_generation = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FirstPageCache":
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+        return cls(
+            ttl_seconds=float(os.getenv("CHAT_HISTORY_CACHE_TTL_SECONDS", "5" if workers <= 1 else "0")),
+            max_users=int(os.getenv("CHAT_HISTORY_CACHE_MAX_USERS", "10000")),
+        )
+
+    def get(self, user_id: str, limit: int) -> Optional[dict]:
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._pages.get(user_id, {}).get(limit)
+            if entry and entry[0] > time.monotonic():
+                HISTORY_CACHE_REQUESTS.inc(result="hit")
+                return entry[1]
+        HISTORY_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    def generation(self, user_id: str) -> int:
+        with self._lock:
+            return self._generations.get(user_id, self._evicted_generation)
+
+    def put(self, user_id: str, limit: int, page: dict, generation: int):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if self._generations.get(user_id, self._evicted_generation) != generation:
+                return
+            if user_id not in self._pages and len(self._pages) >= self.max_users:
+                # Drop the oldest user entry (dicts keep insertion order).
+                self._pages.pop(next(iter(self._pages)))
+            self._pages.setdefault(user_id, {})[limit] = (time.monotonic() + self.ttl_seconds, page)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._pages.pop(user_id, None)
+            self._last_generation += 1
+            self._generations[user_id] = self._last_generation
+            self._generations.move_to_end(user_id)
+            while len(self._generations) > self.max_users * 2:
+                evicted_user, evicted_generation = self._generations.popitem(last=False)
+                self._pages.pop(evicted_user, None)
+                self._evicted_generation = evicted_generation
@@ -0,0 +1,230 @@
+# conversation_context.py
+"""
+Bounded prompt context for multi-turn orchestrator sessions.
+
+A conversation continued with `session_id` would otherwise send every earlier turn to the model
+again: the photos, the tool calls and their JSON, and the answers. `compact_context` is a
+before-model callback of the orchestrator that rewrites the request so its size stays bounded:
+
+  current turn       sent as is (the new message, with its photo, and this turn's tool calls)
+  recent turns       the last CONTEXT_RECENT_TURNS earlier turns as plain text: the farmer's message
+                     and the final answer, each cut to CONTEXT_TURN_MAX_CHARS; photos are replaced by
+                     a reference to their copy in Storage, tool calls and results are left out
+  older turns        replaced by a running summary kept in the session state
+
+The summary is written after a turn has been answered (`compact_session`, run in the background by
+main.py) once CONTEXT_SUMMARY_BATCH turns have aged out of the recent window, so the summary model
+runs every few turns rather than on every request. If it is behind (still running or failing), at most
+CONTEXT_MAX_TURNS earlier turns are sent and older ones are dropped.
+
+Photo references come from the state delta `image_reference_delta` returns for the message that
+carried the photo: "image:<digest of the bytes sent>" -> public URL.
+"""
+import hashlib
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from google.genai import types
+from loguru import logger
+
+from services import metrics
+
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "4"))
+CONTEXT_SUMMARY_BATCH = int(os.getenv("CONTEXT_SUMMARY_BATCH", "2"))
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "8"))
+CONTEXT_TURN_MAX_CHARS = int(os.getenv("CONTEXT_TURN_MAX_CHARS", "1500"))
+CONTEXT_SUMMARY_MAX_CHARS = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "2000"))
+
+SUMMARY_KEY = "context_summary"
+SUMMARY_TURNS_KEY = "context_summary_turns"
+IMAGE_KEY_PREFIX = "image:"
+COMPACTOR_AUTHOR = "context_compactor"
+
+# Gemini bills an image as 258 tokens; text is estimated at 4 characters per token.
+_IMAGE_TOKENS = 258
+
+CONTEXT_TOKENS = metrics.histogram(
+    "kisan_context_estimated_tokens", "Estimated prompt tokens per orchestrator model call, before and after compaction",
+    ["stage"], buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+CONTEXT_TURNS = metrics.counter(
+    "kisan_context_turns_total", "Earlier turns per orchestrator model call, by how they were sent", ["how"]
+)
+CONTEXT_SUMMARIES = metrics.counter(
+    "kisan_context_summaries_total", "Conversation summary updates by result", ["result"]
+)
+
+
+def _image_key(data: bytes) -> str:
+    return IMAGE_KEY_PREFIX + hashlib.sha256(data).hexdigest()[:24]
+
+
+def image_reference_delta(content: types.Content, public_url: Optional[str]) -> dict:
+    """State delta recording where the photo in `content` is stored, for references in later turns."""
+    if not public_url:
+        return {}
+    return {
+        _image_key(part.inline_data.data): public_url
+        for part in content.parts or () if part.inline_data is not None and part.inline_data.data
+    }
+
+
+def estimate_tokens(contents: list[types.Content]) -> int:
+    chars, images = 0, 0
+    for content in contents:
+        for part in content.parts or ():
+            if part.text:
+                chars += len(part.text)
+            elif part.inline_data is not None:
+                images += 1
+            elif part.function_call is not None:
+                chars += len(str(part.function_call.args or ""))
+            elif part.function_response is not None:
+                chars += len(str(part.function_response.response or ""))
+    return chars // 4 + images * _IMAGE_TOKENS
+
+
+def is_user_message(content: Optional[types.Content]) -> bool:
+    """True for a message from the farmer, as opposed to a tool result (also sent with the user role)."""
+    return bool(content and content.role == "user" and any(
+        part.text or part.inline_data is not None for part in content.parts or ()
+    ))
+
+
+def split_turns(contents: list[types.Content]) -> list[list[types.Content]]:
+    """Groups contents into turns, each starting at a user message; anything before the first is dropped."""
+    turns = []
+    for content in contents:
+        if is_user_message(content):
+            turns.append([content])
+        elif turns:
+            turns[-1].append(content)
+    return turns
+
+
+def turn_label(turn: int) -> str:
+    """Bounded metric label for the turn number of a conversation: 1, 2, 3-4, 5-8 or 9+."""
+    if turn <= 2:
+        return str(turn)
+    if turn <= 4:
+        return "3-4"
+    return "5-8" if turn <= 8 else "9+"
+
+
+def _cut(text: str, max_chars: int) -> str:
+    text = text.strip()
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+def turn_text(turn: list[types.Content], image_urls) -> tuple[str, str]:
+    """(farmer's message, final answer) of an earlier turn as text, photos replaced by references."""
+    message = []
+    for part in turn[0].parts or ():
+        if part.text:
+            message.append(part.text)
+        elif part.inline_data is not None and part.inline_data.data:
+            url = image_urls.get(_image_key(part.inline_data.data))
+            message.append(f"[Photo sent earlier, stored at {url}]" if url else "[Photo sent earlier]")
+    answer = ""
+    for content in reversed(turn[1:]):
+        text = "".join(part.text for part in content.parts or () if part.text and not part.thought)
+        if content.role == "model" and text:
+            answer = text
+            break
+    return _cut(" ".join(message), CONTEXT_TURN_MAX_CHARS), _cut(answer, CONTEXT_TURN_MAX_CHARS)
+
+
+def _text_contents(turn: list[types.Content], image_urls) -> list[types.Content]:
+    message, answer = turn_text(turn, image_urls)
+    contents = [types.Content(role="user", parts=[types.Part(text=message)])]
+    if answer:
+        contents.append(types.Content(role="model", parts=[types.Part(text=answer)]))
+    return contents
+
+
+def compact_context(callback_context, llm_request) -> None:
+    """Before-model callback: replaces earlier turns with their text and the conversation summary."""
+    turns = split_turns(llm_request.contents)
+    estimated_before = estimate_tokens(llm_request.contents)
+    CONTEXT_TOKENS.observe(estimated_before, stage="before")
+    if len(turns) <= 1:
+        CONTEXT_TOKENS.observe(estimated_before, stage="after")
+        return None
+
+    state = callback_context.state
+    earlier, current = turns[:-1], turns[-1]
+    summarized = min(int(state.get(SUMMARY_TURNS_KEY) or 0), len(earlier))
+    summary = state.get(SUMMARY_KEY) if summarized else None
+    unsummarized = earlier[summarized:]
+    dropped = max(0, len(unsummarized) - CONTEXT_MAX_TURNS)
+    unsummarized = unsummarized[dropped:]
+
+    contents = []
+    if summary:
+        contents.append(types.Content(role="user", parts=[
+            types.Part(text=f"Summary of the earlier conversation with this farmer:\n{summary}")
+        ]))
+    for turn in unsummarized:
+        contents += _text_contents(turn, state)
+    contents += current
+    llm_request.contents = contents
+
+    CONTEXT_TOKENS.observe(estimate_tokens(contents), stage="after")
+    CONTEXT_TURNS.inc(summarized, how="summarized")
+    CONTEXT_TURNS.inc(dropped, how="dropped")
+    CONTEXT_TURNS.inc(len(unsummarized), how="text")
+    return None
+
+
+def _transcript(turns: list[list[types.Content]], image_urls) -> str:
+    lines = []
+    for turn in turns:
+        message, answer = turn_text(turn, image_urls)
+        lines.append(f"Farmer: {message}")
+        if answer:
+            lines.append(f"Assistant: {answer}")
+    return "\n".join(lines)
+
+
+async def compact_session(
+        session_service,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        summarize: Callable[[str, str], Awaitable[Optional[str]]]
+) -> bool:
+    """
+    Folds the turns that have left the recent window into the session's summary, once at least
+    CONTEXT_SUMMARY_BATCH of them are waiting. `summarize(previous_summary, transcript)` returns the
+    new summary, or None if it failed. Returns True if the summary was updated.
+    """
+    # main.py imports this module at startup, before google-adk is loaded in the background.
+    from google.adk.events import Event, EventActions
+
+    session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    if session is None:
+        return False
+    turns = split_turns([event.content for event in session.events if event.content])
+    summarized = int(session.state.get(SUMMARY_TURNS_KEY) or 0)
+    target = len(turns) - CONTEXT_RECENT_TURNS
+    if target - summarized < CONTEXT_SUMMARY_BATCH:
+        return False
+
+    summary = await summarize(session.state.get(SUMMARY_KEY) or "", _transcript(turns[summarized:target], session.state))
+    if not summary:
+        CONTEXT_SUMMARIES.inc(result="failed")
+        return False
+    await session_service.append_event(session, Event(
+        invocation_id=f"compact-{uuid.uuid4()}",
+        author=COMPACTOR_AUTHOR,
+        timestamp=time.time(),
+        actions=EventActions(state_delta={
+            SUMMARY_KEY: _cut(summary, CONTEXT_SUMMARY_MAX_CHARS),
+            SUMMARY_TURNS_KEY: target,
+        }),
+    ))
+    CONTEXT_SUMMARIES.inc(result="updated")
+    logger.debug(f"Session {session_id}: turns {summarized}-{target} folded into the conversation summary")
+    return True
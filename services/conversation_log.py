@@ -0,0 +1,269 @@
+# conversation_log.py
+"""
+Write-behind persistence of conversation documents to Firestore.
+
+Requests only enqueue their document; a background task groups queued documents into Firestore
+batch writes, flushed when `max_batch_size` documents are waiting or every `flush_interval`
+seconds. Failed batches are retried with backoff and, if Firestore stays unavailable (or the
+in-memory queue is full), spilled to a local JSONL file that is replayed on the next start.
+`stop()` drains the queue and is meant to be called on application shutdown.
+
+Workers may share the spill file: appends and the replay (which renames the file to
+`<spill_path>.replaying.<pid>.<suffix>`, reads it and removes it) hold an exclusive lock on
+`<spill_path>.lock`. A renamed file left behind by a worker killed while replaying is picked up by
+the next start. Unreadable lines, such as one cut short by a worker killed mid-append, are skipped.
+"""
+import asyncio
+import contextlib
+import datetime
+import glob
+import json
+import os
+import time
+import uuid
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single worker, nothing to lock against.
+    fcntl = None
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from loguru import logger
+
+from services import metrics
+from services.tracing import span
+
+# Firestore rejects batches with more than 500 writes.
+_FIRESTORE_MAX_BATCH = 500
+_SERVER_TIMESTAMP_MARKER = "__server_timestamp__"
+
+CONVERSATION_WRITES = metrics.counter(
+    "kisan_conversation_writes_total", "Conversation documents by write outcome", ["outcome"]
+)
+CONVERSATION_QUEUE_DEPTH = metrics.gauge(
+    "kisan_conversation_queue_depth", "Conversation documents waiting to be written"
+)
+
+
+class _PendingWrite:
+    __slots__ = ("collection_path", "doc_id", "data", "enqueued_at")
+
+    def __init__(self, collection_path: str, doc_id: str, data: dict, enqueued_at: float):
+        self.collection_path = collection_path
+        self.doc_id = doc_id
+        self.data = data
+        self.enqueued_at = enqueued_at
+
+
+class ConversationLogWriter:
+    def __init__(
+            self,
+            db,
+            spill_path: str,
+            max_batch_size: int = 200,
+            flush_interval: float = 1.0,
+            max_queue: int = 10000,
+            max_retries: int = 3
+    ):
+        self.db = db
+        self.spill_path = spill_path
+        self.max_batch_size = min(max_batch_size, _FIRESTORE_MAX_BATCH)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue[_PendingWrite] = asyncio.Queue(maxsize=max_queue)
+        self._worker: Optional[asyncio.Task] = None
+        # Documents taken off the queue for the batch being assembled, and the batch being written.
+        self._collecting: list[_PendingWrite] = []
+        self._in_flight_write: Optional[asyncio.Task] = None
+        self._listeners: list[Callable[[str], None]] = []
+        CONVERSATION_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    @classmethod
+    def from_env(cls, db) -> "ConversationLogWriter":
+        return cls(
+            db,
+            spill_path=os.getenv("CONVERSATION_SPILL_PATH", "/tmp/kisan_conversation_spill.jsonl"),
+            max_batch_size=int(os.getenv("CONVERSATION_BATCH_SIZE", "200")),
+            flush_interval=float(os.getenv("CONVERSATION_FLUSH_INTERVAL_SECONDS", "1.0")),
+            max_queue=int(os.getenv("CONVERSATION_MAX_QUEUE", "10000")),
+            max_retries=int(os.getenv("CONVERSATION_MAX_RETRIES", "3")),
+        )
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Registers a callback invoked with each collection path once a batch has been written to it."""
+        self._listeners.append(listener)
+
+    def enqueue(self, collection_path: str, data: dict) -> str:
+        """Queues a document for writing and returns its (client-generated) document id. Never blocks."""
+        pending = _PendingWrite(collection_path, uuid.uuid4().hex[:20], data, time.time())
+        try:
+            self._queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            logger.warning("Conversation write queue is full; spilling document to disk.")
+            self._spill([pending])
+        return pending.doc_id
+
+    async def start(self):
+        self._replay_spill()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background task and writes out everything still queued."""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._in_flight_write:
+            await self._in_flight_write
+        await self._write_batch(self._collecting)
+        self._collecting = []
+        while not self._queue.empty():
+            await self._write_batch(self._take_batch())
+
+    async def _run(self):
+        while True:
+            self._collecting.append(await self._queue.get())
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._collecting) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    self._collecting.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._collecting = self._collecting, []
+            # The write runs as its own task so shutdown cannot abandon a batch halfway; stop() awaits it.
+            self._in_flight_write = asyncio.create_task(self._write_batch(batch))
+            await asyncio.shield(self._in_flight_write)
+            self._in_flight_write = None
+
+    def _take_batch(self) -> list[_PendingWrite]:
+        batch = []
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write_batch(self, batch: list[_PendingWrite]):
+        if not batch:
+            return
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with span("firestore.write", documents=len(batch), attempt=attempt):
+                    await asyncio.to_thread(self._commit, batch)
+                CONVERSATION_WRITES.inc(len(batch), outcome="written")
+                logger.debug(f"Wrote {len(batch)} conversation documents to Firestore.")
+                self._notify_listeners({pending.collection_path for pending in batch})
+                return
+            except Exception as e:
+                logger.warning(f"Firestore batch write failed (attempt {attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(2 ** attempt * 0.25, 5.0))
+        self._spill(batch)
+
+    def _notify_listeners(self, collection_paths: set[str]):
+        for collection_path in collection_paths:
+            for listener in self._listeners:
+                try:
+                    listener(collection_path)
+                except Exception as e:
+                    logger.warning(f"Conversation write listener failed for {collection_path}: {e}")
+
+    def _commit(self, batch: list[_PendingWrite]):
+        write_batch = self.db.batch()
+        for pending in batch:
+            write_batch.set(self.db.collection(pending.collection_path).document(pending.doc_id), pending.data)
+        write_batch.commit()
+
+    # --- Local spill file ---
+    @staticmethod
+    def _encode_value(value, enqueued_at: float):
+        if value is SERVER_TIMESTAMP:
+            return {_SERVER_TIMESTAMP_MARKER: enqueued_at}
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        return value
+
+    @contextlib.contextmanager
+    def _spill_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.spill_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spill(self, batch: list[_PendingWrite]):
+        try:
+            with self._spill_lock(), open(self.spill_path, "a", encoding="utf-8") as f:
+                for pending in batch:
+                    record = {
+                        "collection": pending.collection_path,
+                        "id": pending.doc_id,
+                        "enqueued_at": pending.enqueued_at,
+                        "data": {k: self._encode_value(v, pending.enqueued_at) for k, v in pending.data.items()},
+                    }
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            CONVERSATION_WRITES.inc(len(batch), outcome="spilled")
+            logger.warning(f"Spilled {len(batch)} conversation documents to {self.spill_path}.")
+        except Exception as e:
+            CONVERSATION_WRITES.inc(len(batch), outcome="lost")
+            logger.error(f"Could not spill {len(batch)} conversation documents to {self.spill_path}: {e}")
+
+    def _decode_record(self, line: str) -> _PendingWrite:
+        record = json.loads(line)
+        data = {}
+        for key, value in record["data"].items():
+            if isinstance(value, dict) and _SERVER_TIMESTAMP_MARKER in value:
+                # The original request time, since the server time of the replay would be wrong.
+                value = datetime.datetime.fromtimestamp(value[_SERVER_TIMESTAMP_MARKER], datetime.timezone.utc)
+            data[key] = value
+        return _PendingWrite(record["collection"], record["id"], data, record["enqueued_at"])
+
+    def _read_spill_files(self) -> list[tuple[str, int, str]]:
+        """Takes the lines of the spill file, and of replay files abandoned by dead workers, off the disk."""
+        lines = []
+        with self._spill_lock():
+            leftovers = sorted(glob.glob(glob.escape(self.spill_path) + ".replaying*"))
+            for source in [self.spill_path, *leftovers]:
+                replay_path = f"{self.spill_path}.replaying.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+                try:
+                    os.replace(source, replay_path)
+                    with open(replay_path, encoding="utf-8") as f:
+                        lines += [(replay_path, number, line) for number, line in enumerate(f, start=1)]
+                except FileNotFoundError:
+                    continue
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.error(f"Could not read spilled conversation documents from {replay_path}: {e}")
+                    continue
+                os.remove(replay_path)
+        return lines
+
+    def _replay_spill(self):
+        replayed, skipped = 0, 0
+        for replay_path, line_number, line in self._read_spill_files():
+            if not line.strip():
+                continue
+            try:
+                pending = self._decode_record(line)
+            except (ValueError, KeyError, TypeError) as e:
+                # E.g. the last line of a worker killed while appending.
+                skipped += 1
+                logger.warning(f"Skipping unreadable spilled document at {replay_path}:{line_number}: {e}")
+                continue
+            try:
+                self._queue.put_nowait(pending)
+            except asyncio.QueueFull:
+                self._spill([pending])
+            replayed += 1
+        if skipped:
+            CONVERSATION_WRITES.inc(skipped, outcome="lost")
+        if replayed or skipped:
+            logger.debug(f"Replaying {replayed} spilled conversation documents ({skipped} unreadable).")
@@ -0,0 +1,129 @@
+# image_preprocess.py
+"""
+Image preprocessing before photos are sent to Gemini as inline_data.
+
+Phone photos arrive as 8-12 MB JPEGs; the model does not need that resolution to spot leaf
+symptoms. Uploads are size-limited while they are read, then decoded, rotated according to
+their EXIF orientation, downsized to IMAGE_MAX_DIMENSION and re-encoded as JPEG at
+IMAGE_JPEG_QUALITY. Re-encoding drops all EXIF metadata (including GPS). The original bytes
+are still what gets archived to storage.
+"""
+import io
+import os
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+
+_READ_CHUNK_BYTES = 256 * 1024
+# Room for the text form fields and multipart framing on top of the image itself.
+_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class ImageTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Image exceeds the maximum upload size of {limit / (1024 * 1024):.1f} MB.")
+        self.limit = limit
+
+
+class InvalidImage(Exception):
+    pass
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    sent_bytes: int
+    width: int
+    height: int
+    encode_seconds: float
+
+
+async def read_upload_limited(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Reads the upload in chunks, failing as soon as it grows past `max_bytes`."""
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageTooLarge(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def preprocess_image(image_bytes: bytes, max_dimension: int = MAX_DIMENSION, quality: int = JPEG_QUALITY) -> PreparedImage:
+    """Decodes, orients, downsizes and re-encodes an image as EXIF-free JPEG. CPU bound: run it in a thread."""
+    started = time.perf_counter()
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as original:
+            # For JPEGs, decode directly at a reduced scale (still at least max_dimension on each side).
+            original.draft("RGB", (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(original)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"Uploaded file is not a readable image: {e}")
+
+    data = output.getvalue()
+    return PreparedImage(
+        data=data,
+        mime_type="image/jpeg",
+        original_bytes=len(image_bytes),
+        sent_bytes=len(data),
+        width=image.width,
+        height=image.height,
+        encode_seconds=time.perf_counter() - started,
+    )
+
+
+class MaxUploadSizeMiddleware:
+    """
+    ASGI middleware that rejects request bodies larger than the image limit on the given paths with 413,
+    using Content-Length when present and counting bytes as they stream in otherwise, so an oversized
+    upload is refused before it has been spooled.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...], max_image_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_image_bytes + _FORM_OVERHEAD_BYTES
+        self.detail = str(ImageTooLarge(max_image_bytes))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope.get("headers") or []).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": self.detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes a 413 response.
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=self.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,113 @@
+# image_store.py
+"""
+Content-addressed image archiving in Firebase Storage.
+
+Blob names are derived from the SHA-256 of the image bytes, so a photo that is sent again maps to
+the blob that already holds it and the upload is skipped. Uploads are created with the
+`publicRead` ACL in the same request (no separate make_public round trip) and with
+`if_generation_match=0`, so an existing blob is never overwritten. The public URL is known before
+the upload finishes, which lets callers start the upload in the background and run the agent
+in parallel.
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+from google.api_core.exceptions import PreconditionFailed
+from loguru import logger
+
+from services.tracing import span
+
+
+class ImageArchiver:
+    def __init__(self, bucket, path_prefix: str, remembered_uploads: int = 50000):
+        self.bucket = bucket
+        self.path_prefix = path_prefix
+        self.remembered_uploads = remembered_uploads
+        # Blob names this process has already uploaded (or found existing), most recent last.
+        self._uploaded: OrderedDict[str, None] = OrderedDict()
+
+    def blob_name(self, user_id: str, image_bytes: bytes, file_extension: str) -> str:
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"{self.path_prefix}/{user_id}/images/{digest}.{file_extension}"
+
+    def public_url(self, blob_name: str) -> str:
+        # Computed locally from the bucket and blob names; no request is made.
+        return self.bucket.blob(blob_name).public_url
+
+    def user_blob_name(self, user_id: str, reference: str) -> Optional[str]:
+        """
+        The blob name of an archived image of `user_id`, given its public URL or blob name; None if
+        `reference` points anywhere else (another user's images, another bucket, other paths).
+        """
+        blob_name = reference
+        url_prefix = self.public_url("")
+        if reference.startswith(url_prefix):
+            blob_name = reference[len(url_prefix):]
+        elif "://" in reference:
+            return None
+        images_prefix = f"{self.path_prefix}/{user_id}/images/"
+        if not blob_name.startswith(images_prefix) or "/" in blob_name[len(images_prefix):]:
+            return None
+        return blob_name
+
+    async def download(self, blob_name: str) -> bytes:
+        with span("storage.download"):
+            return await asyncio.to_thread(self.bucket.blob(blob_name).download_as_bytes)
+
+    async def upload(self, blob_name: str, image_bytes: bytes, content_type: str) -> bool:
+        """Uploads the image unless it is already stored. Returns True when bytes were actually sent."""
+        if blob_name in self._uploaded:
+            self._uploaded.move_to_end(blob_name)
+            logger.debug(f"Image '{blob_name}' already uploaded by this worker; skipping upload.")
+            return False
+
+        blob = self.bucket.blob(blob_name)
+        try:
+            with span("storage.upload", bytes=len(image_bytes)):
+                await asyncio.to_thread(
+                    blob.upload_from_string,
+                    image_bytes,
+                    content_type=content_type,
+                    predefined_acl="publicRead",
+                    if_generation_match=0
+                )
+            uploaded = True
+        except PreconditionFailed:
+            logger.debug(f"Image '{blob_name}' already exists in storage; skipping upload.")
+            uploaded = False
+
+        self._uploaded[blob_name] = None
+        while len(self._uploaded) > self.remembered_uploads:
+            self._uploaded.popitem(last=False)
+        return uploaded
+
+    def start_upload(self, blob_name: str, image_bytes: bytes, content_type: str) -> asyncio.Task:
+        task = asyncio.create_task(self.upload(blob_name, image_bytes, content_type))
+        # Failures are reported by PendingImageUpload.result(); this only stops asyncio warning about tasks
+        # whose request failed before anyone awaited them.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+
+class PendingImageUpload:
+    """
+    An image upload running in the background while the agent works on the request. Without a
+    task, the image is already stored at `public_url` (or there is no image, if that is None).
+    """
+
+    def __init__(self, task: Optional[asyncio.Task] = None, public_url: Optional[str] = None):
+        self.task = task
+        self.public_url = public_url
+
+    async def result(self) -> Optional[str]:
+        """Waits for the upload and returns the public URL, or None if there was no image or the upload failed."""
+        if self.task is None:
+            return self.public_url
+        try:
+            await self.task
+            return self.public_url
+        except Exception as e:
+            logger.error(f"Background image upload failed for {self.public_url}: {e}")
+            return None
@@ -0,0 +1,199 @@
+# intent_router.py
+"""
+Deterministic fast-path routing of text-only queries.
+
+Keyword rules (plus an optional local classifier) recognise unambiguous calendar, weather,
+market and scheme questions so they can be answered by calling the matching tool directly,
+skipping the orchestrator LLM's routing round trip. Anything ambiguous (several intents, crop
+symptoms, missing details, long multi-part questions) returns None and goes to the orchestrator.
+Weather questions need coordinates, a capitalised place name or a known state; market questions
+need a crop name.
+
+The optional classifier is any callable `classify(query) -> (intent, confidence)`, configured as
+INTENT_CLASSIFIER="package.module:function"; it is only consulted when no keyword rule fires.
+"""
+import importlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from loguru import logger
+
+from services import metrics
+from tools.calendar_tool import KNOWN_CROPS_RE, STATE_ALIASES, find_crop_and_state
+
+ROUTER_DECISIONS = metrics.counter(
+    "kisan_router_decisions_total", "Text queries by route taken", ["route", "intent"]
+)
+FAST_PATH_LATENCY_SAVED = metrics.counter(
+    "kisan_fast_path_latency_saved_seconds_total",
+    "Estimated seconds saved by fast-path answers (orchestrator average minus fast-path time)"
+)
+ORCHESTRATOR_LATENCY = metrics.gauge(
+    "kisan_orchestrator_latency_avg_seconds", "Moving average of orchestrator run time for text queries"
+)
+
+INTENTS = ("calendar", "weather", "market", "scheme")
+
+_INTENT_PATTERNS = {
+    "calendar": re.compile(
+        r"\b(sow|sowing|sown|plant|planting|transplant\w*|harvest\w*|crop calendar|season|"
+        r"bona|buvai|bowai|katai|kataai)\b", re.IGNORECASE),
+    "weather": re.compile(
+        r"\b(weather|forecast|rain|raining|rainfall|temperature|humidity|wind|mausam|barish|baarish)\b",
+        re.IGNORECASE),
+    "market": re.compile(
+        r"\b(price|prices|rate|rates|mandi|market|bhav|bhaav|daam|sell|selling|msp)\b", re.IGNORECASE),
+    "scheme": re.compile(
+        r"\b(scheme|schemes|yojana|subsid\w*|pm[- ]?kisan|pmfby|kcc|kisan credit card|crop insurance|"
+        r"government loan)\b", re.IGNORECASE),
+}
+# Symptom and remedy words mean the question needs diagnosis, which only the orchestrator does.
+_DIAGNOSIS_RE = re.compile(
+    r"\b(disease|diseased|pest|pests|insect\w*|spots?|yellow\w*|wilt\w*|rot|rotting|blight|fungus|fungal|"
+    r"leaf|leaves|curl\w*|remedy|remedies|spray|keeda|rog)\b", re.IGNORECASE)
+_COORDINATES_RE = re.compile(r"(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)")
+_LOCATION_RE = re.compile(
+    r"\b(?:in|at|for|near|of)\s+([A-Za-z][A-Za-z .'-]{1,40}?)"
+    r"(?:\s+(?:today|tomorrow|tonight|now|this week|next week|next \d+ days))?\s*[?.!]*$",
+    re.IGNORECASE)
+# A location is only trusted when it is a proper noun: weatherapi.com resolves any phrase ("the village",
+# "spraying") to some place, which would be a confident wrong answer. Lowercase names must be known states.
+_LOCATION_STOPWORDS = {
+    "the", "a", "an", "my", "our", "your", "this", "that", "these", "those", "which", "what", "where", "here",
+    "there", "today", "tomorrow", "tonight", "now", "next", "week", "village", "farm", "field", "area",
+}
+_KNOWN_PLACES = {name.lower() for name in STATE_ALIASES.values()} | {
+    alias for alias in STATE_ALIASES if len(alias) > 2
+}
+
+
+@dataclass
+class RouteDecision:
+    intent: str
+    confidence: float
+    source: str  # "rules" or "classifier"
+    args: dict = field(default_factory=dict)
+
+
+def _extract_location(query: str) -> Optional[str]:
+    match = _COORDINATES_RE.search(query)
+    if match:
+        return f"{match.group(1)},{match.group(2)}"
+    match = _LOCATION_RE.search(query.strip())
+    if not match:
+        return None
+    location = match.group(1).strip(" .'-")
+    if location.lower() in _KNOWN_PLACES:
+        return location
+    words = location.split()
+    if not words or any(word.lower() in _LOCATION_STOPWORDS or not word[0].isupper() for word in words):
+        return None
+    return location
+
+
+def _mentions_crop(query: str) -> bool:
+    try:
+        crop, _ = find_crop_and_state(query)
+    except Exception:
+        crop = None
+    return bool(crop or KNOWN_CROPS_RE.search(query))
+
+
+def _extract_args(intent: str, query: str) -> Optional[dict]:
+    """The tool arguments for `intent`, or None if the query does not contain them."""
+    if intent == "calendar":
+        try:
+            crop, state = find_crop_and_state(query)
+        except Exception as e:
+            logger.warning(f"Crop calendar unavailable for routing: {e}")
+            return None
+        return {"crop": crop, "state": state} if crop and state else None
+    if intent == "weather":
+        location = _extract_location(query)
+        return {"location": location} if location else None
+    # The market and scheme sub-agents take the farmer's question as-is; a price question names its crop.
+    if intent == "market" and not _mentions_crop(query):
+        return None
+    return {"query": query}
+
+
+def load_classifier(spec: str) -> Callable[[str], tuple[str, float]]:
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError(f"INTENT_CLASSIFIER must look like 'package.module:function', got '{spec}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class IntentRouter:
+    def __init__(
+            self,
+            enabled: bool = True,
+            max_words: int = 25,
+            classifier: Optional[Callable[[str], tuple[str, float]]] = None,
+            classifier_min_confidence: float = 0.9
+    ):
+        self.enabled = enabled
+        self.max_words = max_words
+        self.classifier = classifier
+        self.classifier_min_confidence = classifier_min_confidence
+        # Exponentially weighted average orchestrator run time, the baseline for "latency saved".
+        self._avg_orchestrator_seconds: Optional[float] = None
+        ORCHESTRATOR_LATENCY.set_function(lambda: self._avg_orchestrator_seconds or 0.0)
+
+    @classmethod
+    def from_env(cls) -> "IntentRouter":
+        classifier_spec = os.getenv("INTENT_CLASSIFIER")
+        return cls(
+            enabled=os.getenv("INTENT_ROUTER_ENABLED", "1") not in ("0", "false", "False"),
+            max_words=int(os.getenv("INTENT_ROUTER_MAX_WORDS", "25")),
+            classifier=load_classifier(classifier_spec) if classifier_spec else None,
+            classifier_min_confidence=float(os.getenv("INTENT_CLASSIFIER_MIN_CONFIDENCE", "0.9")),
+        )
+
+    def route(self, query: Optional[str]) -> Optional[RouteDecision]:
+        """Returns a fast-path decision for a text-only query, or None to use the orchestrator."""
+        decision = self._decide(query) if self.enabled and query else None
+        if decision is None:
+            ROUTER_DECISIONS.inc(route="orchestrator", intent="none")
+        return decision
+
+    def _decide(self, query: str) -> Optional[RouteDecision]:
+        if len(query.split()) > self.max_words or _DIAGNOSIS_RE.search(query):
+            return None
+
+        matched = [intent for intent, pattern in _INTENT_PATTERNS.items() if pattern.search(query)]
+        if len(matched) == 1:
+            args = _extract_args(matched[0], query)
+            return RouteDecision(matched[0], 1.0, "rules", args) if args else None
+        if matched or self.classifier is None:
+            return None
+
+        try:
+            intent, confidence = self.classifier(query)
+        except Exception as e:
+            logger.warning(f"Intent classifier failed, using the orchestrator: {e}")
+            return None
+        if intent not in INTENTS or confidence < self.classifier_min_confidence:
+            return None
+        args = _extract_args(intent, query)
+        return RouteDecision(intent, confidence, "classifier", args) if args else None
+
+    def observe_orchestrator(self, seconds: float):
+        """Records the run time of a text query answered by the orchestrator."""
+        if self._avg_orchestrator_seconds is None:
+            self._avg_orchestrator_seconds = seconds
+        else:
+            self._avg_orchestrator_seconds = 0.8 * self._avg_orchestrator_seconds + 0.2 * seconds
+
+    def observe_fast_path(self, decision: RouteDecision, started_at: float, served: bool):
+        """Records the outcome of a fast-path attempt started at `started_at` (time.monotonic())."""
+        if not served:
+            ROUTER_DECISIONS.inc(route="fast_path_fallback", intent=decision.intent)
+            return
+        ROUTER_DECISIONS.inc(route="fast_path", intent=decision.intent)
+        if self._avg_orchestrator_seconds is not None:
+            elapsed = time.monotonic() - started_at
+            FAST_PATH_LATENCY_SAVED.inc(max(0.0, self._avg_orchestrator_seconds - elapsed))
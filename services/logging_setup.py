@@ -0,0 +1,176 @@
+# logging_setup.py
+"""
+Structured, leveled logging through loguru.
+
+configure_logging() installs one sink: JSON lines (severity, message, request_id and the extra
+fields passed to the log call, which Cloud Logging indexes) or human-readable text. LOG_ENQUEUE=1
+moves formatting and writing to a background thread; handing a record over costs more CPU than
+writing it to a pipe that keeps up (benchmarks/bench_logging.py), so it is off by default. Standard `logging` records (ADK, google-cloud
+libraries) are routed through the same sink, at LOG_LIBRARY_LEVEL.
+
+RequestContextMiddleware gives every request an id (X-Request-ID, or the Cloud Run trace id, or a
+new one) that is attached to every record logged while handling it, including from tasks it starts.
+Per-event debug logs are sampled per request: guard them with `if debug_sampled():` so unsampled
+requests do not even build the message. describe_content() summarizes genai Content for logs,
+reporting inline image data by size instead of dumping the bytes.
+
+    from loguru import logger
+    logger.info("Fast path '{intent}' served", intent=decision.intent)
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import uuid
+
+from loguru import logger
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "0") not in ("0", "false", "False")
+# Share of requests whose per-event debug logs are written (when LOG_LEVEL is DEBUG or lower).
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "300"))
+# Standard `logging` records (google-adk logs every model request at INFO) are gated separately.
+LOG_LIBRARY_LEVEL = os.getenv("LOG_LIBRARY_LEVEL", "WARNING").upper()
+
+_TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <7} | {extra[request_id]} | {name}:{function}:{line} - {message}"
+)
+# loguru level names Cloud Logging does not know.
+_SEVERITY = {"TRACE": "DEBUG", "SUCCESS": "INFO"}
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("log_request_id", default="-")
+# Outside a request (scripts, `adk web`) everything the level allows is logged.
+_request_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar("log_request_sampled", default=True)
+_debug_enabled = True
+
+
+def truncate(value, limit: int | None = None) -> str:
+    """str(value), cut to `limit` (LOG_MAX_FIELD_CHARS) characters with a note of how much was left out."""
+    text = value if isinstance(value, str) else str(value)
+    limit = limit or LOG_MAX_FIELD_CHARS
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… (+{len(text) - limit} chars)"
+
+
+def describe_content(content) -> str:
+    """Compact one-line description of a genai Content; binary parts are reported by type and size."""
+    if content is None or not content.parts:
+        return f"{getattr(content, 'role', None)}: <empty>"
+    parts = []
+    for part in content.parts:
+        if part.text is not None:
+            parts.append(f"text: {truncate(part.text)}")
+        elif part.inline_data is not None:
+            parts.append(f"inline_data: {part.inline_data.mime_type}, {len(part.inline_data.data or b'')} bytes")
+        elif part.function_call is not None:
+            parts.append(f"function_call: {part.function_call.name}({truncate(part.function_call.args)})")
+        elif part.function_response is not None:
+            parts.append(f"function_response: {part.function_response.name} -> {truncate(part.function_response.response)}")
+        else:
+            parts.append("<other part>")
+    return f"{content.role}: " + " | ".join(parts)
+
+
+def debug_sampled() -> bool:
+    """True when per-event debug logs should be written for the current request."""
+    return _debug_enabled and _request_sampled.get()
+
+
+def current_request_id() -> str:
+    """The id of the request being handled, or "-" outside a request."""
+    return _request_id.get()
+
+
+def bind_request(request_id: str | None = None, sampled: bool | None = None) -> str:
+    """Attaches a request id (new if None) and a sampling decision to the current context."""
+    request_id = request_id or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    _request_sampled.set(random.random() < LOG_DEBUG_SAMPLE_RATE if sampled is None else sampled)
+    return request_id
+
+
+def _add_request_context(record):
+    record["extra"]["request_id"] = _request_id.get()
+
+
+def _json_sink(stream):
+    def write(message):
+        record = message.record
+        entry = {
+            "severity": _SEVERITY.get(record["level"].name, record["level"].name),
+            "time": record["time"].isoformat(),
+            "message": record["message"],
+            "logger": f"{record['name']}:{record['function']}:{record['line']}",
+            **record["extra"],
+        }
+        if record["exception"] is not None:
+            # The formatted message is the message followed by the traceback.
+            entry["exception"] = str(message)[len(record["message"]):].strip()
+        stream.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        stream.flush()
+    return write
+
+
+class _InterceptHandler(logging.Handler):
+    """Routes standard `logging` records into loguru."""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        logger.patch(
+            lambda loguru_record: loguru_record.update(name=record.name, function=record.funcName, line=record.lineno)
+        ).opt(exception=record.exc_info).log(level, record.getMessage())
+
+
+def configure_logging(level: str | None = None, log_format: str | None = None, enqueue: bool | None = None,
+                      stream=None):
+    """Replaces loguru's default sink with the configured one and intercepts standard logging."""
+    global _debug_enabled
+    level = (level or LOG_LEVEL).upper()
+    log_format = log_format or LOG_FORMAT
+    enqueue = LOG_ENQUEUE if enqueue is None else enqueue
+    stream = stream or sys.stdout
+
+    logger.remove()
+    logger.configure(extra={"request_id": "-"}, patcher=_add_request_context)
+    if log_format == "json":
+        # loguru appends the traceback of logged exceptions to the formatted message.
+        logger.add(_json_sink(stream), level=level, enqueue=enqueue, format="{message}",
+                   backtrace=False, diagnose=False)
+    else:
+        logger.add(stream, level=level, enqueue=enqueue, format=_TEXT_FORMAT, backtrace=False, diagnose=False)
+    _debug_enabled = logger.level(level).no <= logger.level("DEBUG").no
+
+    library_level = logging.getLevelName(LOG_LIBRARY_LEVEL)
+    logging.basicConfig(handlers=[_InterceptHandler()], force=True,
+                        level=library_level if isinstance(library_level, int) else logging.WARNING)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware that binds a request id (returned as X-Request-ID) and a debug-sampling decision."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(b"x-request-id") or headers.get(b"x-cloud-trace-context", b"").split(b"/")[0]
+        request_id = bind_request(incoming.decode("latin-1")[:64] if incoming else None)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
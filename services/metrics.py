@@ -0,0 +1,189 @@
+# metrics.py
+"""
+Minimal in-process metrics registry (counters, gauges and histograms with optional labels).
+Metrics are created once at import time of the module that owns them, e.g.
+
+    SESSIONS_EVICTED = metrics.counter("kisan_sessions_evicted_total", "Sessions evicted", ["reason"])
+    SESSIONS_EVICTED.inc(reason="ttl")
+
+render_prometheus() returns every registered metric in the Prometheus text format (served at /api/metrics).
+"""
+import threading
+from typing import Callable
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: list[str] | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames or ())
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[dict, float]]:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: list[str] | None = None):
+        super().__init__(name, documentation, labelnames)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """Computes the (unlabelled) gauge value lazily whenever it is read."""
+        self._function = function
+
+    def samples(self) -> list[tuple[dict, float]]:
+        if self._function is not None:
+            return [({}, float(self._function()))]
+        return super().samples()
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return super().value(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: list[str] | None = None,
+                 buckets: tuple[float, ...] | None = None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        # Per label set: [count in each bucket (non-cumulative), count above the last bucket, sum, count].
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 3)
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> list[tuple[dict, dict]]:
+        """Per label set: {"buckets": [(upper bound, cumulative count), ...], "sum": float, "count": float}."""
+        with self._lock:
+            result = []
+            for key, series in self._series.items():
+                cumulative, buckets = 0.0, []
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-2]):
+                    cumulative += count
+                    buckets.append((bound, cumulative))
+                result.append((dict(zip(self.labelnames, key)), {"buckets": buckets, "sum": series[-2], "count": series[-1]}))
+            return result
+
+    def value(self, **labels) -> float:
+        """Number of observations."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-1] if series else 0.0
+
+
+_registry: dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, documentation: str, labelnames: list[str] | None, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric '{name}' already registered as {metric.kind}")
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: list[str] | None = None) -> Counter:
+    return _get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: list[str] | None = None) -> Gauge:
+    return _get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: list[str] | None = None,
+              buckets: tuple[float, ...] | None = None) -> Histogram:
+    return _get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def all_metrics() -> list[_Metric]:
+    with _registry_lock:
+        return list(_registry.values())
+
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in sorted(all_metrics(), key=lambda m: m.name):
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for labels, value in metric.samples():
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for bound, cumulative in value["buckets"]:
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{metric.name}_bucket{bucket_labels} {_format_value(cumulative)}")
+            lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+            lines.append(f"{metric.name}_count{_format_labels(labels)} {_format_value(value['count'])}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,180 @@
+# model_config.py
+"""
+Per-agent model and generation settings from one configuration source.
+
+config/agent_models.json (or AGENT_MODELS_CONFIG) defines model tiers and assigns each agent,
+by name, a tier plus optional overrides:
+
+    {
+      "default_tier": "standard",
+      "tiers": {"fast": {"model": "gemini-2.0-flash-lite", "temperature": 0.2, "max_output_tokens": 1024}, ...},
+      "agents": {"SummaryAgent": {"tier": "fast"}, "CropDiagnosisAgent": {"tier": "strong", "temperature": 0.1}}
+    }
+
+Environment overrides: MODEL_TIER_<TIER>=<model> replaces a tier's model, AGENT_MODEL_OVERRIDES is a
+JSON object shaped like "agents" and merged over it, and the legacy MODEL_NAME sets the model of the
+default tier. Agents not listed use the default tier.
+
+Agents are built with `LlmAgent(name=..., **model_kwargs(name), ...)`. Besides the model and its
+GenerateContentConfig, this attaches callbacks that record every model call (agent, model, latency,
+tokens) to the metrics and to the list returned by start_model_usage_recording() for the current
+request, so each conversation can be logged with the models that actually answered it.
+"""
+import contextvars
+import json
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from google.genai import types
+
+from services import metrics
+
+MODEL_CONFIG_PATH = Path(os.getenv(
+    "AGENT_MODELS_CONFIG",
+    str(Path(__file__).resolve().parent.parent / "config" / "agent_models.json")
+))
+
+LLM_CALL_LATENCY = metrics.histogram(
+    "kisan_llm_call_latency_seconds", "Model call latency by agent and model", ["agent", "model"]
+)
+LLM_TOKENS = metrics.counter(
+    "kisan_llm_tokens_total", "Model tokens by agent, model and direction", ["agent", "model", "kind"]
+)
+LLM_CALLS_PER_REQUEST = metrics.histogram(
+    "kisan_llm_calls_per_request", "Model calls made to answer one request, by route", ["route"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 24)
+)
+LLM_INPUT_TOKENS_PER_REQUEST = metrics.histogram(
+    "kisan_llm_input_tokens_per_request", "Model input tokens sent to answer one request, by route and turn",
+    ["route", "turn"], buckets=(0, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+)
+
+_SETTING_FIELDS = ("model", "temperature", "max_output_tokens")
+
+# Model calls of the request being handled; None outside start_model_usage_recording().
+_usage_calls: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("model_usage_calls", default=None)
+# (monotonic start, model) of this context's model call in progress.
+_call_started: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("model_call_started", default=None)
+
+
+@dataclass(frozen=True)
+class ModelSettings:
+    agent_name: str
+    tier: str
+    model: str
+    temperature: Optional[float] = None
+    max_output_tokens: Optional[int] = None
+
+    def generate_content_config(self) -> Optional[types.GenerateContentConfig]:
+        if self.temperature is None and self.max_output_tokens is None:
+            return None
+        return types.GenerateContentConfig(temperature=self.temperature, max_output_tokens=self.max_output_tokens)
+
+
+def _read_config(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    tiers = {name: dict(settings) for name, settings in config.get("tiers", {}).items()}
+    for tier, settings in tiers.items():
+        model = os.getenv(f"MODEL_TIER_{tier.upper()}")
+        if model:
+            settings["model"] = model
+    default_tier = config.get("default_tier", "standard")
+    if default_tier not in tiers:
+        raise ValueError(f"{path}: default_tier '{default_tier}' is not one of the tiers {sorted(tiers)}")
+    if os.getenv("MODEL_NAME"):
+        tiers[default_tier]["model"] = os.getenv("MODEL_NAME")
+
+    agents = {name: dict(settings) for name, settings in config.get("agents", {}).items()}
+    for name, settings in json.loads(os.getenv("AGENT_MODEL_OVERRIDES") or "{}").items():
+        agents.setdefault(name, {}).update(settings)
+
+    for tier, settings in tiers.items():
+        if not settings.get("model"):
+            raise ValueError(f"{path}: tier '{tier}' has no model")
+    for name, settings in agents.items():
+        if settings.get("tier", default_tier) not in tiers:
+            raise ValueError(f"{path}: agent '{name}' uses unknown tier '{settings.get('tier')}'")
+    return {"default_tier": default_tier, "tiers": tiers, "agents": agents}
+
+
+@lru_cache(maxsize=1)
+def _config() -> dict:
+    return _read_config(MODEL_CONFIG_PATH)
+
+
+def settings_for(agent_name: str) -> ModelSettings:
+    """The model and generation settings for the agent called `agent_name`."""
+    config = _config()
+    overrides = config["agents"].get(agent_name, {})
+    tier = overrides.get("tier", config["default_tier"])
+    merged = {**config["tiers"][tier], **overrides}
+    return ModelSettings(agent_name, tier, **{field: merged.get(field) for field in _SETTING_FIELDS})
+
+
+def start_model_usage_recording() -> list[dict]:
+    """Collects the model calls made from the current context (and tasks it starts) into the returned list."""
+    calls: list[dict] = []
+    _usage_calls.set(calls)
+    return calls
+
+
+def models_used(calls: list[dict]) -> Optional[str]:
+    """Comma-separated distinct models in `calls`, or None if no model was called."""
+    return ", ".join(sorted({call["model"] for call in calls})) or None
+
+
+def _before_model(callback_context, llm_request):
+    _call_started.set((time.monotonic(), llm_request.model))
+
+
+def _after_model(callback_context, llm_response):
+    started = _call_started.get()
+    if llm_response.partial or started is None:
+        return None
+    _call_started.set(None)
+    started_at, model = started
+    elapsed = time.monotonic() - started_at
+    usage = llm_response.usage_metadata
+    input_tokens = (usage.prompt_token_count or 0) if usage else 0
+    # Thinking tokens are billed as output.
+    output_tokens = ((usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0)) if usage else 0
+    agent_name = callback_context.agent_name
+
+    LLM_CALL_LATENCY.observe(elapsed, agent=agent_name, model=model)
+    LLM_TOKENS.inc(input_tokens, agent=agent_name, model=model, kind="input")
+    LLM_TOKENS.inc(output_tokens, agent=agent_name, model=model, kind="output")
+    calls = _usage_calls.get()
+    if calls is not None:
+        calls.append({
+            "agent": agent_name,
+            "model": model,
+            "latency_ms": round(elapsed * 1000),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        })
+    return None
+
+
+def input_tokens(calls: list[dict]) -> int:
+    """Total input tokens of the recorded model `calls`."""
+    return sum(call["input_tokens"] for call in calls)
+
+
+def model_kwargs(agent_name: str, before_model_callbacks: tuple = ()) -> dict:
+    """
+    LlmAgent keyword arguments for `agent_name`: model, generation config and usage-recording callbacks.
+    `before_model_callbacks` run before the recording one, so it sees the request they prepared.
+    """
+    settings = settings_for(agent_name)
+    return {
+        "model": settings.model,
+        "generate_content_config": settings.generate_content_config(),
+        "before_model_callback": [*before_model_callbacks, _before_model] if before_model_callbacks else _before_model,
+        "after_model_callback": _after_model,
+    }
@@ -0,0 +1,209 @@
+# response_cache.py
+"""
+TTL response cache for sub-agent tool calls.
+
+Entries are keyed on the agent name plus the normalized query text, so "Tomato price in Hubli?"
+and "tomato price in  hubli" share one entry. Concurrent misses for the same key are coalesced
+(single-flight): only the first caller runs the LLM, the others await its result. The cache fails
+open: a backend error is logged and treated as a miss (or a skipped write).
+
+Backends:
+    memory  in-process LRU (default)
+    sqlite  local file, shared by all workers on the same host
+    none    caching disabled
+"""
+import abc
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+from services import metrics
+
+CACHE_REQUESTS = metrics.counter(
+    "kisan_response_cache_requests_total", "Response cache lookups by result", ["namespace", "result"]
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n?!.,;:'\"‘’“”।"
+
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE_RE.sub(" ", query.lower()).strip(_EDGE_PUNCTUATION)
+
+
+class CacheBackend(abc.ABC):
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        ...
+
+
+class InMemoryLRUBackend(CacheBackend):
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        self._entries[key] = (time.time() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Entries in a SQLite file in WAL mode, shared by the workers on one machine. Each call runs in a
+    worker thread (waiting on a lock held by another worker must not block the event loop); one
+    connection per process, serialized by a lock.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    async def _run(self, function, *args):
+        def locked():
+            with self._lock:
+                return function(*args)
+        return await asyncio.to_thread(locked)
+
+    async def get(self, key: str) -> Optional[str]:
+        row = await self._run(self._select, key)
+        return row[0] if row else None
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        await self._run(self._upsert, key, value, ttl_seconds)
+
+    def _select(self, key: str):
+        return self._conn.execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+
+    def _upsert(self, key: str, value: str, ttl_seconds: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_seconds)
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self._prune()
+
+    def _prune(self):
+        self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM response_cache WHERE key NOT IN "
+            "(SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT ?)", (self.max_entries,)
+        )
+
+
+class ResponseCache:
+    def __init__(self, backend: Optional[CacheBackend], ttls: dict[str, float], default_ttl: float = 600):
+        self.backend = backend
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def make_key(namespace: str, query: str) -> str:
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest}"
+
+    async def get_or_compute(
+            self,
+            namespace: str,
+            query: str,
+            compute: Callable[[], Awaitable[str]],
+            cacheable: Callable[[str], bool] = lambda value: True
+    ) -> str:
+        """Returns the cached response for (namespace, query), computing it at most once per key at a time."""
+        if self.backend is None:
+            return await compute()
+
+        key = self.make_key(namespace, query)
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            # The cache fails open: a backend error is a miss.
+            logger.warning(f"Response cache lookup failed for '{namespace}': {e}")
+            cached = None
+        if cached is not None:
+            CACHE_REQUESTS.inc(namespace=namespace, result="hit")
+            return cached
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            CACHE_REQUESTS.inc(namespace=namespace, result="coalesced")
+            return await asyncio.shield(in_flight)
+
+        CACHE_REQUESTS.inc(namespace=namespace, result="miss")
+        # The computation runs as its own task so a cancelled caller does not cancel it for the others.
+        # It stays in flight until stored, so callers arriving meanwhile do not compute it again.
+        task = asyncio.ensure_future(self._compute_and_store(namespace, key, compute, cacheable))
+        self._in_flight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._in_flight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def _compute_and_store(
+            self,
+            namespace: str,
+            key: str,
+            compute: Callable[[], Awaitable[str]],
+            cacheable: Callable[[str], bool]
+    ) -> str:
+        value = await compute()
+        if cacheable(value):
+            try:
+                await self.backend.set(key, value, self.ttls.get(namespace, self.default_ttl))
+            except Exception as e:
+                logger.warning(f"Response cache write failed for '{namespace}': {e}")
+        return value
+
+
+def build_response_cache_from_env(ttls: dict[str, float]) -> ResponseCache:
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+    if backend_name == "none":
+        backend = None
+    elif backend_name == "sqlite":
+        backend = SQLiteBackend(os.getenv("RESPONSE_CACHE_PATH", "/tmp/kisan_response_cache.sqlite3"), max_entries)
+    elif backend_name == "memory":
+        backend = InMemoryLRUBackend(max_entries)
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND '{backend_name}' (expected memory, sqlite or none)")
+    logger.debug(f"Response cache backend: {backend_name}")
+    return ResponseCache(backend, ttls)
@@ -0,0 +1,686 @@
+# session_store.py
+"""
+Session stores for the ADK runners, selected by SESSION_BACKEND (see build_session_service_from_env):
+
+  memory   BoundedInMemorySessionService (default). Behaves like InMemorySessionService but tracks
+           every session it holds and evicts them when they are idle for longer than `ttl_seconds`
+           (TTL) or when the store exceeds `max_sessions` entries or `max_bytes` of approximate
+           payload (least recently used first). Sessions live in one worker process.
+  sqlite   SQLiteSessionService, a local file (SESSION_DB_PATH) shared by the workers of one machine.
+  redis    RedisRestSessionService, a Redis server behind the Redis REST protocol (SESSION_REDIS_URL,
+           SESSION_REDIS_TOKEN), shared by every worker and instance.
+
+The shared stores keep a session as rows/keys that are only ever appended to or updated in place:
+each event is stored once as its own JSON document, and state deltas update single keys, so appending
+an event costs the same however long the session already is. "app:" and "user:" state is stored once
+per app and per user and merged into every session that is loaded, as InMemorySessionService does.
+Their I/O runs off the event loop (a worker thread for SQLite, httpx for Redis). Idle sessions expire
+after SESSION_TTL_SECONDS; the entry and byte caps only apply to the memory store.
+"""
+import abc
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+import httpx
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+from loguru import logger
+
+from services import metrics
+from services.tracing import span
+
+# Rough per-event overhead (ids, timestamps, actions) on top of the text and inline data it carries.
+_EVENT_OVERHEAD_BYTES = 512
+_SESSION_OVERHEAD_BYTES = 1024
+
+SESSIONS_EVICTED = metrics.counter(
+    "kisan_sessions_evicted_total", "Sessions evicted from a bounded session store", ["store", "reason"]
+)
+LIVE_SESSIONS = metrics.gauge("kisan_sessions_live", "Sessions currently held", ["store"])
+SESSION_BYTES = metrics.gauge("kisan_sessions_approx_bytes", "Approximate bytes held by sessions", ["store"])
+
+
+def approx_event_bytes(event: Event) -> int:
+    """Approximates the memory held by an event: its text and inline data plus a fixed overhead."""
+    size = _EVENT_OVERHEAD_BYTES
+    content = getattr(event, 'content', None)
+    for part in (content.parts or []) if content else []:
+        if part.text:
+            size += len(part.text)
+        if part.inline_data and part.inline_data.data:
+            size += len(part.inline_data.data)
+        if part.function_call and part.function_call.args:
+            size += len(str(part.function_call.args))
+        if part.function_response and part.function_response.response:
+            size += len(str(part.function_response.response))
+    if event.actions and event.actions.state_delta:
+        size += len(str(event.actions.state_delta))
+    return size
+
+
+class BoundedInMemorySessionService(InMemorySessionService):
+    def __init__(
+            self,
+            name: str,
+            ttl_seconds: float = 1800,
+            max_sessions: int = 10000,
+            max_bytes: int = 256 * 1024 * 1024
+    ):
+        super().__init__()
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        # (app_name, user_id, session_id) -> [last_access_monotonic, approx_bytes], oldest first.
+        self._tracked: OrderedDict[tuple[str, str, str], list] = OrderedDict()
+        self._total_bytes = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "BoundedInMemorySessionService":
+        return cls(
+            name=name,
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+            max_sessions=int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+            max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024))),
+        )
+
+    async def create_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            state: Optional[dict[str, Any]] = None,
+            session_id: Optional[str] = None,
+    ) -> Session:
+        await self._evict()
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._track((app_name, user_id, session.id), _SESSION_OVERHEAD_BYTES + len(str(state or {})))
+        await self._evict()
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        entry = self._tracked.get(key)
+        if entry and time.monotonic() - entry[0] > self.ttl_seconds:
+            await self._drop(key, "ttl")
+            return None
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is not None:
+            self._track(key, 0)
+        return session
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if not event.partial:
+            self._track((session.app_name, session.user_id, session.id), approx_event_bytes(event))
+            await self._evict()
+        return event
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._untrack((app_name, user_id, session_id))
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    def _track(self, key: tuple[str, str, str], added_bytes: int):
+        entry = self._tracked.get(key)
+        if entry is None:
+            entry = [0.0, 0]
+            self._tracked[key] = entry
+        entry[0] = time.monotonic()
+        entry[1] += added_bytes
+        self._total_bytes += added_bytes
+        self._tracked.move_to_end(key)
+        self._update_gauges()
+
+    def _untrack(self, key: tuple[str, str, str]):
+        entry = self._tracked.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+            self._update_gauges()
+
+    async def _drop(self, key: tuple[str, str, str], reason: str):
+        self._untrack(key)
+        app_name, user_id, session_id = key
+        try:
+            await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        except Exception as e:
+            logger.warning(f"Could not evict session '{session_id}' from '{self.name}': {e}")
+        SESSIONS_EVICTED.inc(store=self.name, reason=reason)
+
+    async def _evict(self):
+        now = time.monotonic()
+        while self._tracked:
+            key, (last_access, _) = next(iter(self._tracked.items()))
+            if now - last_access > self.ttl_seconds:
+                await self._drop(key, "ttl")
+            elif len(self._tracked) > self.max_sessions:
+                await self._drop(key, "max_sessions")
+            elif self._total_bytes > self.max_bytes and len(self._tracked) > 1:
+                await self._drop(key, "max_bytes")
+            else:
+                break
+
+    def _update_gauges(self):
+        LIVE_SESSIONS.set(len(self._tracked), store=self.name)
+        SESSION_BYTES.set(self._total_bytes, store=self.name)
+
+    def stats(self) -> dict:
+        return {
+            "live_sessions": len(self._tracked),
+            "approx_bytes": self._total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    async def close(self):
+        pass
+
+
+class SessionStoreError(RuntimeError):
+    """A shared session store could not be read or written."""
+
+
+# (app_name, user_id, session_id)
+SessionKey = tuple[str, str, str]
+
+
+def _split_state(state: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any], dict[str, Any]]:
+    """Splits a state (delta) into its app, user and session scopes, without prefixes; drops temp: keys."""
+    app_state, user_state, session_state = {}, {}, {}
+    for key, value in state.items():
+        if key.startswith(State.TEMP_PREFIX):
+            continue
+        if key.startswith(State.APP_PREFIX):
+            app_state[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user_state[key[len(State.USER_PREFIX):]] = value
+        else:
+            session_state[key] = value
+    return app_state, user_state, session_state
+
+
+def _merge_state(session_state: dict, app_state: dict, user_state: dict) -> dict[str, Any]:
+    merged = dict(session_state)
+    merged.update({State.APP_PREFIX + key: value for key, value in app_state.items()})
+    merged.update({State.USER_PREFIX + key: value for key, value in user_state.items()})
+    return merged
+
+
+def _encode_values(state: dict[str, Any]) -> dict[str, str]:
+    return {key: json.dumps(value, ensure_ascii=False) for key, value in state.items()}
+
+
+def _decode_values(encoded: dict[str, str]) -> dict[str, Any]:
+    return {key: json.loads(value) for key, value in encoded.items()}
+
+
+class _SharedSessionService(BaseSessionService, abc.ABC):
+    """
+    Session semantics on top of a store that appends events and updates state keys in place.
+    Subclasses implement the storage operations (`_create` ... `_delete`) on JSON-encoded values.
+    """
+    backend = ""
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+
+    async def create_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            state: Optional[dict[str, Any]] = None,
+            session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        app_state, user_state, session_state = _split_state(state or {})
+        with span("session_store.create", backend=self.backend):
+            created = await self._create(
+                (app_name, user_id, session_id), _encode_values(session_state),
+                _encode_values(app_state), _encode_values(user_state), time.time()
+            )
+        if not created:
+            raise SessionStoreError(f"Session '{session_id}' already exists in '{self.name}'")
+        session = await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session is None:
+            raise SessionStoreError(f"Session '{session_id}' was not readable after creating it in '{self.name}'")
+        return session
+
+    async def get_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            session_id: str,
+            config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        config = config or GetSessionConfig()
+        with span("session_store.load", backend=self.backend):
+            loaded = await self._load((app_name, user_id, session_id), config.num_recent_events or None,
+                                      config.after_timestamp or None)
+        if loaded is None:
+            return None
+        session_state, app_state, user_state, last_update, event_documents = loaded
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=_merge_state(_decode_values(session_state), _decode_values(app_state), _decode_values(user_state)),
+            events=[Event.model_validate_json(document) for document in event_documents],
+            last_update_time=last_update,
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        listed, app_state, user_state = await self._list(app_name, user_id)
+        app_state, user_state = _decode_values(app_state), _decode_values(user_state)
+        return ListSessionsResponse(sessions=[
+            Session(
+                id=session_id,
+                app_name=app_name,
+                user_id=user_id,
+                state=_merge_state(_decode_values(session_state), app_state, user_state),
+                last_update_time=last_update,
+            )
+            for session_id, session_state, last_update in listed
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self._delete((app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event = await super().append_event(session, event)
+        session.last_update_time = event.timestamp
+        state_delta = event.actions.state_delta if event.actions else {}
+        app_delta, user_delta, session_delta = _split_state(state_delta or {})
+        with span("session_store.append", backend=self.backend):
+            await self._append(
+                (session.app_name, session.user_id, session.id), event.model_dump_json(exclude_none=True),
+                event.timestamp, _encode_values(session_delta), _encode_values(app_delta), _encode_values(user_delta)
+            )
+        return event
+
+    async def close(self):
+        pass
+
+    @abc.abstractmethod
+    async def _create(self, key: SessionKey, session_state: dict[str, str], app_state: dict[str, str],
+                      user_state: dict[str, str], now: float) -> bool:
+        """Stores a new session; False if it already exists."""
+
+    @abc.abstractmethod
+    async def _load(self, key: SessionKey, num_recent_events: Optional[int], after_timestamp: Optional[float]):
+        """(session_state, app_state, user_state, last_update, event JSON documents oldest first), or None."""
+
+    @abc.abstractmethod
+    async def _append(self, key: SessionKey, event_document: str, timestamp: float, session_delta: dict[str, str],
+                      app_delta: dict[str, str], user_delta: dict[str, str]):
+        """Stores the event (its `timestamp` is kept for after_timestamp queries) and applies the deltas."""
+
+    @abc.abstractmethod
+    async def _list(self, app_name: str, user_id: str):
+        """([(session_id, session_state, last_update)], app_state, user_state)"""
+
+    @abc.abstractmethod
+    async def _delete(self, key: SessionKey):
+        """Removes the session, its events and its state."""
+
+
+class SQLiteSessionService(_SharedSessionService):
+    """
+    Sessions in a SQLite file in WAL mode, so several worker processes on one machine can share it.
+    Each call runs in a worker thread; one connection per process, serialized by a lock.
+    App and user state rows use '' for the session id (and the user id, for app state).
+    """
+    backend = "sqlite"
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions (app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL, "
+        "created REAL NOT NULL, last_update REAL NOT NULL, PRIMARY KEY (app_name, user_id, session_id))",
+        "CREATE TABLE IF NOT EXISTS session_events (seq INTEGER PRIMARY KEY AUTOINCREMENT, app_name TEXT NOT NULL, "
+        "user_id TEXT NOT NULL, session_id TEXT NOT NULL, timestamp REAL NOT NULL, event TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS session_events_by_session ON session_events (app_name, user_id, session_id, seq)",
+        "CREATE TABLE IF NOT EXISTS session_state (app_name TEXT NOT NULL, user_id TEXT NOT NULL, "
+        "session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+        "PRIMARY KEY (app_name, user_id, session_id, key))",
+    )
+
+    def __init__(self, name: str, path: str, ttl_seconds: float = 1800):
+        super().__init__(name, ttl_seconds)
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Workers writing at the same moment wait for each other instead of failing.
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self._SCHEMA:
+            self._conn.execute(statement)
+
+    async def _run(self, function, *args):
+        def locked():
+            with self._lock:
+                return function(*args)
+        return await asyncio.to_thread(locked)
+
+    def _write(self, statements: list[tuple[str, tuple]]):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                self._conn.execute(sql, params)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self._prune()
+
+    @staticmethod
+    def _state_upserts(app_name: str, user_id: str, session_id: str, state: dict[str, str]) -> list[tuple[str, tuple]]:
+        return [
+            ("INSERT OR REPLACE INTO session_state (app_name, user_id, session_id, key, value) VALUES (?, ?, ?, ?, ?)",
+             (app_name, user_id, session_id, key, value))
+            for key, value in state.items()
+        ]
+
+    def _create_sync(self, key, session_state, app_state, user_state, now) -> bool:
+        app_name, user_id, session_id = key
+        exists = self._conn.execute(
+            "SELECT last_update FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+        ).fetchone()
+        if exists and exists[0] >= now - self.ttl_seconds:
+            return False
+        statements = [] if not exists else self._delete_statements(key)
+        statements.append((
+            "INSERT INTO sessions (app_name, user_id, session_id, created, last_update) VALUES (?, ?, ?, ?, ?)",
+            (app_name, user_id, session_id, now, now)
+        ))
+        statements += self._state_upserts(app_name, user_id, session_id, session_state)
+        statements += self._state_upserts(app_name, "", "", app_state)
+        statements += self._state_upserts(app_name, user_id, "", user_state)
+        self._write(statements)
+        return True
+
+    def _load_sync(self, key, num_recent_events, after_timestamp):
+        app_name, user_id, session_id = key
+        row = self._conn.execute(
+            "SELECT last_update FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+        ).fetchone()
+        if row is None or row[0] < time.time() - self.ttl_seconds:
+            return None
+        session_state, app_state, user_state = {}, {}, {}
+        for state_user, state_session, state_key, value in self._conn.execute(
+                "SELECT user_id, session_id, key, value FROM session_state WHERE app_name = ? AND "
+                "((user_id = ? AND session_id IN (?, '')) OR (user_id = '' AND session_id = ''))",
+                (app_name, user_id, session_id)
+        ):
+            if state_session:
+                session_state[state_key] = value
+            elif state_user:
+                user_state[state_key] = value
+            else:
+                app_state[state_key] = value
+        documents = [document for (document,) in self._conn.execute(
+            "SELECT event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? AND timestamp >= ? "
+            "ORDER BY seq DESC LIMIT ?", (*key, after_timestamp or 0.0, num_recent_events or -1)
+        )]
+        documents.reverse()
+        return session_state, app_state, user_state, row[0], documents
+
+    def _append_sync(self, key, event_document, timestamp, session_delta, app_delta, user_delta):
+        app_name, user_id, session_id = key
+        statements = [
+            ("INSERT INTO session_events (app_name, user_id, session_id, timestamp, event) VALUES (?, ?, ?, ?, ?)",
+             (*key, timestamp, event_document)),
+            ("UPDATE sessions SET last_update = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+             (time.time(), *key)),
+        ]
+        statements += self._state_upserts(app_name, user_id, session_id, session_delta)
+        statements += self._state_upserts(app_name, "", "", app_delta)
+        statements += self._state_upserts(app_name, user_id, "", user_delta)
+        self._write(statements)
+
+    def _list_sync(self, app_name, user_id):
+        listed = []
+        for session_id, last_update in self._conn.execute(
+                "SELECT session_id, last_update FROM sessions WHERE app_name = ? AND user_id = ? AND last_update >= ?",
+                (app_name, user_id, time.time() - self.ttl_seconds)
+        ).fetchall():
+            state = dict(self._conn.execute(
+                "SELECT key, value FROM session_state WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id)
+            ).fetchall())
+            listed.append((session_id, state, last_update))
+        app_state = dict(self._conn.execute(
+            "SELECT key, value FROM session_state WHERE app_name = ? AND user_id = '' AND session_id = ''", (app_name,)
+        ).fetchall())
+        user_state = dict(self._conn.execute(
+            "SELECT key, value FROM session_state WHERE app_name = ? AND user_id = ? AND session_id = ''",
+            (app_name, user_id)
+        ).fetchall())
+        return listed, app_state, user_state
+
+    @staticmethod
+    def _delete_statements(key) -> list[tuple[str, tuple]]:
+        where = "WHERE app_name = ? AND user_id = ? AND session_id = ?"
+        return [(f"DELETE FROM {table} {where}", key) for table in ("session_events", "session_state", "sessions")]
+
+    def _prune(self):
+        """Deletes sessions idle for longer than the TTL, with their events and state."""
+        expired = "(app_name, user_id, session_id) IN (SELECT app_name, user_id, session_id FROM sessions WHERE last_update < ?)"
+        cutoff = time.time() - self.ttl_seconds
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(f"DELETE FROM session_events WHERE {expired}", (cutoff,))
+            self._conn.execute(f"DELETE FROM session_state WHERE session_id != '' AND {expired}", (cutoff,))
+            deleted = self._conn.execute("DELETE FROM sessions WHERE last_update < ?", (cutoff,)).rowcount
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        if deleted:
+            SESSIONS_EVICTED.inc(deleted, store=self.name, reason="ttl")
+
+    async def _create(self, key, session_state, app_state, user_state, now) -> bool:
+        return await self._run(self._create_sync, key, session_state, app_state, user_state, now)
+
+    async def _load(self, key, num_recent_events, after_timestamp):
+        return await self._run(self._load_sync, key, num_recent_events, after_timestamp)
+
+    async def _append(self, key, event_document, timestamp, session_delta, app_delta, user_delta):
+        await self._run(self._append_sync, key, event_document, timestamp, session_delta, app_delta, user_delta)
+
+    async def _list(self, app_name, user_id):
+        return await self._run(self._list_sync, app_name, user_id)
+
+    async def _delete(self, key):
+        await self._run(self._write, self._delete_statements(key))
+
+    async def close(self):
+        await self._run(self._conn.close)
+
+
+def _pairs(flat: list) -> dict[str, str]:
+    """HGETALL's [field, value, field, value, ...] reply as a dict."""
+    return dict(zip(flat[0::2], flat[1::2]))
+
+
+class RedisRestSessionService(_SharedSessionService):
+    """
+    Sessions in Redis, over the Redis REST protocol (Upstash and compatible proxies): commands are
+    POSTed as JSON arrays, several at a time to /pipeline, or to /multi-exec to apply them atomically.
+    Per session there is a hash of metadata, a hash of state and a list of event documents, which all
+    expire after `ttl_seconds` without updates; a set per user indexes their sessions for listing.
+    benchmarks/redis_stub_server.py is a local stand-in for tests and benchmarks.
+    """
+    backend = "redis"
+
+    def __init__(self, name: str, url: str, token: str = "", ttl_seconds: float = 1800,
+                 prefix: str = "kisan:", timeout: float = 2.0):
+        super().__init__(name, ttl_seconds)
+        self.url = url.rstrip("/")
+        self.token = token
+        self.prefix = prefix
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared connection pool, created on first use."""
+        if self._client is None or self._client.is_closed:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._client = httpx.AsyncClient(base_url=self.url, headers=headers, timeout=self.timeout)
+        return self._client
+
+    async def _commands(self, commands: list[list], atomic: bool = False) -> list:
+        """Runs `commands` in one round trip and returns their results."""
+        try:
+            response = await self._get_client().post("/multi-exec" if atomic else "/pipeline", json=commands)
+            response.raise_for_status()
+            replies = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise SessionStoreError(f"Redis request for '{self.name}' failed: {e}") from e
+        errors = [reply["error"] for reply in replies if "error" in reply]
+        if errors:
+            raise SessionStoreError(f"Redis command for '{self.name}' failed: {errors[0]}")
+        return [reply.get("result") for reply in replies]
+
+    def _keys(self, key: SessionKey) -> tuple[str, str, str]:
+        base = f"{self.prefix}session:{':'.join(key)}"
+        return f"{base}:meta", f"{base}:state", f"{base}:events"
+
+    def _app_key(self, app_name: str) -> str:
+        return f"{self.prefix}app_state:{app_name}"
+
+    def _user_key(self, app_name: str, user_id: str) -> str:
+        return f"{self.prefix}user_state:{app_name}:{user_id}"
+
+    def _index_key(self, app_name: str, user_id: str) -> str:
+        return f"{self.prefix}sessions:{app_name}:{user_id}"
+
+    def _state_writes(self, key: SessionKey, session_state: dict, app_state: dict, user_state: dict) -> list[list]:
+        app_name, user_id, _ = key
+        writes = []
+        for hash_key, state in ((self._keys(key)[1], session_state), (self._app_key(app_name), app_state),
+                                (self._user_key(app_name, user_id), user_state)):
+            if state:
+                writes.append(["HSET", hash_key, *(item for pair in state.items() for item in pair)])
+        return writes
+
+    def _expiries(self, key: SessionKey) -> list[list]:
+        ttl = str(max(1, int(self.ttl_seconds)))
+        return [["EXPIRE", redis_key, ttl] for redis_key in self._keys(key)] + [
+            ["EXPIRE", self._index_key(key[0], key[1]), ttl]
+        ]
+
+    async def _create(self, key, session_state, app_state, user_state, now) -> bool:
+        meta_key = self._keys(key)[0]
+        (claimed,) = await self._commands([["HSETNX", meta_key, "created", repr(now)]])
+        if not claimed:
+            return False
+        await self._commands([
+            ["HSET", meta_key, "last_update", repr(now)],
+            *self._state_writes(key, session_state, app_state, user_state),
+            ["SADD", self._index_key(key[0], key[1]), key[2]],
+            *self._expiries(key),
+        ], atomic=True)
+        return True
+
+    async def _load(self, key, num_recent_events, after_timestamp):
+        app_name, user_id, _ = key
+        meta_key, state_key, events_key = self._keys(key)
+        meta, session_state, documents, app_state, user_state = await self._commands([
+            ["HGETALL", meta_key],
+            ["HGETALL", state_key],
+            ["LRANGE", events_key, str(-num_recent_events) if num_recent_events else "0", "-1"],
+            ["HGETALL", self._app_key(app_name)],
+            ["HGETALL", self._user_key(app_name, user_id)],
+        ])
+        meta = _pairs(meta or [])
+        if "last_update" not in meta:
+            return None
+        documents = documents or []
+        if after_timestamp:
+            documents = [document for document in documents
+                         if json.loads(document).get("timestamp", 0.0) >= after_timestamp]
+        return (_pairs(session_state or []), _pairs(app_state or []), _pairs(user_state or []),
+                float(meta["last_update"]), documents)
+
+    async def _append(self, key, event_document, timestamp, session_delta, app_delta, user_delta):
+        meta_key, _, events_key = self._keys(key)
+        await self._commands([
+            ["RPUSH", events_key, event_document],
+            ["HSET", meta_key, "last_update", repr(time.time())],
+            *self._state_writes(key, session_delta, app_delta, user_delta),
+            *self._expiries(key),
+        ], atomic=True)
+
+    async def _list(self, app_name, user_id):
+        index_key = self._index_key(app_name, user_id)
+        (session_ids,) = await self._commands([["SMEMBERS", index_key]])
+        session_ids = sorted(session_ids or [])
+        commands = [["HGETALL", self._app_key(app_name)], ["HGETALL", self._user_key(app_name, user_id)]]
+        for session_id in session_ids:
+            meta_key, state_key, _ = self._keys((app_name, user_id, session_id))
+            commands += [["HGETALL", meta_key], ["HGETALL", state_key]]
+        replies = await self._commands(commands)
+        listed, expired = [], []
+        for i, session_id in enumerate(session_ids):
+            meta = _pairs(replies[2 + 2 * i] or [])
+            if "last_update" in meta:
+                listed.append((session_id, _pairs(replies[3 + 2 * i] or []), float(meta["last_update"])))
+            else:
+                expired.append(session_id)
+        if expired:
+            await self._commands([["SREM", index_key, *expired]])
+        return listed, _pairs(replies[0] or []), _pairs(replies[1] or [])
+
+    async def _delete(self, key):
+        await self._commands([
+            ["DEL", *self._keys(key)],
+            ["SREM", self._index_key(key[0], key[1]), key[2]],
+        ], atomic=True)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def build_session_service_from_env(name: str) -> BaseSessionService:
+    """The session store selected by SESSION_BACKEND (memory, sqlite or redis) for the runner `name`."""
+    backend_name = os.getenv("SESSION_BACKEND", "memory").lower()
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+    if backend_name == "memory":
+        service = BoundedInMemorySessionService.from_env(name)
+    elif backend_name == "sqlite":
+        service = SQLiteSessionService(name, os.getenv("SESSION_DB_PATH", "/tmp/kisan_sessions.sqlite3"), ttl_seconds)
+    elif backend_name == "redis":
+        url = os.getenv("SESSION_REDIS_URL")
+        if not url:
+            raise ValueError("SESSION_BACKEND 'redis' needs SESSION_REDIS_URL")
+        service = RedisRestSessionService(
+            name, url, os.getenv("SESSION_REDIS_TOKEN", ""), ttl_seconds,
+            prefix=os.getenv("SESSION_REDIS_PREFIX", "kisan:"),
+            timeout=float(os.getenv("SESSION_REDIS_TIMEOUT_SECONDS", "2")),
+        )
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend_name}' (expected memory, sqlite or redis)")
+    logger.debug(f"Session backend for '{name}': {backend_name}")
+    return service
@@ -0,0 +1,113 @@
+# structured_output.py
+"""
+Fast, tolerant parsing of sub-agent JSON answers into Pydantic result models.
+
+orjson parses well-formed output directly. Anything else goes through a repair path that
+handles the usual model slips: markdown code fences, prose around the object, trailing commas
+and output cut off mid-object (open strings and brackets are closed). Outcomes are counted per
+agent so malformed output shows up in metrics instead of as extra summarization turns.
+"""
+import re
+from typing import Optional, TypeVar
+
+import orjson
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from services import metrics
+from services.logging_setup import truncate
+
+STRUCTURED_OUTPUT_PARSES = metrics.counter(
+    "kisan_structured_output_parses_total",
+    "Sub-agent JSON outputs by parse result (ok, repaired, invalid_json, schema_error)",
+    ["agent", "result"]
+)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.IGNORECASE | re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_DANGLING_KEY_RE = re.compile(r'(?:(?<=\{)|,)\s*"[^"]*"\s*:?\s*$')
+
+
+def _close_truncated(text: str) -> str:
+    """Closes strings, objects and arrays left open by output that was cut off."""
+    stack = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if escaped:
+        text = text[:-1]
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    # A key without a value ("key" or "key":) cannot be completed; drop it.
+    if stack and stack[-1] == "}":
+        text = _DANGLING_KEY_RE.sub("", text)
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[str]:
+    """Best-effort cleanup of a model's JSON answer; returns None if no JSON value can be located."""
+    fenced = _CODE_FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return None
+    text = text[min(starts):]
+
+    # Cut anything after the last closing bracket of a complete value, then close what is still open.
+    end = max(text.rfind("}"), text.rfind("]"))
+    candidate = text[:end + 1] if end > 0 else text
+    try:
+        orjson.loads(candidate)
+        return candidate
+    except orjson.JSONDecodeError:
+        pass
+    return _TRAILING_COMMA_RE.sub(r"\1", _close_truncated(_TRAILING_COMMA_RE.sub(r"\1", text)))
+
+
+def loads_lenient(text: str):
+    """Returns (value, repaired) for a model's JSON answer, or (None, False) if it cannot be parsed."""
+    try:
+        return orjson.loads(text), False
+    except orjson.JSONDecodeError:
+        pass
+    repaired = repair_json(text)
+    if repaired is None:
+        return None, False
+    try:
+        return orjson.loads(repaired), True
+    except orjson.JSONDecodeError:
+        return None, False
+
+
+def parse_agent_output(text: str, model: type[ModelT], agent_name: str, record: bool = True) -> Optional[ModelT]:
+    """Parses and validates a sub-agent answer as `model`; returns None if it is not valid."""
+    value, repaired = loads_lenient(text)
+    if value is None:
+        result, parsed = "invalid_json", None
+    else:
+        try:
+            parsed = model.model_validate(value)
+            result = "repaired" if repaired else "ok"
+        except ValidationError as e:
+            logger.warning(f"{agent_name} output does not match {model.__name__}: {truncate(e.errors()[:3])}")
+            result, parsed = "schema_error", None
+    if record:
+        STRUCTURED_OUTPUT_PARSES.inc(agent=agent_name, result=result)
+    return parsed
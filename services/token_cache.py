@@ -0,0 +1,196 @@
+# token_cache.py
+"""
+Cached, local verification of Firebase ID tokens.
+
+Firebase ID tokens are RS256 JWTs signed with Google's rotating securetoken keys. TokenVerifier
+keeps those public certificates in memory (fetched at startup and refreshed before their
+Cache-Control max-age runs out) and verifies tokens in-process. Verified claims are cached by
+token hash until the token's `exp`, so a client re-sending the same token pays a dictionary lookup.
+A token signed with a key id the set does not know triggers at most one certificate fetch per
+`min_refresh_interval` (a key rotation); within that window such tokens are rejected without a
+fetch, so unauthenticated callers cannot make every request wait on Google.
+
+Revocation checks need a round trip to Firebase per request; with `check_revoked=True`
+(FIREBASE_CHECK_REVOKED=1) the cache is bypassed and every token goes through
+firebase_admin.auth.verify_id_token(check_revoked=True).
+"""
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import httpx
+from google.auth import jwt as google_jwt
+from loguru import logger
+
+from services import metrics
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+TOKEN_VERIFICATIONS = metrics.counter(
+    "kisan_token_verifications_total", "Firebase ID token verifications by path", ["result"]
+)
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class SigningKeySet:
+    """Google's public certificates for Firebase ID tokens, keyed by `kid`."""
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL, certs: Optional[dict[str, str]] = None,
+                 min_refresh_interval: float = 60.0):
+        self.url = url
+        self.certs: dict[str, str] = dict(certs or {})
+        self.expires_at = float("inf") if certs else 0.0
+        self.min_refresh_interval = min_refresh_interval
+        self._unknown_key_refreshed_at = float("-inf")
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        async with self._refresh_lock:
+            await self._fetch()
+
+    async def _fetch(self):
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else 3600
+        self.certs = response.json()
+        self.expires_at = time.time() + max_age
+        logger.debug(f"Loaded {len(self.certs)} Firebase signing keys (valid for {max_age}s).")
+
+    async def ensure_fresh(self):
+        if time.time() < self.expires_at:
+            return
+        async with self._refresh_lock:
+            # Requests that waited for the lock find the keys fetched by the first one.
+            if time.time() >= self.expires_at:
+                await self._fetch()
+
+    async def refresh_for_unknown_key(self, kid: Optional[str]) -> bool:
+        """
+        Fetches the keys again for a token signed with an unknown `kid`, at most once per
+        min_refresh_interval. Returns True if the key is known afterwards.
+        """
+        async with self._refresh_lock:
+            if kid in self.certs:
+                return True
+            now = time.monotonic()
+            if now - self._unknown_key_refreshed_at < self.min_refresh_interval:
+                return False
+            self._unknown_key_refreshed_at = now
+            await self._fetch()
+            return kid in self.certs
+
+    async def start(self):
+        """Preloads the keys and keeps refreshing them in the background."""
+        if self.expires_at == float("inf"):
+            return
+        await self.refresh()
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            # Refresh a few minutes before the advertised expiry so the hot path never waits on a fetch.
+            await asyncio.sleep(max(60.0, self.expires_at - time.time() - 300))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh Firebase signing keys: {e}")
+
+
+class TokenVerifier:
+    def __init__(
+            self,
+            project_id: Optional[str],
+            key_set: SigningKeySet,
+            fallback_verify: Callable[..., dict],
+            max_entries: int = 10000,
+            check_revoked: bool = False
+    ):
+        self.project_id = project_id
+        self.key_set = key_set
+        self.fallback_verify = fallback_verify
+        self.max_entries = max_entries
+        self.check_revoked = check_revoked
+        # sha256(token) -> (exp, claims), least recently used first.
+        self._cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, project_id: Optional[str], fallback_verify: Callable[..., dict]) -> "TokenVerifier":
+        return cls(
+            project_id=os.getenv("FIREBASE_PROJECT_ID", project_id),
+            key_set=SigningKeySet(
+                min_refresh_interval=float(os.getenv("FIREBASE_KEYS_MIN_REFRESH_INTERVAL_SECONDS", "60"))
+            ),
+            fallback_verify=fallback_verify,
+            max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+            check_revoked=os.getenv("FIREBASE_CHECK_REVOKED", "0") == "1",
+        )
+
+    async def start(self):
+        if self.project_id and not self.check_revoked:
+            await self.key_set.start()
+
+    async def stop(self):
+        await self.key_set.stop()
+
+    async def verify(self, token: str) -> dict:
+        """Returns the decoded claims (including 'uid') or raises ValueError / a firebase_admin auth error."""
+        if self.check_revoked or not self.project_id:
+            TOKEN_VERIFICATIONS.inc(result="firebase")
+            return await asyncio.to_thread(self.fallback_verify, token, check_revoked=self.check_revoked)
+
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._cache.get(token_hash)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._cache.move_to_end(token_hash)
+                    TOKEN_VERIFICATIONS.inc(result="cache_hit")
+                    return entry[1]
+                del self._cache[token_hash]
+
+        claims = await self._verify_locally(token)
+        TOKEN_VERIFICATIONS.inc(result="local")
+        with self._lock:
+            self._cache[token_hash] = (float(claims["exp"]), claims)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return claims
+
+    async def _verify_locally(self, token: str) -> dict:
+        await self.key_set.ensure_fresh()
+        try:
+            claims = google_jwt.decode(token, certs=self.key_set.certs, audience=self.project_id)
+        except ValueError as e:
+            # A key rotation may have happened since the last refresh; retry once with fresh keys.
+            if "Certificate for key id" not in str(e):
+                raise
+            if not await self.key_set.refresh_for_unknown_key(google_jwt.decode_header(token).get("kid")):
+                TOKEN_VERIFICATIONS.inc(result="unknown_key")
+                raise
+            claims = google_jwt.decode(token, certs=self.key_set.certs, audience=self.project_id)
+
+        if claims.get("iss") != f"https://securetoken.google.com/{self.project_id}":
+            raise ValueError("Firebase ID token has an incorrect 'iss' claim.")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("Firebase ID token has an invalid 'sub' claim.")
+        claims["uid"] = subject
+        return claims
+
+    def stats(self) -> dict:
+        return {"cached_tokens": len(self._cache), "max_entries": self.max_entries}
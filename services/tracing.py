@@ -0,0 +1,160 @@
+# tracing.py
+"""
+Request tracing with OpenTelemetry and per-stage latency metrics.
+
+`span(stage, **attributes)` wraps one stage of a request (token verification, image read, storage
+upload, orchestrator run, ...). It always records the stage's duration in
+kisan_stage_latency_seconds{stage}, and opens an OpenTelemetry span that is exported when tracing is
+enabled. google-adk creates its own spans (`invocation`, `agent_run [<agent>]`, `call_llm`,
+`execute_tool <tool>`) under the same tracer provider, so an exported trace shows each request's
+stages with the agent runs and model calls nested inside them.
+
+    with span("image.preprocess", bytes=len(image_bytes)):
+        prepared = preprocess_image(image_bytes)
+
+TRACING_EXPORTER selects where spans go: "none" (default; spans are not recorded), "console"
+(stdout), "otlp" (OTLP over HTTP to OTEL_EXPORTER_OTLP_ENDPOINT, e.g. a local collector; needs
+opentelemetry-exporter-otlp-proto-http) or "gcp" (Cloud Trace). TRACING_SAMPLE_RATE is the share of
+new traces that are recorded; requests arriving with a `traceparent` follow the caller's decision.
+
+HttpMetricsMiddleware maintains the in-flight and latency metrics per path and opens the root span of
+each request, unless the framework already did (recent FastAPI versions trace requests natively
+once a tracer provider is installed); then it tags that span with the request id instead.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+from opentelemetry import propagate, trace
+
+from services import metrics
+from services.logging_setup import current_request_id
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", os.getenv("K_SERVICE", "kisan-agri-api"))
+
+STAGE_LATENCY = metrics.histogram(
+    "kisan_stage_latency_seconds", "Latency of request stages", ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+HTTP_REQUEST_LATENCY = metrics.histogram(
+    "kisan_http_request_latency_seconds", "HTTP request latency by path, method and status",
+    ["path", "method", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = metrics.gauge(
+    "kisan_http_requests_in_flight", "HTTP requests being handled by path", ["path"]
+)
+
+_tracer = trace.get_tracer("kisan")
+_provider = None
+
+
+def _span_exporter(name: str):
+    if name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter(out=sys.stdout)
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if name == "gcp":
+        from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+        return CloudTraceSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER '{name}', expected none, console, otlp or gcp")
+
+
+def configure_tracing(exporter: str | None = None, sample_rate: float | None = None):
+    """Installs a tracer provider exporting to `exporter` (TRACING_EXPORTER). Does nothing for "none"."""
+    global _provider
+    exporter = exporter or TRACING_EXPORTER
+    if exporter == "none" or _provider is not None:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    try:
+        span_exporter = _span_exporter(exporter)
+    except ImportError as e:
+        logger.warning(f"Tracing disabled: the '{exporter}' span exporter is not installed ({e})")
+        return
+    sample_rate = TRACING_SAMPLE_RATE if sample_rate is None else sample_rate
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+    )
+    # Spans are exported in batches from a background thread.
+    _provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Tracing enabled: exporting {sample_rate:.0%} of traces to '{exporter}'")
+
+
+def shutdown_tracing():
+    """Exports the spans still buffered. Call on application shutdown."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Times `stage` into kisan_stage_latency_seconds and traces it; exceptions are recorded on the span."""
+    started = time.perf_counter()
+    attributes = {f"kisan.{key}": value for key, value in attributes.items() if value is not None}
+    try:
+        with _tracer.start_as_current_span(stage, attributes=attributes) as current:
+            yield current
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=stage)
+
+
+class HttpMetricsMiddleware:
+    """
+    ASGI middleware that records in-flight requests and latency per path, and opens the root span of
+    each HTTP request (continuing an incoming `traceparent`) when no server span is active yet.
+    Paths not in `paths` are counted as "other" to keep the label set bounded.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(path=path)
+        started = time.perf_counter()
+        try:
+            server_span = trace.get_current_span()
+            if server_span.get_span_context().is_valid:
+                server_span.set_attribute("kisan.request_id", current_request_id())
+                await self.app(scope, receive, send_with_status)
+                return
+            carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers") or []}
+            with _tracer.start_as_current_span(
+                    f"{method} {path}", context=propagate.extract(carrier), kind=trace.SpanKind.SERVER,
+                    attributes={"http.request.method": method, "url.path": scope["path"],
+                                "kisan.request_id": current_request_id()}
+            ) as root:
+                await self.app(scope, receive, send_with_status)
+                root.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    root.set_status(trace.StatusCode.ERROR)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(path=path)
+            HTTP_REQUEST_LATENCY.observe(time.perf_counter() - started, path=path, method=method,
+                                         status=status_code)
@@ -4,7 +4,7 @@ Basic coordinator for diagnosing crops, checking market prices, and suggesting s
 """
 
 from google.adk.agents import LlmAgent
-import os
+from services.model_config import model_kwargs
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -19,8 +19,8 @@ from subagent import (
 
 # Root agent coordinating basic Project Kisan flow
 root_agent = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="KisanSimpleAdvisor",
+    **model_kwargs("KisanSimpleAdvisor"),
     instruction="""
 You are a basic agriculture assistant helping Indian farmers.
 
@@ -5,16 +5,18 @@ used by dispatcher, parallel, self_critic, and simple orchestrators.
 """
 
 from google.adk.agents import LlmAgent
-import os
 from dotenv import load_dotenv
 
+from services.model_config import model_kwargs
+from basemodel_dto.agent_responsedto import CropDiagnosisResult, MarketAnalysisResult, SchemeInfoResult
+
 # Load environment variables
 load_dotenv()
 
 # Crop Diagnosis Agent
 crop_diagnosis_agent = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="CropDiagnosisAgent",
+    **model_kwargs("CropDiagnosisAgent"),
     description="Identifies crop disease and suggests organic and chemical remedies",
     instruction="""
 You are a crop doctor agent.
@@ -24,16 +26,21 @@ You are a crop doctor agent.
 - Output in JSON format:
   {
     "disease": "<name>",
-    "organic": "<remedy>",
-    "chemical": "<remedy>"
+    "organic_remedy": "<remedy>",
+    "chemical_remedy": "<remedy>",
+    "observed_symptoms_from_description": "<symptoms seen in the image or described by the farmer>"
   }
-"""
+""",
+    output_schema=CropDiagnosisResult,
+    output_key="diagnosis_result",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
 )
 
 # Market Analysis Agent
 market_analysis_agent = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="MarketAnalysisAgent",
+    **model_kwargs("MarketAnalysisAgent"),
     description="Provides market price analysis and sell/hold suggestions",
     instruction="""
 You are a market analyst agent for farmers.
@@ -47,13 +54,17 @@ You are a market analyst agent for farmers.
     "trend": "<increasing/decreasing/stable>",
     "recommendation": "<Sell or Hold>"
   }
-"""
+""",
+    output_schema=MarketAnalysisResult,
+    output_key="market_result",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
 )
 
 # Scheme Navigator Agent
 scheme_navigator_agent = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="SchemeNavigatorAgent",
+    **model_kwargs("SchemeNavigatorAgent"),
     description="Helps farmers navigate government schemes",
     instruction="""
 You are a government scheme navigator agent.
@@ -66,15 +77,19 @@ You are a government scheme navigator agent.
     "benefits": "<summary>",
     "eligibility": "<conditions>",
     "how_to_apply": "<steps>",
-    "link": "<url if available>"
+    "link": "<url if available, otherwise empty>"
   }
-"""
+""",
+    output_schema=SchemeInfoResult,
+    output_key="scheme_result",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
 )
 
 # Summary Agent
 summary_agent = LlmAgent(
-    model=os.getenv('MODEL_NAME', 'gemini-2.0-flash'),
     name="SummaryAgent",
+    **model_kwargs("SummaryAgent"),
     instruction="""
 Summarize all responses (crop diagnosis, market, and scheme) into a clear, organized message.
 Use local language style, simple words, and structure suitable for voice output.
@@ -1,21 +1,222 @@
+import asyncio
+import difflib
 import json
 import os
+import re
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+
+from loguru import logger
+
+# data/crop_calendar.json next to the project root, independent of the working directory.
+CALENDAR_PATH = Path(os.getenv(
+    "CROP_CALENDAR_PATH",
+    str(Path(__file__).resolve().parent.parent / "data" / "crop_calendar.json")
+))
+# How often (seconds) the file's mtime is checked for a hot reload.
+RELOAD_CHECK_INTERVAL = float(os.getenv("CROP_CALENDAR_RELOAD_CHECK_SECONDS", "2"))
+
+# Local and alternate crop names farmers use, mapped to the calendar's crop keys.
+CROP_ALIASES = {
+    "tamatar": "tomato", "tamater": "tomato", "thakkali": "tomato",
+    "dhan": "rice", "paddy": "rice", "chawal": "rice", "bhatta": "rice",
+    "gehun": "wheat", "gehu": "wheat", "godhi": "wheat",
+    "makka": "maize", "makki": "maize", "makai": "maize", "corn": "maize", "mekkejola": "maize",
+    "aloo": "potato", "alu": "potato",
+    "pyaz": "onion", "pyaaz": "onion", "kanda": "onion", "eerulli": "onion",
+    "ganna": "sugarcane", "kabbu": "sugarcane",
+    "kapas": "cotton", "hatti": "cotton",
+    "chana": "chickpea", "gram": "chickpea", "bengal gram": "chickpea",
+    "arhar": "pigeon pea", "tur": "pigeon pea", "toor": "pigeon pea", "tuvar": "pigeon pea",
+    "moong": "green gram", "urad": "black gram",
+    "moongphali": "groundnut", "mungfali": "groundnut", "peanut": "groundnut", "shenga": "groundnut",
+    "sarson": "mustard", "rai": "mustard",
+    "bajra": "pearl millet", "sajje": "pearl millet",
+    "jowar": "sorghum", "jola": "sorghum",
+    "ragi": "finger millet", "nachni": "finger millet",
+    "mirchi": "chilli", "mirch": "chilli", "menasinakai": "chilli", "chili": "chilli",
+    "baingan": "brinjal", "eggplant": "brinjal", "badanekai": "brinjal",
+    "haldi": "turmeric", "arishina": "turmeric",
+    "adrak": "ginger", "shunti": "ginger",
+    "soyabean": "soybean", "soya": "soybean",
+    "kela": "banana", "bale": "banana",
+    "aam": "mango", "mavu": "mango",
+    "nariyal": "coconut", "thengu": "coconut",
+}
+
+# State/UT abbreviations and alternate names, mapped to the calendar's state keys.
+STATE_ALIASES = {
+    "ap": "Andhra Pradesh", "ar": "Arunachal Pradesh", "as": "Assam", "br": "Bihar",
+    "cg": "Chhattisgarh", "ct": "Chhattisgarh", "ga": "Goa", "gj": "Gujarat", "hr": "Haryana",
+    "hp": "Himachal Pradesh", "jh": "Jharkhand", "ka": "Karnataka", "kl": "Kerala",
+    "mp": "Madhya Pradesh", "mh": "Maharashtra", "mn": "Manipur", "ml": "Meghalaya",
+    "mz": "Mizoram", "nl": "Nagaland", "od": "Odisha", "or": "Odisha", "orissa": "Odisha",
+    "pb": "Punjab", "rj": "Rajasthan", "sk": "Sikkim", "tn": "Tamil Nadu", "tamilnadu": "Tamil Nadu",
+    "ts": "Telangana", "tg": "Telangana", "tr": "Tripura", "up": "Uttar Pradesh",
+    "uk": "Uttarakhand", "ut": "Uttarakhand", "uttaranchal": "Uttarakhand", "wb": "West Bengal",
+    "jk": "Jammu and Kashmir", "j&k": "Jammu and Kashmir", "dl": "Delhi", "py": "Puducherry",
+    "pondicherry": "Puducherry",
+}
+
+# Any crop name or alias above, as a whole word, whether or not the loaded calendar has the crop.
+KNOWN_CROPS_RE = re.compile(
+    r"\b(" + "|".join(sorted(map(re.escape, set(CROP_ALIASES) | set(CROP_ALIASES.values())), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+_NON_WORD_RE = re.compile(r"[^\w&]+")
+_WORD_RE = re.compile(r"[\w&]+")
+_FUZZY_CUTOFF = 0.8
+
+
+def _normalize(name: str) -> str:
+    return _NON_WORD_RE.sub(" ", name.lower()).strip()
+
+
+class CropCalendarIndex:
+    """
+    Immutable lookup structure built once per calendar file version. Crop and state keys are
+    normalized, and each state's entry is pre-serialized, so a lookup is a couple of dict hits.
+    """
+
+    def __init__(self, calendar: dict, mtime: float):
+        self.mtime = mtime
+        crops = {}
+        for crop_name, states in calendar.items():
+            crops[_normalize(crop_name)] = MappingProxyType({
+                _normalize(state_name): json.dumps(state_data, ensure_ascii=False)
+                for state_name, state_data in states.items()
+            })
+        self.crops = MappingProxyType(crops)
+        self._all_states = frozenset(state for states in crops.values() for state in states)
+        self._crop_aliases = MappingProxyType({_normalize(alias): _normalize(target) for alias, target in CROP_ALIASES.items()})
+        self._state_aliases = MappingProxyType({_normalize(alias): _normalize(target) for alias, target in STATE_ALIASES.items()})
+
+    @staticmethod
+    def _resolve(name: str, keys, aliases) -> str | None:
+        key = _normalize(name)
+        if key in keys:
+            return key
+        alias_target = aliases.get(key)
+        if alias_target in keys:
+            return alias_target
+        matches = difflib.get_close_matches(key, list(keys), n=1, cutoff=_FUZZY_CUTOFF)
+        return matches[0] if matches else None
+
+    def lookup(self, crop: str, state: str) -> str | None:
+        """Returns the JSON for the crop/state pair, or None if either cannot be resolved."""
+        crop_key = self._resolve(crop, self.crops, self._crop_aliases)
+        if crop_key is None:
+            return None
+        states = self.crops[crop_key]
+        state_key = self._resolve(state, states, self._state_aliases)
+        return states[state_key] if state_key is not None else None
+
+    def find_mentions(self, text: str) -> tuple[str | None, str | None]:
+        """
+        Finds a crop and a state named in free text, e.g. "when to sow dhan in KA". Only exact
+        names and aliases count here (no fuzzy matching); two-letter state codes must be uppercase
+        so words like "up", "as" or "or" are not taken for states.
+        """
+        tokens = _WORD_RE.findall(text)
+        crop = state = None
+        for size in (3, 2, 1):
+            for start in range(len(tokens) - size + 1):
+                words = tokens[start:start + size]
+                phrase = _normalize(" ".join(words))
+                if crop is None:
+                    crop_key = phrase if phrase in self.crops else self._crop_aliases.get(phrase)
+                    if crop_key in self.crops:
+                        crop = crop_key
+                if state is None:
+                    state_key = phrase if phrase in self._all_states else self._state_aliases.get(phrase)
+                    if state_key in self._all_states and (len(phrase) > 2 or words[0].isupper()):
+                        state = state_key
+        return crop, state
+
+
+class _CalendarHolder:
+    """
+    Holds the current index and swaps in a new one when the calendar file's mtime changes. The mtime
+    check (and any reload) runs at most every RELOAD_CHECK_INTERVAL seconds, in a worker thread when
+    called from the event loop; callers meanwhile keep getting the current index. Only the first load,
+    with no index to serve yet, is done in the caller.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._index: CropCalendarIndex | None = None
+        self._next_check = 0.0
+        self._checking = False
+        self._lock = threading.Lock()
+
+    def get(self) -> CropCalendarIndex:
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load_if_changed()
+                    self._next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+                return self._index
+        if time.monotonic() >= self._next_check:
+            self._schedule_check()
+        return index
+
+    def _schedule_check(self):
+        # The lock only guards the flag, so the event loop never waits on file I/O here.
+        with self._lock:
+            if self._checking or time.monotonic() < self._next_check:
+                return
+            self._checking = True
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._check)
+        except RuntimeError:
+            self._check()
+
+    def _check(self):
+        try:
+            self._load_if_changed()
+        except Exception as e:
+            logger.warning(f"Crop calendar reload from {self.path} failed, keeping the loaded version: {e}")
+        finally:
+            self._next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+            self._checking = False
+
+    def _load_if_changed(self):
+        mtime = self.path.stat().st_mtime
+        if self._index is None or self._index.mtime != mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                index = CropCalendarIndex(json.load(f), mtime)
+            self._index = index
+            logger.debug(f"Crop calendar loaded from {self.path} ({len(index.crops)} crops).")
+
+
+_calendar = _CalendarHolder(CALENDAR_PATH)
+
+
+def preload_crop_calendar():
+    """Loads the calendar ahead of the first lookup (blocking; call it from a worker thread)."""
+    _calendar.get()
+
+
+def find_crop_and_state(text: str) -> tuple[str | None, str | None]:
+    """Returns the calendar crop and state keys mentioned in `text` (either may be None)."""
+    return _calendar.get().find_mentions(text)
 
 
 async def crop_calendar_tool(crop: str, state: str) -> str:
     """
     Returns sowing and harvesting periods for a crop in a given state.
+    Local crop names (e.g. "tamatar", "dhan") and state abbreviations (e.g. "TN", "KA") are understood.
     """
     try:
-        with open("data/crop_calendar.json", "r") as f:
-            calendar = json.load(f)
-
-        crop_data = calendar.get(crop.lower(), {})
-        state_data = crop_data.get(state.title())
+        state_data = _calendar.get().lookup(crop, state)
         if not state_data:
             return json.dumps({"error": f"No data for {crop} in {state}"})
 
-        return json.dumps(state_data)
+        return state_data
 
     except Exception as e:
         return json.dumps({"error": str(e)})
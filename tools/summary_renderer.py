@@ -0,0 +1,194 @@
+# summary_renderer.py
+"""
+Local rendering of sub-agent JSON (diagnosis, market, scheme) into short, TTS-ready text.
+
+The sub-agents answer with small JSON objects of known shape, so turning them into sentences
+does not need another model call. Each shape has a template per language; render_summary()
+returns None when the input does not validate against a known shape or the language has no
+templates, and the caller falls back to the LLM summarizer.
+"""
+import os
+import re
+from typing import Optional
+
+from services import metrics
+from services.structured_output import loads_lenient
+
+SUMMARY_LANGUAGE = os.getenv("SUMMARY_LANGUAGE", "en")
+
+SUMMARIES = metrics.counter(
+    "kisan_summaries_total", "Tool output summaries by renderer", ["renderer", "shape"]
+)
+
+LANGUAGE_ALIASES = {
+    "en": "en", "english": "en",
+    "hi": "hi", "hindi": "hi", "हिंदी": "hi", "हिन्दी": "hi",
+    "kn": "kn", "kannada": "kn", "ಕನ್ನಡ": "kn",
+}
+
+# Required and optional fields per shape; the first shape whose required fields are all present wins.
+SHAPES = {
+    "diagnosis": (("disease", "organic_remedy", "chemical_remedy"), ("observed_symptoms_from_description",)),
+    "market": (("crop", "market", "price_today", "trend", "recommendation"), ()),
+    "scheme": (("scheme_name", "benefits", "eligibility", "how_to_apply"), ("link",)),
+}
+
+TEMPLATES = {
+    "en": {
+        "diagnosis": [
+            "Your crop most likely has {disease}.",
+            "Symptoms seen: {observed_symptoms_from_description}.",
+            "Organic remedy: {organic_remedy}.",
+            "Chemical remedy: {chemical_remedy}.",
+        ],
+        "market": [
+            "{crop} at {market} is selling for {price_today} today, and the price is {trend}.",
+            "Advice: {recommendation}.",
+        ],
+        "scheme": [
+            "{scheme_name}: {benefits}.",
+            "Who can apply: {eligibility}.",
+            "How to apply: {how_to_apply}.",
+            "More details: {link}",
+        ],
+        "trend": {"increasing": "rising", "decreasing": "falling", "stable": "steady"},
+        "recommendation": {"sell": "sell now", "hold": "hold for now"},
+    },
+    "hi": {
+        "diagnosis": [
+            "आपकी फसल में संभवतः {disease} है।",
+            "देखे गए लक्षण: {observed_symptoms_from_description}।",
+            "जैविक उपचार: {organic_remedy}।",
+            "रासायनिक उपचार: {chemical_remedy}।",
+        ],
+        "market": [
+            "{market} में आज {crop} का भाव {price_today} है, और भाव {trend} है।",
+            "सलाह: {recommendation}।",
+        ],
+        "scheme": [
+            "{scheme_name}: {benefits}।",
+            "कौन आवेदन कर सकता है: {eligibility}।",
+            "आवेदन कैसे करें: {how_to_apply}।",
+            "अधिक जानकारी: {link}",
+        ],
+        "trend": {"increasing": "बढ़ रहा", "decreasing": "घट रहा", "stable": "स्थिर"},
+        "recommendation": {"sell": "अभी बेचें", "hold": "अभी रोककर रखें"},
+    },
+    "kn": {
+        "diagnosis": [
+            "ನಿಮ್ಮ ಬೆಳೆಗೆ ಬಹುಶಃ {disease} ಬಾಧಿಸಿದೆ.",
+            "ಕಂಡುಬಂದ ಲಕ್ಷಣಗಳು: {observed_symptoms_from_description}.",
+            "ಸಾವಯವ ಪರಿಹಾರ: {organic_remedy}.",
+            "ರಾಸಾಯನಿಕ ಪರಿಹಾರ: {chemical_remedy}.",
+        ],
+        "market": [
+            "{market} ಮಾರುಕಟ್ಟೆಯಲ್ಲಿ ಇಂದು {crop} ಬೆಲೆ {price_today}, ಬೆಲೆ {trend}.",
+            "ಸಲಹೆ: {recommendation}.",
+        ],
+        "scheme": [
+            "{scheme_name}: {benefits}.",
+            "ಯಾರು ಅರ್ಜಿ ಸಲ್ಲಿಸಬಹುದು: {eligibility}.",
+            "ಅರ್ಜಿ ಸಲ್ಲಿಸುವ ವಿಧಾನ: {how_to_apply}.",
+            "ಹೆಚ್ಚಿನ ಮಾಹಿತಿ: {link}",
+        ],
+        "trend": {"increasing": "ಏರುತ್ತಿದೆ", "decreasing": "ಇಳಿಯುತ್ತಿದೆ", "stable": "ಸ್ಥಿರವಾಗಿದೆ"},
+        "recommendation": {"sell": "ಈಗ ಮಾರಾಟ ಮಾಡಿ", "hold": "ಸದ್ಯಕ್ಕೆ ಇಟ್ಟುಕೊಳ್ಳಿ"},
+    },
+}
+
+# Markdown that a TTS engine would read out: headings and paired emphasis or code marks. Lone marks
+# are left alone, as are URLs, where "_" and "#" are part of the address.
+_HEADING_RE = re.compile(r"^\s*#{1,6}\s+", re.MULTILINE)
+_EMPHASIS_RE = re.compile(r"(\*{1,2}|`+)(?=\S)(.+?)(?<=\S)\1")
+_UNDERSCORE_EMPHASIS_RE = re.compile(r"(?<!\w)(_{1,2})(?=\S)(.+?)(?<=\S)\1(?!\w)")
+_URL_RE = re.compile(r"(?:https?://|www\.)[^\s*`]+")
+_URL_PLACEHOLDER_RE = re.compile(r"\x00(\d+)\x00")
+# Fields used verbatim (only whitespace and trailing punctuation are trimmed).
+_VERBATIM_FIELDS = {"link"}
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " .।;:,"
+
+
+def resolve_language(language: Optional[str]) -> str:
+    """Maps a language code or name to a template language; unknown names are returned lowercased."""
+    language = (language or SUMMARY_LANGUAGE).strip().lower()
+    return LANGUAGE_ALIASES.get(language, language)
+
+
+def parse_agent_json(text: str) -> Optional[list[dict]]:
+    """Parses a sub-agent answer (repairing fenced or truncated JSON) into a list of JSON objects."""
+    value, _ = loads_lenient(text)
+    items = value if isinstance(value, list) else [value]
+    return items if items and all(isinstance(item, dict) for item in items) else None
+
+
+def _strip_markdown(text: str) -> str:
+    urls = []
+
+    def hide_url(match: re.Match) -> str:
+        urls.append(match.group(0))
+        return f"\x00{len(urls) - 1}\x00"
+
+    text = _URL_RE.sub(hide_url, text)
+    text = _HEADING_RE.sub("", text)
+    text = _EMPHASIS_RE.sub(r"\2", text)
+    text = _UNDERSCORE_EMPHASIS_RE.sub(r"\2", text)
+    return _URL_PLACEHOLDER_RE.sub(lambda match: urls[int(match.group(1))], text)
+
+
+def _clean(value, strip_markdown: bool = True) -> Optional[str]:
+    if isinstance(value, list):
+        value = "; ".join(cleaned for cleaned in (_clean(item, strip_markdown) for item in value) if cleaned)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        return None
+    if strip_markdown:
+        value = _strip_markdown(value)
+    value = _WHITESPACE_RE.sub(" ", value).strip().rstrip(_TRAILING_PUNCTUATION)
+    return value or None
+
+
+def _detect_shape(item: dict) -> Optional[str]:
+    for shape, (required, _) in SHAPES.items():
+        if all(_clean(item.get(field)) for field in required):
+            return shape
+    return None
+
+
+def _render_item(item: dict, shape: str, templates: dict) -> str:
+    required, optional = SHAPES[shape]
+    values = {field: _clean(item.get(field), field not in _VERBATIM_FIELDS) for field in required + optional}
+    if shape == "market":
+        values["trend"] = templates["trend"].get(values["trend"].lower(), values["trend"])
+        values["recommendation"] = templates["recommendation"].get(
+            values["recommendation"].lower(), values["recommendation"]
+        )
+    # Sentences built on a missing optional field are left out.
+    sentences = [
+        sentence.format(**values) for sentence in templates[shape]
+        if all(values.get(field) for field in re.findall(r"{(\w+)}", sentence))
+    ]
+    return " ".join(sentences)
+
+
+def render_summary(json_data: str, language: Optional[str] = None) -> Optional[str]:
+    """
+    Renders sub-agent JSON as plain text in `language` (code or name, default SUMMARY_LANGUAGE).
+    Returns None if any object does not match a known shape or the language has no templates.
+    """
+    templates = TEMPLATES.get(resolve_language(language))
+    items = parse_agent_json(json_data)
+    if templates is None or items is None:
+        return None
+
+    rendered = []
+    for item in items:
+        shape = _detect_shape(item)
+        if shape is None:
+            return None
+        rendered.append((shape, _render_item(item, shape, templates)))
+
+    for shape, _ in rendered:
+        SUMMARIES.inc(renderer="template", shape=shape)
+    return "\n\n".join(text for _, text in rendered)
@@ -1,28 +1,139 @@
 # weather_tool.py
+import asyncio
+import json
 import os
-import requests
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
 from basemodel_dto.weather_responsedto import WeatherResponse, CurrentWeather, ForecastDay, LocationInfo, AstroInfo
+from services import metrics
 
 load_dotenv()
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+# Overridable so the tool can be pointed at a local stub server.
+WEATHER_API_BASE_URL = os.getenv("WEATHER_API_BASE_URL", "http://api.weatherapi.com/v1")
+WEATHER_TIMEOUT_SECONDS = float(os.getenv("WEATHER_TIMEOUT_SECONDS", "5"))
+WEATHER_MAX_CONNECTIONS = int(os.getenv("WEATHER_MAX_CONNECTIONS", "20"))
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "2000"))
+# Coordinates are snapped to this grid (0.05 deg is about 5.5 km), so nearby villages share one entry.
+WEATHER_CACHE_GRID_DEGREES = float(os.getenv("WEATHER_CACHE_GRID_DEGREES", "0.05"))
 
-def get_weather_forecast(location: str) -> WeatherResponse:
-    url = "http://api.weatherapi.com/v1/forecast.json"
-    params = {
-        "key": WEATHER_API_KEY,
-        "q": location,
-        "days": 5,
-        "aqi": "yes",
-        "alerts": "yes"
-    }
+WEATHER_REQUESTS = metrics.counter(
+    "kisan_weather_requests_total", "Weather lookups by result", ["result"]
+)
 
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        raise Exception(f"{response.status_code} Error: {response.text}")
+_COORDINATES_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class WeatherServiceError(Exception):
+    """The weather API could not be reached or answered with an error."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _snap(value: float) -> float:
+    return round(round(value / WEATHER_CACHE_GRID_DEGREES) * WEATHER_CACHE_GRID_DEGREES, 4)
+
+
+def _grid_key(lat: float, lon: float) -> str:
+    return f"grid:{_snap(lat)},{_snap(lon)}"
+
+
+def _resolve_location(location: str) -> tuple[str, str]:
+    """Returns (cache key, query sent to the API). Coordinates are queried at their grid point."""
+    match = _COORDINATES_RE.match(location)
+    if match:
+        lat, lon = _snap(float(match.group(1))), _snap(float(match.group(2)))
+        return f"grid:{lat},{lon}", f"{lat},{lon}"
+    name = _WHITESPACE_RE.sub(" ", location.lower()).strip()
+    return f"name:{name}", name
+
+
+class _ForecastCache:
+    """Bounded TTL cache of forecasts; concurrent misses for one location share a single API call."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, WeatherResponse]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> Optional[WeatherResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, forecast: WeatherResponse):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, forecast)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: str, query: str) -> WeatherResponse:
+        cached = self.get(key)
+        if cached is not None:
+            WEATHER_REQUESTS.inc(result="hit")
+            return cached
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            WEATHER_REQUESTS.inc(result="coalesced")
+            return await asyncio.shield(in_flight)
 
-    data = response.json()
+        WEATHER_REQUESTS.inc(result="miss")
+        task = asyncio.ensure_future(_fetch_forecast(query))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        try:
+            forecast = await asyncio.shield(task)
+        except Exception:
+            WEATHER_REQUESTS.inc(result="error")
+            raise
 
+        self.set(key, forecast)
+        # A place looked up by name also answers later lookups by coordinates near it.
+        self.set(_grid_key(forecast.location.lat, forecast.location.lon), forecast)
+        return forecast
+
+
+_forecast_cache = _ForecastCache(WEATHER_CACHE_TTL_SECONDS, WEATHER_CACHE_MAX_ENTRIES)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Shared connection pool, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=WEATHER_API_BASE_URL,
+            timeout=httpx.Timeout(WEATHER_TIMEOUT_SECONDS, connect=min(WEATHER_TIMEOUT_SECONDS, 3.0)),
+            limits=httpx.Limits(max_connections=WEATHER_MAX_CONNECTIONS, max_keepalive_connections=WEATHER_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_weather_client():
+    """Closes the shared connection pool; called on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _parse_forecast(data: dict) -> WeatherResponse:
     return WeatherResponse(
         current=CurrentWeather(
             temperature=data["current"]["temp_c"],
@@ -53,3 +164,42 @@ def get_weather_forecast(location: str) -> WeatherResponse:
             sunset=data["forecast"]["forecastday"][0]["astro"]["sunset"]
         )
     )
+
+
+async def _fetch_forecast(query: str) -> WeatherResponse:
+    params = {
+        "key": WEATHER_API_KEY,
+        "q": query,
+        "days": 5,
+        "aqi": "yes",
+        "alerts": "yes"
+    }
+    try:
+        response = await _get_client().get("/forecast.json", params=params)
+    except httpx.TimeoutException:
+        raise WeatherServiceError(f"Weather API timed out after {WEATHER_TIMEOUT_SECONDS}s", 504)
+    except httpx.HTTPError as e:
+        raise WeatherServiceError(f"Weather API request failed: {e}", 502)
+
+    if response.status_code != 200:
+        raise WeatherServiceError(f"{response.status_code} Error: {response.text}", response.status_code)
+
+    return _parse_forecast(response.json())
+
+
+async def get_weather_forecast(location: str) -> WeatherResponse:
+    """Current weather and a 5-day forecast for a place name or "lat,lon" coordinates."""
+    key, query = _resolve_location(location)
+    return await _forecast_cache.get_or_fetch(key, query)
+
+
+async def get_weather_tool(location: str) -> str:
+    """
+    Returns current weather and a 5-day forecast (temperature, rain, wind, sunrise/sunset) for a
+    village, town or district name, or for "latitude,longitude" coordinates.
+    """
+    try:
+        forecast = await get_weather_forecast(location)
+        return forecast.model_dump_json()
+    except Exception as e:
+        return json.dumps({"error": str(e)})